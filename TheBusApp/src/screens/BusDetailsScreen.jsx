@@ -1,8 +1,14 @@
 import React, { useEffect, useRef } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
+import { fetchRouteShape } from '../utils/routeShapes';
+
+const MAP_ZOOM = 13;
+const LEG_COLORS = ['#2563eb', '#16a34a', '#d97706', '#db2777'];
 
 /**
- * BusDetailsScreen shows a map centered on the destination and details about the selected bus.
+ * BusDetailsScreen shows the bus legs of the selected journey on a map, drawn
+ * from the route shapes the backend serves, and details about the bus.
+ * Sample cards have no journey to draw, so the map then marks the destination.
  * Expects router state: { bus, placeFull }
  */
 const BusDetailsScreen = () => {
@@ -11,26 +17,62 @@ const BusDetailsScreen = () => {
   const mapRef = useRef(null);
   const { bus, placeFull } = location.state || {};
 
-  // Center map on the destination using Google Maps Places API
+  // Draw each bus leg with markers where it is boarded and left
   useEffect(() => {
-    if (!window.google || !placeFull || !mapRef.current) return;
-    const map = new window.google.maps.Map(mapRef.current, {
-      zoom: 13,
+    if (!window.google || !bus || !mapRef.current) return undefined;
+    const { maps } = window.google;
+    const map = new maps.Map(mapRef.current, {
+      zoom: MAP_ZOOM,
       center: { lat: 20.5937, lng: 78.9629 }, // fallback: center of India
     });
-    // Geocode the placeFull to get coordinates
-    const geocoder = new window.google.maps.Geocoder();
-    geocoder.geocode({ address: placeFull }, (results, status) => {
-      if (status === 'OK' && results[0]) {
+    const legs = (bus.route?.plan || []).filter((step) => step.type === 'bus' && step.route_id);
+    const overlays = [];
+    let cancelled = false;
+
+    // No legs to draw (or their shapes failed): center on the geocoded destination
+    const markDestination = () => {
+      if (!placeFull) return;
+      const geocoder = new maps.Geocoder();
+      geocoder.geocode({ address: placeFull }, (results, status) => {
+        if (cancelled || status !== 'OK' || !results[0]) return;
         map.setCenter(results[0].geometry.location);
-        new window.google.maps.Marker({
-          map,
-          position: results[0].geometry.location,
-          title: placeFull,
+        overlays.push(new maps.Marker({ map, position: results[0].geometry.location, title: placeFull }));
+      });
+    };
+
+    if (!legs.length) {
+      markDestination();
+    } else {
+      Promise.all(legs.map((leg) => fetchRouteShape(leg, MAP_ZOOM)))
+        .then((shapes) => {
+          if (cancelled) return;
+          const bounds = new maps.LatLngBounds();
+          shapes.forEach((shape, i) => {
+            overlays.push(new maps.Polyline({
+              map,
+              path: shape.path,
+              strokeColor: LEG_COLORS[i % LEG_COLORS.length],
+              strokeWeight: 4,
+            }));
+            const ends = [shape.stops[0], shape.stops[shape.stops.length - 1]];
+            ends.forEach((stop) => {
+              overlays.push(new maps.Marker({ map, position: { lat: stop.lat, lng: stop.lng }, title: stop.stop_name }));
+            });
+            shape.path.forEach((point) => bounds.extend(point));
+          });
+          if (!bounds.isEmpty()) map.fitBounds(bounds);
+        })
+        .catch((error) => {
+          console.error('Could not load route shapes:', error);
+          markDestination();
         });
-      }
-    });
-  }, [placeFull]);
+    }
+
+    return () => {
+      cancelled = true;
+      overlays.forEach((overlay) => overlay.setMap(null));
+    };
+  }, [bus, placeFull]);
 
   if (!bus || !placeFull) {
     return (
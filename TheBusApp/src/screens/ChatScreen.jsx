@@ -7,8 +7,9 @@ import BusCard from '../components/BusCard';
 import AcknowMoreBubble from '../components/AcknowMoreBubble';
 import useTypewriter from '../hooks/useTypewriter';
 import extractPlaceName from '../utils/extractPlaceName';
+import streamRoutes, { resolveTrip, toBusCard } from '../utils/streamRoutes';
 
-// Sample bus data (replace with real API data as needed)
+// Sample bus data, shown when the live route search is unavailable
 const BUS_DATA = [
   {
     "name": "Bus 42A - City Express",
@@ -71,10 +72,37 @@ const ChatScreen = () => {
   const botText1 = `alright I see you want to go to ${placeName}`;
   const botText2 = 'Click on a bus route to see more information.';
 
+  // Journeys stream in from the backend; the first one shows as soon as it is found
+  const [busList, setBusList] = useState([]);
+  const [searching, setSearching] = useState(true);
+
   // Show only 3 buses at first, then "Acknow More" if there are more
-  const busList = BUS_DATA;
   const showMore = busList.length > 3;
 
+  // Stream routes for the destination, appending each journey as it arrives
+  useEffect(() => {
+    if (!placeFull) return;
+    const controller = new AbortController();
+    let received = false;
+    resolveTrip(placeFull)
+      .then((trip) => streamRoutes(trip, {
+        signal: controller.signal,
+        onJourney: (route) => {
+          const card = toBusCard(route);
+          const first = !received;
+          received = true;
+          setBusList((prev) => (first ? [card] : [...prev, card]));
+        },
+      }))
+      .catch((err) => {
+        if (controller.signal.aborted) return;
+        console.log('[DEBUG] live route search unavailable, using sample data:', err);
+        if (!received) setBusList(BUS_DATA);
+      })
+      .finally(() => setSearching(false));
+    return () => controller.abort();
+  }, [placeFull]);
+
   // Determine animation mode on mount
   useEffect(() => {
     if (didCheckFlag.current) return;
@@ -100,7 +128,7 @@ const ChatScreen = () => {
       setShowBotMsg1(true);   console.log('[DEBUG] showBotMsg1 set TRUE (no animation)');
       setShowTyping(false);   console.log('[DEBUG] showTyping set FALSE (no animation)');
       setShowBusList(true);   console.log('[DEBUG] showBusList set TRUE (no animation)');
-      setShowAcknowMore(showMore); console.log('[DEBUG] showAcknowMore set', showMore, '(no animation)');
+      setShowAcknowMore(true); console.log('[DEBUG] showAcknowMore set TRUE (no animation)');
       setShowBotMsg2(true);   console.log('[DEBUG] showBotMsg2 set TRUE (no animation)');
       setShowBack(true);      console.log('[DEBUG] showBack set TRUE (no animation)');
       return;
@@ -118,22 +146,19 @@ const ChatScreen = () => {
     setTimeout(() => { setShowTyping(true); console.log('[DEBUG] showTyping set TRUE (animation)'); }, 700 + botText1.length * 30 + 300);
     setTimeout(() => { setShowTyping(false); console.log('[DEBUG] showTyping set FALSE (animation)'); }, 700 + botText1.length * 30 + 1300);
     setTimeout(() => { setShowBusList(true); console.log('[DEBUG] showBusList set TRUE (animation)'); }, 700 + botText1.length * 30 + 1400);
-    if (showMore) {
-      setTimeout(() => { setShowAcknowMore(true); console.log('[DEBUG] showAcknowMore set TRUE (animation)'); }, 700 + botText1.length * 30 + 1800);
-      setTimeout(() => { setShowBotMsg2(true); console.log('[DEBUG] showBotMsg2 set TRUE (animation)'); }, 700 + botText1.length * 30 + 2200);
-      setTimeout(() => { setShowBack(true); console.log('[DEBUG] showBack set TRUE (animation)'); }, 700 + botText1.length * 30 + 2600);
-    } else {
-      setTimeout(() => { setShowBotMsg2(true); console.log('[DEBUG] showBotMsg2 set TRUE (animation)'); }, 700 + botText1.length * 30 + 1800);
-      setTimeout(() => { setShowBack(true); console.log('[DEBUG] showBack set TRUE (animation)'); }, 700 + botText1.length * 30 + 2200);
-    }
-  }, [shouldAnimate, botText1.length, showMore]);
+    // The bus list grows while journeys stream in, so the "Acknow More" step is
+    // always scheduled and only rendered once there are more than 3 buses
+    setTimeout(() => { setShowAcknowMore(true); console.log('[DEBUG] showAcknowMore set TRUE (animation)'); }, 700 + botText1.length * 30 + 1800);
+    setTimeout(() => { setShowBotMsg2(true); console.log('[DEBUG] showBotMsg2 set TRUE (animation)'); }, 700 + botText1.length * 30 + 2200);
+    setTimeout(() => { setShowBack(true); console.log('[DEBUG] showBack set TRUE (animation)'); }, 700 + botText1.length * 30 + 2600);
+  }, [shouldAnimate, botText1.length]);
 
   // Scroll to bottom as new chat bubbles appear
   useEffect(() => {
     if (chatEndRef.current) {
       chatEndRef.current.scrollIntoView({ behavior: 'smooth' });
     }
-  }, [showUserMsg, showBotMsg1, showBusList, showAcknowMore, showBotMsg2]);
+  }, [showUserMsg, showBotMsg1, showBusList, showAcknowMore, showBotMsg2, busList.length]);
 
   // Handler for clicking a bus card: navigate to bus details page
   const handleBusClick = (bus) => {
@@ -177,12 +202,14 @@ const ChatScreen = () => {
           {showBusList && (
             <div className="flex flex-col space-y-2">
               {busList.slice(0, 3).map((bus, idx) => (
-                <BusCard key={bus.name} bus={bus} onClick={() => handleBusClick(bus)} />
+                <BusCard key={`${bus.name}-${idx}`} bus={bus} onClick={() => handleBusClick(bus)} />
               ))}
             </div>
           )}
+          {/* Still waiting for the first journey from the search */}
+          {showBusList && searching && busList.length === 0 && <TypingIndicator />}
           {/* "Acknow More" bubble if more than 3 buses */}
-          {showAcknowMore && <AcknowMoreBubble />}
+          {showAcknowMore && showMore && <AcknowMoreBubble />}
           {/* Bot: instructs user to click a bus (typewriter effect or instant) */}
           {showBotMsg2 && <ChatBubble>{typedBotText2}</ChatBubble>}
           {/* Dummy div to keep chat scrolled to bottom */}
@@ -0,0 +1,53 @@
+const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:8000';
+
+// Shapes only change with the network data, so each one is fetched once per page load
+const shapeRequests = new Map();
+
+/** Decode Google's encoded polyline format into [{ lat, lng }, ...] */
+export const decodePolyline = (text) => {
+  const points = [];
+  let index = 0;
+  let lat = 0;
+  let lng = 0;
+  while (index < text.length) {
+    const deltas = [];
+    for (let k = 0; k < 2; k += 1) {
+      let shift = 0;
+      let result = 0;
+      let byte;
+      do {
+        byte = text.charCodeAt(index) - 63;
+        index += 1;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+    }
+    lat += deltas[0];
+    lng += deltas[1];
+    points.push({ lat: lat / 1e5, lng: lng / 1e5 });
+  }
+  return points;
+};
+
+/**
+ * Line and stops of one bus leg of a journey plan ({ route_id, from_index,
+ * to_index }), simplified by the backend for the given zoom level.
+ * Resolves to { path: [{ lat, lng }], stops, distance_m }.
+ */
+export const fetchRouteShape = (leg, zoom = 14) => {
+  const url = `${API_BASE}/route_shape/${encodeURIComponent(leg.route_id)}` +
+    `?zoom=${zoom}&from=${leg.from_index}&to=${leg.to_index}`;
+  if (!shapeRequests.has(url)) {
+    const request = fetch(url)
+      .then((response) => {
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        return response.json();
+      })
+      .then((shape) => ({ ...shape, path: decodePolyline(shape.polyline) }));
+    // A failed request may be retried later
+    request.catch(() => shapeRequests.delete(url));
+    shapeRequests.set(url, request);
+  }
+  return shapeRequests.get(url);
+};
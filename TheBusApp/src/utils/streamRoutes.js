@@ -0,0 +1,88 @@
+const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:8000';
+
+/**
+ * Resolve the trip for a destination string: current position from the
+ * browser, destination coordinates from the Google geocoder.
+ * Resolves to the request body expected by /find_buses.
+ */
+export const resolveTrip = (placeFull) =>
+  new Promise((resolve, reject) => {
+    if (!window.google || !navigator.geolocation) {
+      reject(new Error('Geolocation or Google Maps unavailable'));
+      return;
+    }
+    navigator.geolocation.getCurrentPosition(
+      (position) => {
+        const geocoder = new window.google.maps.Geocoder();
+        geocoder.geocode({ address: placeFull }, (results, status) => {
+          if (status !== 'OK' || !results[0]) {
+            reject(new Error(`Geocoding failed: ${status}`));
+            return;
+          }
+          const destination = results[0].geometry.location;
+          resolve({
+            from: 'Current location',
+            to: placeFull,
+            fromPlaceData: {
+              name: 'Current location',
+              coordinates: { lat: position.coords.latitude, lng: position.coords.longitude },
+            },
+            toPlaceData: {
+              name: placeFull,
+              place_id: results[0].place_id,
+              coordinates: { lat: destination.lat(), lng: destination.lng() },
+            },
+          });
+        });
+      },
+      reject,
+      { timeout: 10000 }
+    );
+  });
+
+/** Convert a journey from the backend into the shape BusCard renders */
+export const toBusCard = (route) => ({
+  name: route.bus_name,
+  duration: route.duration,
+  'drive in': `Departs in ${route.departure_in} mins`,
+  fare: route.fare,
+  route,
+});
+
+/**
+ * POST a route query to the streaming endpoint and call onJourney for each
+ * journey as soon as its NDJSON line arrives. Resolves with the final
+ * 'done' event.
+ */
+const streamRoutes = async (trip, { onJourney, signal } = {}) => {
+  const response = await fetch(`${API_BASE}/find_buses/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'application/x-ndjson' },
+    body: JSON.stringify(trip),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split('\n');
+    buffered = lines.pop(); // keep the trailing partial line
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const event = JSON.parse(line);
+      if (event.type === 'journey' && onJourney) onJourney(event.route);
+      else if (event.type === 'error') throw new Error(event.error);
+      else if (event.type === 'done') return event;
+    }
+  }
+  throw new Error('Route stream ended before the search finished');
+};
+
+export default streamRoutes;
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Admission control for route searches
+Bounds how many searches run at once, how many may queue and for how long,
+and rejects the rest quickly so clients can retry instead of timing out
+"""
+
+import math
+import threading
+import time
+from typing import Dict
+
+
+class Overloaded(Exception):
+    """Request shed before it started; retry_after is a hint in seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Shed ({reason}); retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted slot; degraded tickets should only do cheap work"""
+
+    def __init__(self, controller: 'AdmissionController', degraded: bool):
+        self.controller = controller
+        self.degraded = degraded
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        """Idempotent: the stream frees its slot early and on close as well"""
+        with self.controller._cond:
+            if self.released:
+                return
+            self.released = True
+        self.controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = 1, max_queue: int = 32,
+                 queue_timeout: float = 2.0, degrade_queue_depth: int = 8):
+        """
+        max_concurrent: searches allowed to run at the same time
+        max_queue: requests allowed to wait; arrivals beyond this are shed at once
+        queue_timeout: seconds a request may wait before it is shed
+        degrade_queue_depth: queue depth at which new requests are admitted degraded
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.degrade_queue_depth = degrade_queue_depth
+
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.admitted = 0
+        self.degraded = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+        # Moving average of how long a slot is held, for Retry-After
+        self.avg_service_time = 0.5
+
+    def retry_after(self) -> int:
+        backlog = self.queue_depth + self.in_flight
+        return max(1, math.ceil(backlog * self.avg_service_time / self.max_concurrent))
+
+    def acquire(self) -> Ticket:
+        """Wait for a slot or raise Overloaded; release the ticket when done"""
+        with self._cond:
+            if self.in_flight < self.max_concurrent and self.queue_depth == 0:
+                return self._grant(degraded=False)
+
+            if self.queue_depth >= self.max_queue:
+                self.shed_queue_full += 1
+                raise Overloaded('queue full', self.retry_after())
+
+            # Decide now: a long queue means cheap answers for whoever joins it
+            degraded = self.queue_depth >= self.degrade_queue_depth
+            self.queue_depth += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed_deadline += 1
+                        raise Overloaded('queue deadline', self.retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self.queue_depth -= 1
+            return self._grant(degraded)
+
+    def admit(self) -> Ticket:
+        """Context-manager form: with controller.admit() as ticket: ..."""
+        return self.acquire()
+
+    def _grant(self, degraded: bool) -> Ticket:
+        self.in_flight += 1
+        self.admitted += 1
+        if degraded:
+            self.degraded += 1
+        return Ticket(self, degraded)
+
+    def _release(self, ticket: Ticket):
+        held = time.monotonic() - ticket.started
+        with self._cond:
+            self.in_flight -= 1
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * held
+            self._cond.notify()
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            return {
+                'in_flight': self.in_flight,
+                'queue_depth': self.queue_depth,
+                'peak_queue_depth': self.peak_queue_depth,
+                'admitted': self.admitted,
+                'degraded': self.degraded,
+                'shed_queue_full': self.shed_queue_full,
+                'shed_deadline': self.shed_deadline,
+                'shed_total': self.shed_queue_full + self.shed_deadline,
+                'avg_service_ms': round(self.avg_service_time * 1000, 1),
+            }
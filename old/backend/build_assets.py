@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Static asset build step
+Copies the frontend into a dist directory under content-hashed names,
+precompresses every compressible file with gzip and brotli, and writes a
+manifest that main.py uses to serve them without touching the bytes again
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip still works without it
+    brotli = None
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../frontend'))
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Files whose text may reference other assets by path
+TEXT_EXTENSIONS = {'.html', '.css', '.js'}
+# Files worth compressing; images like PNG are already compressed
+COMPRESSIBLE_EXTENSIONS = {'.html', '.css', '.js', '.json', '.svg', '.txt', '.map', '.xml'}
+SKIP_NAMES = {'README.md', '.DS_Store'}
+# Keep a compressed variant only if it saves at least this much
+MIN_SAVING = 0.9
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(path: str, digest: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+
+def list_assets(src_dir: str) -> List[str]:
+    """Relative paths of every servable file, excluding the dist output"""
+    assets = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = [d for d in dirs if d != DIST_DIRNAME and not d.startswith('.')]
+        for name in files:
+            if name in SKIP_NAMES:
+                continue
+            rel = os.path.relpath(os.path.join(root, name), src_dir)
+            assets.append(rel.replace(os.sep, '/'))
+    return sorted(assets)
+
+
+def rewrite_references(text: str, renames: Dict[str, str]) -> str:
+    """Point literal asset paths at their hashed names (longest path first)"""
+    for original in sorted(renames, key=len, reverse=True):
+        pattern = r'(?<=["\'(=\s])' + re.escape(original) + r'(?=["\')?#\s])'
+        text = re.sub(pattern, lambda _: renames[original], text)
+    return text
+
+
+def compress_variants(data: bytes, ext: str) -> Dict[str, bytes]:
+    """Precompressed bodies keyed by Content-Encoding"""
+    if ext not in COMPRESSIBLE_EXTENSIONS:
+        return {}
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {enc: body for enc, body in variants.items() if len(body) < len(data) * MIN_SAVING}
+
+
+def build(src_dir: str = FRONTEND_DIR, out_dir: str = None) -> Dict:
+    out_dir = out_dir or os.path.join(src_dir, DIST_DIRNAME)
+    os.makedirs(out_dir, exist_ok=True)
+
+    assets = list_assets(src_dir)
+    # Binary assets first, then the text files that may reference them,
+    # so each file is hashed after its references have been rewritten
+    order = {'.css': 1, '.js': 2, '.html': 3}
+    assets.sort(key=lambda p: order.get(os.path.splitext(p)[1], 0))
+
+    renames: Dict[str, str] = {}
+    manifest = {'files': {}}
+    raw_bytes = gzip_bytes = br_bytes = 0
+
+    for rel in assets:
+        with open(os.path.join(src_dir, rel), 'rb') as f:
+            data = f.read()
+        ext = os.path.splitext(rel)[1].lower()
+        if ext in TEXT_EXTENSIONS and renames:
+            data = rewrite_references(data.decode('utf-8'), renames).encode('utf-8')
+
+        digest = content_hash(data)
+        stored = hashed_name(rel, digest)
+        variants = compress_variants(data, ext)
+
+        target = os.path.join(out_dir, stored)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        for enc, body in variants.items():
+            with open(f"{target}.{'gz' if enc == 'gzip' else 'br'}", 'wb') as f:
+                f.write(body)
+
+        entry = {
+            'file': stored,
+            'etag': digest,
+            'size': len(data),
+            'encodings': {enc: len(body) for enc, body in variants.items()},
+        }
+        # The original name stays servable (revalidated); the hashed name never changes
+        manifest['files'][rel] = dict(entry, immutable=False)
+        manifest['files'][stored] = dict(entry, immutable=True)
+        if ext != '.html':
+            renames[rel] = stored
+
+        raw_bytes += len(data)
+        gzip_bytes += len(variants.get('gzip', data))
+        br_bytes += len(variants.get('br', variants.get('gzip', data)))
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"✅ Built {len(assets)} assets into {out_dir}")
+    print(f"📊 Raw {raw_bytes / 1024:.1f} KiB | gzip {gzip_bytes / 1024:.1f} KiB"
+          + (f" | brotli {br_bytes / 1024:.1f} KiB" if brotli else " | brotli not installed"))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompress and hash frontend assets")
+    parser.add_argument('--src', default=FRONTEND_DIR, help="frontend directory")
+    parser.add_argument('--out', default=None, help="output directory (default: <src>/dist)")
+    args = parser.parse_args()
+    build(args.src, args.out)
+
+
+if __name__ == '__main__':
+    main()
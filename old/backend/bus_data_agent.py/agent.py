@@ -5,16 +5,39 @@ Collects bus stops, routes, and frequency data for a specific district
 """
 
 import json
-import requests
 import time
+import math
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from openai import OpenAI
 import dotenv
 import os
+from geocoding import NOMINATIM_URL, GeocodingPipeline
+from geocache import GeocodeStore, normalize
+from llm_batch import LLMUsage, parse_items
+from checkpoint import Checkpoint
+from dedupe import dedupe_stops, print_report, rewrite_stop_ids
 dotenv.load_dotenv()
+
+# Stop generation is split by category so the requests run in parallel and
+# each answer is small enough not to hit max_tokens
+STOP_CATEGORIES = [
+    "Major bus stands/terminals",
+    "Important junctions and intersections",
+    "Hospitals, colleges, schools",
+    "Markets and commercial areas",
+    "Tourist spots and landmarks",
+    "Railway stations (if any)",
+    "Government offices",
+    "Residential area stops",
+]
+# Output tokens budgeted per generated stop / per estimated coordinate pair
+TOKENS_PER_STOP = 80
+TOKENS_PER_COORDINATE = 40
+
 @dataclass
 class BusStop:
     stop_id: str
@@ -39,178 +62,244 @@ class BusRoute:
     travel_time_between_stops: int
 
 class BusDataCollectionAgent:
-    def __init__(self, openai_api_key: str, district: str, state: str = "Kerala"):
+    def __init__(self, openai_api_key: str, district: str, state: str = "Kerala",
+                 client: Optional[OpenAI] = None, geocode_store: Optional[GeocodeStore] = None,
+                 nominatim_url: str = NOMINATIM_URL):
         """
         Initialize the agent with OpenAI API key and target district
+        client: any OpenAI-compatible client (default: OpenAI, which honours OPENAI_BASE_URL)
+        geocode_store / nominatim_url: geocode cache and Nominatim-compatible search endpoint
         """
-        self.client = OpenAI(api_key=openai_api_key)
+        self.client = client if client is not None else OpenAI(api_key=openai_api_key)
         self.district = district
         self.state = state
         self.collected_stops = {}
         self.collected_routes = {}
+        # stop_id merged away by dedupe -> stop_id it was merged into
+        self.stop_aliases = {}
         self.geocoding_cache = {}
-        
-    def get_district_bus_stops(self) -> List[Dict]:
-        """
-        Use OpenAI to generate a comprehensive list of bus stops in the district
-        """
+        # Shared across runs and districts; reruns mostly skip the network
+        self.geocode_store = geocode_store if geocode_store is not None else GeocodeStore()
+        self.geocoder = GeocodingPipeline(district, state, self.estimate_coordinates_with_ai,
+                                          cache=self.geocoding_cache, store=self.geocode_store,
+                                          estimate_batch=self.estimate_coordinates_batch,
+                                          nominatim_url=nominatim_url)
+        self.usage = LLMUsage()
+        self.llm_concurrency = int(os.getenv("AGENT_LLM_CONCURRENCY", "4"))
+        self.coordinate_batch_size = int(os.getenv("AGENT_COORDINATE_BATCH", "20"))
+        self.max_llm_rounds = 3
+        
+    def _chat(self, model: str, system: str, prompt: str, max_tokens: int,
+              temperature: float) -> Tuple[str, bool]:
+        """One JSON-mode completion; returns (content, truncated) and records token usage"""
+        started = time.time()
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
+        self.usage.record(response, time.time() - started)
+        choice = response.choices[0]
+        return (choice.message.content or "").strip(), choice.finish_reason == "length"
+    
+    def _generate_stops_page(self, category: str, count: int, exclude: List[str]) -> Tuple[List[Dict], bool]:
+        """Up to count stops of one category; returns (stops, truncated)"""
+        avoid = f"\n        Do not repeat any of these stops: {', '.join(exclude)}\n" if exclude else ""
         prompt = f"""
         You are a local transportation expert for {self.district} district in {self.state}, India. 
         
-        Generate a comprehensive list of major bus stops in {self.district} district. Include:
-        1. Major bus stands/terminals
-        2. Important junctions and intersections
-        3. Hospitals, colleges, schools
-        4. Markets and commercial areas
-        5. Tourist spots and landmarks
-        6. Railway stations (if any)
-        7. Government offices
-        8. Residential area stops
-        
+        List {count} bus stops in {self.district} district in this category: {category}.
+        Cover different areas of the district.
+        {avoid}
         For each bus stop, provide:
         - stop_name: Clear, commonly used name
         - address: Specific location/area within {self.district}
         - landmark: Notable nearby landmark
         - importance: (major/medium/minor)
         
-        Format as JSON array with this structure:
-        [
-            {{
-                "stop_name": "Central Bus Stand",
-                "address": "Main Road, {self.district}",
-                "landmark": "Near District Collectorate",
-                "importance": "major"
-            }}
-        ]
-        
-        Provide the maximum amount or complete atleast a 100 stops covering different areas of {self.district} district.
-        Only return the JSON array, no other text.
+        Format as a JSON object with this structure:
+        {{
+            "stops": [
+                {{
+                    "stop_name": "Central Bus Stand",
+                    "address": "Main Road, {self.district}",
+                    "landmark": "Near District Collectorate",
+                    "importance": "major"
+                }}
+            ]
+        }}
         """
-        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a transportation data expert. Respond only with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            content = response.choices[0].message.content.strip()
-            # Clean the response to extract JSON
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-            if json_match:
-                stops_data = json.loads(json_match.group())
-                print(f"✅ Generated {len(stops_data)} bus stops for {self.district}")
-                return stops_data
-            else:
-                print("❌ Could not extract JSON from OpenAI response")
-                return []
-                
+            content, truncated = self._chat("gpt-4o", "You are a transportation data expert. Respond only with valid JSON.",
+                                            prompt, max_tokens=min(4000, TOKENS_PER_STOP * count + 100),
+                                            temperature=0.7)
         except Exception as e:
-            print(f"❌ Error getting bus stops from OpenAI: {e}")
-            return []
+            print(f"❌ Error getting {category} stops from OpenAI: {e}")
+            return [], False
+        items, complete = parse_items(content, "stops")
+        stops = [item for item in items
+                 if isinstance(item.get("stop_name"), str) and isinstance(item.get("address"), str)]
+        return stops, truncated or not complete
+    
+    def get_district_bus_stops(self, target: int = 100) -> List[Dict]:
+        """
+        Use OpenAI to generate a comprehensive list of bus stops in the district.
+        One request per category, in parallel. A category whose answer was cut
+        off is asked again for the rest, excluding the stops it already gave.
+        """
+        per_category = math.ceil(target / len(STOP_CATEGORIES))
+        found: Dict[str, List[Dict]] = {category: [] for category in STOP_CATEGORIES}
+        pending = list(STOP_CATEGORIES)
+        
+        with ThreadPoolExecutor(max_workers=self.llm_concurrency) as pool:
+            for round_number in range(self.max_llm_rounds):
+                if not pending:
+                    break
+                requests_made = [(category, per_category - len(found[category])) for category in pending]
+                pages = list(pool.map(
+                    lambda job: self._generate_stops_page(job[0], job[1], [s["stop_name"] for s in found[job[0]]]),
+                    requests_made))
+                pending = []
+                for (category, asked), (stops, truncated) in zip(requests_made, pages):
+                    found[category].extend(stops[:asked])
+                    # Short because of max_tokens (not because the model ran out of places): ask again
+                    if truncated and len(found[category]) < per_category:
+                        pending.append(category)
+                if pending:
+                    self.usage.add_retries(len(pending))
+                    print(f"  ↻ {len(pending)} categories were cut off; requesting the remainder")
+        
+        # Same stop offered under two categories: keep the first
+        stops_data, seen = [], set()
+        for category in STOP_CATEGORIES:
+            for stop in found[category]:
+                key = normalize(stop["stop_name"])
+                if key and key not in seen:
+                    seen.add(key)
+                    stops_data.append(stop)
+        
+        if stops_data:
+            print(f"✅ Generated {len(stops_data)} bus stops for {self.district}")
+        else:
+            print("❌ Could not get any bus stops from OpenAI")
+        return stops_data
     
     def geocode_location(self, address: str, stop_name: str) -> Tuple[Optional[float], Optional[float]]:
         """
         Geocode an address to get latitude and longitude
-        Uses a combination of OpenStreetMap Nominatim (free) and fallback strategies
+        Uses OpenStreetMap Nominatim (free) with an OpenAI estimate as fallback;
+        process_bus_stops geocodes whole lists concurrently through the same pipeline
         """
-        cache_key = f"{address}_{stop_name}"
-        if cache_key in self.geocoding_cache:
-            return self.geocoding_cache[cache_key]
-        
-        try:
-            # Try OpenStreetMap Nominatim (free service)
-            query = f"{stop_name}, {address}, {self.district}, {self.state}, India"
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                'q': query,
-                'format': 'json',
-                'limit': 1,
-                'countrycodes': 'in'
-            }
-            
-            headers = {'User-Agent': 'BusDataAgent/1.0'}
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data:
-                    lat = float(data[0]['lat'])
-                    lon = float(data[0]['lon'])
-                    self.geocoding_cache[cache_key] = (lat, lon)
-                    time.sleep(1)  # Rate limiting
-                    return lat, lon
-            
-            # Fallback: Use OpenAI to estimate coordinates
-            lat, lon = self.estimate_coordinates_with_ai(stop_name, address)
-            if lat and lon:
-                self.geocoding_cache[cache_key] = (lat, lon)
-                return lat, lon
-                
-        except Exception as e:
-            print(f"⚠️  Geocoding error for {stop_name}: {e}")
-        
-        return None, None
+        result = self.geocoder.run([{'stop_name': stop_name, 'address': address}])[0]
+        return result.latitude, result.longitude
     
     def estimate_coordinates_with_ai(self, stop_name: str, address: str) -> Tuple[Optional[float], Optional[float]]:
         """
         Use OpenAI to estimate coordinates based on local knowledge
         """
+        coords = self.estimate_coordinates_batch([{"stop_name": stop_name, "address": address}])[0]
+        return coords if coords else (None, None)
+    
+    def _estimate_chunk(self, chunk: List[Tuple[int, Dict]]) -> Tuple[Dict[int, Tuple[float, float]], bool]:
+        """Coordinates for one group of (index, stop); returns ({index: (lat, lon)}, truncated)"""
+        listing = json.dumps([{"id": i, "stop_name": stop["stop_name"], "address": stop["address"]}
+                              for i, stop in chunk], ensure_ascii=False)
         prompt = f"""
         You are a local geography expert for {self.district} district in {self.state}, India.
         
-        Estimate the approximate latitude and longitude coordinates for:
-        Stop Name: {stop_name}
-        Address: {address}
+        Estimate the approximate latitude and longitude coordinates for each of these bus stops:
+        {listing}
         
         Consider the general location of {self.district} district and provide reasonable coordinates.
         
-        Respond ONLY with coordinates in this exact format:
-        latitude,longitude
-        
-        Example: 11.2588,75.7804
+        Respond with a JSON object with one entry per id:
+        {{"results": [{{"id": 0, "latitude": 11.2588, "longitude": 75.7804}}]}}
+        Use null coordinates for a stop you cannot place.
         """
-        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a geography expert. Respond only with coordinates in format: lat,lon"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=50
-            )
-            
-            content = response.choices[0].message.content.strip()
-            coords = content.split(',')
-            
-            if len(coords) == 2:
-                lat = float(coords[0].strip())
-                lon = float(coords[1].strip())
-                return lat, lon
-                
+            content, truncated = self._chat("gpt-3.5-turbo", "You are a geography expert. Respond only with valid JSON.",
+                                            prompt, max_tokens=TOKENS_PER_COORDINATE * len(chunk) + 50,
+                                            temperature=0.3)
         except Exception as e:
             print(f"⚠️  AI coordinate estimation error: {e}")
-        
-        return None, None
+            return {}, False
+        
+        wanted = {i for i, _ in chunk}
+        estimates = {}
+        items, complete = parse_items(content, "results")
+        for item in items:
+            try:
+                i, lat, lon = int(item["id"]), float(item["latitude"]), float(item["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if i in wanted and -90 <= lat <= 90 and -180 <= lon <= 180:
+                estimates[i] = (lat, lon)
+        return estimates, truncated or not complete
+    
+    def estimate_coordinates_batch(self, stops: List[Dict]) -> List[Optional[Tuple[float, float]]]:
+        """
+        estimate_coordinates_with_ai for many stops, a group per request.
+        Stops missing from an answer are retried on their own next round; a cut
+        off answer halves the group size. Result i belongs to stops[i].
+        """
+        results: List[Optional[Tuple[float, float]]] = [None] * len(stops)
+        pending = list(range(len(stops)))
+        batch_size = self.coordinate_batch_size
+        
+        with ThreadPoolExecutor(max_workers=self.llm_concurrency) as pool:
+            for round_number in range(self.max_llm_rounds):
+                if not pending:
+                    break
+                chunks = [[(i, stops[i]) for i in pending[start:start + batch_size]]
+                          for start in range(0, len(pending), batch_size)]
+                truncated = False
+                for estimates, cut_off in pool.map(self._estimate_chunk, chunks):
+                    truncated |= cut_off
+                    for i, coords in estimates.items():
+                        results[i] = coords
+                pending = [i for i in pending if results[i] is None]
+                if pending and round_number + 1 < self.max_llm_rounds:
+                    self.usage.add_retries(len(pending))
+                if truncated:
+                    batch_size = max(1, batch_size // 2)
+        return results
     
-    def process_bus_stops(self, stops_data: List[Dict]) -> List[BusStop]:
+    def process_bus_stops(self, stops_data: List[Dict], checkpoint: Optional[Checkpoint] = None) -> List[BusStop]:
         """
         Process raw stops data and geocode them
+        With a checkpoint, every stop is recorded as soon as it is resolved and
+        stops recorded by an earlier, interrupted run are not geocoded again.
         """
         processed_stops = []
         
-        print(f"🔄 Processing and geocoding {len(stops_data)} bus stops...")
+        coords: Dict[int, Tuple[float, float]] = {}
+        if checkpoint is not None:
+            for record in checkpoint.records('geocoded'):
+                coords[record['index']] = (record['latitude'], record['longitude'])
+            if coords:
+                print(f"  ↩️  Resuming: {len(coords)} stops already geocoded")
+        
+        todo = [i for i in range(len(stops_data)) if i not in coords]
+        print(f"🔄 Processing and geocoding {len(todo)} bus stops...")
+        
+        def record(position: int, result):
+            if checkpoint is not None:
+                checkpoint.append('geocoded', {'index': todo[position], 'latitude': result.latitude,
+                                               'longitude': result.longitude, 'provider': result.provider})
+        
+        # All stops in flight at once, rate-limited per provider; results keep input order
+        results = self.geocoder.run([stops_data[i] for i in todo], on_result=record)
+        for i, result in zip(todo, results):
+            if result.latitude and result.longitude:
+                coords[i] = (result.latitude, result.longitude)
         
         for i, stop_data in enumerate(stops_data, 1):
-            print(f"  Processing stop {i}/{len(stops_data)}: {stop_data['stop_name']}")
-            
-            lat, lon = self.geocode_location(stop_data['address'], stop_data['stop_name'])
+            lat, lon = coords.get(i - 1, (None, None))
             
             if lat and lon:
                 stop = BusStop(
@@ -227,9 +316,24 @@ class BusDataCollectionAgent:
             else:
                 print(f"  ⚠️  Could not geocode: {stop_data['stop_name']}")
         
-        print(f"✅ Successfully processed {len(processed_stops)} bus stops")
+        stats = self.geocoder.stats
+        print(f"✅ Successfully processed {len(processed_stops)} bus stops in {stats.get('seconds', 0)}s "
+              f"(cache {stats['cache']}, nominatim {stats['nominatim']}, openai {stats['openai']}, "
+              f"retries {stats['retries']})")
         return processed_stops
     
+    def dedupe_bus_stops(self, stops: List[BusStop]) -> Tuple[List[BusStop], List[Dict]]:
+        """
+        Merge stops that are the same place under different spellings
+        Returns the kept stops and the merge report; routes are mapped onto the
+        kept stops through self.stop_aliases.
+        """
+        kept, aliases, report = dedupe_stops([asdict(stop) for stop in stops])
+        self.stop_aliases = aliases
+        self.collected_stops = {stop['stop_id']: BusStop(**stop) for stop in kept}
+        print_report(report, len(stops))
+        return list(self.collected_stops.values()), report
+    
     def generate_bus_routes(self, stops: List[BusStop]) -> List[Dict]:
         """
         Use OpenAI to generate realistic bus routes connecting the stops
@@ -314,7 +418,7 @@ class BusDataCollectionAgent:
         for i, route_data in enumerate(routes_data, 1):
             # Validate that all stops exist
             valid_stops = []
-            for stop_id in route_data['stops']:
+            for stop_id in rewrite_stop_ids(route_data['stops'], self.stop_aliases):
                 if stop_id in self.collected_stops:
                     valid_stops.append(stop_id)
                 else:
@@ -388,78 +492,176 @@ class BusDataCollectionAgent:
         
         return export_data
     
-    def run_full_collection(self) -> Dict:
+    def run_full_collection(self, fresh: bool = False) -> Dict:
         """
         Run the complete data collection process
+        Every step is checkpointed under collection_runs/<district>_<state>/;
+        a rerun picks up after the last finished step (fresh=True starts over).
         """
         print(f"🚌 Starting bus data collection for {self.district} district, {self.state}")
         print("=" * 60)
+        checkpoint = Checkpoint(self.district, self.state, fresh=fresh)
         
-        # Step 1: Get bus stops from OpenAI
-        print("\n🔄 Step 1: Generating bus stops using OpenAI...")
-        stops_data = self.get_district_bus_stops()
+        if checkpoint.done('export'):
+            print(f"✅ Already collected; loading {checkpoint.info('export')['file']}")
+            return checkpoint.load('export')
         
-        if not stops_data:
-            print("❌ Failed to generate bus stops. Exiting.")
-            return {}
+        # Step 1: Get bus stops from OpenAI
+        if checkpoint.done('stops'):
+            stops_data = checkpoint.load('stops')
+            print(f"\n↩️  Step 1: {len(stops_data)} bus stops loaded from checkpoint")
+        else:
+            print("\n🔄 Step 1: Generating bus stops using OpenAI...")
+            stops_data = self.get_district_bus_stops()
+            
+            if not stops_data:
+                print("❌ Failed to generate bus stops. Exiting.")
+                return {}
+            checkpoint.save('stops', stops_data, count=len(stops_data))
         
         # Step 2: Process and geocode stops
-        print("\n🔄 Step 2: Processing and geocoding stops...")
-        processed_stops = self.process_bus_stops(stops_data)
-        
-        if not processed_stops:
-            print("❌ No stops could be processed. Exiting.")
-            return {}
+        if checkpoint.done('geocoding'):
+            processed_stops = [BusStop(**stop) for stop in checkpoint.load('geocoding')]
+            self.collected_stops = {stop.stop_id: stop for stop in processed_stops}
+            print(f"↩️  Step 2: {len(processed_stops)} geocoded stops loaded from checkpoint")
+        else:
+            print("\n🔄 Step 2: Processing and geocoding stops...")
+            processed_stops = self.process_bus_stops(stops_data, checkpoint)
+            
+            if not processed_stops:
+                print("❌ No stops could be processed. Exiting.")
+                return {}
+            checkpoint.save('geocoding', [asdict(stop) for stop in processed_stops],
+                            count=len(processed_stops), geocoder=self.geocoder.stats)
+        
+        # Step 2b: Merge duplicate stops
+        if checkpoint.done('dedupe'):
+            deduped = checkpoint.load('dedupe')
+            processed_stops = [BusStop(**stop) for stop in deduped['stops']]
+            self.collected_stops = {stop.stop_id: stop for stop in processed_stops}
+            self.stop_aliases = deduped['aliases']
+            print(f"↩️  Step 2b: {len(processed_stops)} stops after merging duplicates loaded from checkpoint")
+        else:
+            print("\n🔄 Step 2b: Merging duplicate stops...")
+            processed_stops, report = self.dedupe_bus_stops(processed_stops)
+            checkpoint.save('dedupe', {'stops': [asdict(stop) for stop in processed_stops],
+                                       'aliases': self.stop_aliases, 'report': report},
+                            count=len(processed_stops), merged=len(self.stop_aliases))
         
         # Step 3: Generate routes
-        print("\n🔄 Step 3: Generating bus routes using OpenAI...")
-        routes_data = self.generate_bus_routes(processed_stops)
-        
-        if not routes_data:
-            print("❌ Failed to generate bus routes. Exiting.")
-            return {}
+        if checkpoint.done('routes'):
+            routes_data = checkpoint.load('routes')
+            print(f"↩️  Step 3: {len(routes_data)} routes loaded from checkpoint")
+        else:
+            print("\n🔄 Step 3: Generating bus routes using OpenAI...")
+            routes_data = self.generate_bus_routes(processed_stops)
+            
+            if not routes_data:
+                print("❌ Failed to generate bus routes. Exiting.")
+                return {}
+            checkpoint.save('routes', routes_data, count=len(routes_data))
         
         # Step 4: Process routes
-        print("\n🔄 Step 4: Processing bus routes...")
-        processed_routes = self.process_bus_routes(routes_data)
+        if checkpoint.done('validation'):
+            processed_routes = [BusRoute(**route) for route in checkpoint.load('validation')]
+            self.collected_routes = {route.route_id: route for route in processed_routes}
+            print(f"↩️  Step 4: {len(processed_routes)} validated routes loaded from checkpoint")
+        else:
+            print("\n🔄 Step 4: Processing bus routes...")
+            processed_routes = self.process_bus_routes(routes_data)
+            checkpoint.save('validation', [asdict(route) for route in processed_routes],
+                            count=len(processed_routes))
         
         # Step 5: Export data
         print("\n🔄 Step 5: Exporting data...")
-        final_data = self.export_data()
+        filename = checkpoint.path(f"{self.district.lower()}_bus_data.json")
+        final_data = self.export_data(filename)
+        checkpoint.save('export', final_data, file=filename, llm_usage=self.usage.as_dict())
+        
+        usage = self.usage.as_dict()
+        print(f"📊 OpenAI: {usage['requests']} requests, {usage['total_tokens']} tokens, "
+              f"{usage['truncated_responses']} truncated, {usage['retried_items']} items retried")
         
         print("\n✅ Bus data collection completed successfully!")
         return final_data
 
 
+def _collect_district(openai_api_key: str, district: str, state: str, fresh: bool,
+                      nominatim_share: float) -> Dict:
+    agent = BusDataCollectionAgent(openai_api_key=openai_api_key, district=district, state=state)
+    # Nominatim's limit is per client IP, so parallel districts split it
+    agent.geocoder.nominatim_rate *= nominatim_share
+    data = agent.run_full_collection(fresh=fresh)
+    return {'stops': len(data.get('bus_stops', [])), 'routes': len(data.get('bus_routes', []))}
+
+
+def collect_districts(openai_api_key: str, districts: List[str], state: str = "Kerala",
+                      workers: int = 4, fresh: bool = False) -> Dict[str, Dict]:
+    """
+    run_full_collection for several districts in a process pool. Each district
+    checkpoints on its own, so a failed district can simply be rerun.
+    """
+    workers = max(1, min(workers, len(districts)))
+    summary = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {district: pool.submit(_collect_district, openai_api_key, district, state, fresh, 1 / workers)
+                   for district in districts}
+        for district, future in futures.items():
+            try:
+                summary[district] = future.result()
+            except Exception as e:
+                print(f"❌ {district} failed: {e} (rerun to resume from its checkpoint)")
+                summary[district] = {'error': str(e)}
+    return summary
+
+
 
 
 
 def main():
     """
     Example usage of the Bus Data Collection Agent
+    python agent.py --districts Kozhikode Malappuram Kannur --workers 3
     """
+    import argparse
+    
     # Configuration
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Replace with your OpenAI API key
-    DISTRICT = "Kozhikode"  # Change to your target district
-    STATE = "Kerala"        # Change to your target state
+    
+    parser = argparse.ArgumentParser(description="Collect bus stops and routes for one or more districts")
+    parser.add_argument('--districts', nargs='+', default=["Kozhikode"], help="target districts")
+    parser.add_argument('--state', default="Kerala", help="target state")
+    parser.add_argument('--workers', type=int, default=4, help="districts collected in parallel")
+    parser.add_argument('--fresh', action='store_true', help="ignore checkpoints of earlier runs")
+    args = parser.parse_args()
+    
+    if len(args.districts) > 1:
+        summary = collect_districts(OPENAI_API_KEY, args.districts, args.state, args.workers, args.fresh)
+        print("\n📋 Collection Summary:")
+        for district, result in summary.items():
+            if 'error' in result:
+                print(f"{district}: ❌ {result['error']}")
+            else:
+                print(f"{district}: {result['stops']} bus stops, {result['routes']} bus routes")
+        return
     
     # Create agent
     agent = BusDataCollectionAgent(
         openai_api_key=OPENAI_API_KEY,
-        district=DISTRICT,
-        state=STATE
+        district=args.districts[0],
+        state=args.state
     )
     
     # Run collection
-    data = agent.run_full_collection()
+    data = agent.run_full_collection(fresh=args.fresh)
     
     # Display summary
     if data:
         print("\n📋 Collection Summary:")
-        print(f"District: {DISTRICT}, {STATE}")
+        print(f"District: {args.districts[0]}, {args.state}")
         print(f"Bus Stops: {len(data.get('bus_stops', []))}")
         print(f"Bus Routes: {len(data.get('bus_routes', []))}")
         print("\nData file created and ready for use with your bus route finder!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+On-disk checkpoints for a district collection run
+Each finished stage writes its output atomically and is marked done in the
+run's manifest; geocoding also appends every resolved stop as it lands. A
+rerun loads finished stages and continues from the first unfinished one.
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+from typing import Any, Dict, Optional
+
+RUNS_DIR = os.getenv('AGENT_RUNS_DIR',
+                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'collection_runs'))
+STAGES = ('stops', 'geocoding', 'dedupe', 'routes', 'validation', 'export')
+
+
+def slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+def write_json_atomic(path: str, data: Any):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Checkpoint:
+    def __init__(self, district: str, state: str, runs_dir: str = RUNS_DIR, fresh: bool = False):
+        """fresh: throw away an earlier run of this district and start over"""
+        self.dir = os.path.join(runs_dir, f"{slug(district)}_{slug(state)}")
+        if fresh and os.path.isdir(self.dir):
+            shutil.rmtree(self.dir)
+        os.makedirs(self.dir, exist_ok=True)
+        self.manifest_path = os.path.join(self.dir, 'manifest.json')
+        self.manifest: Dict[str, Dict] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        # .jsonl files whose last line this process has already checked
+        self._appending = set()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def done(self, stage: str) -> bool:
+        return self.manifest.get(stage, {}).get('done', False)
+
+    def load(self, stage: str) -> Any:
+        with open(self.path(f"{stage}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, stage: str, data: Any, **info):
+        """Write the stage output, then mark it done (so a crash in between just redoes it)"""
+        write_json_atomic(self.path(f"{stage}.json"), data)
+        self.manifest[stage] = {'done': True, 'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'), **info}
+        write_json_atomic(self.manifest_path, self.manifest)
+
+    def append(self, name: str, record: Dict):
+        """One JSON line, flushed at once, for work that finishes piece by piece"""
+        path = self.path(f"{name}.jsonl")
+        if name not in self._appending:
+            self._appending.add(name)
+            self._end_torn_line(path)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+
+    @staticmethod
+    def _end_torn_line(path: str):
+        """A crash may have cut the last line short; new records start on a line of their own"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+        with open(path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    def records(self, name: str) -> list:
+        """Lines written by append; lines cut short by a crash are skipped"""
+        path = self.path(f"{name}.jsonl")
+        if not os.path.exists(path):
+            return []
+        records = []
+        # A cut can split a multi-byte character too; that line just fails to parse
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def info(self, stage: str) -> Optional[Dict]:
+        return self.manifest.get(stage)
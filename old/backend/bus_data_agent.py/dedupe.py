@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Merge near-duplicate stops after geocoding
+The LLM lists the same junction under several spellings ("Palayam Jn",
+"Palayam Junction Bus Stop"), and geocoding puts them a few metres apart.
+Stops are bucketed in a lat/lng grid, so each one is only compared with the
+stops in its own and neighbouring cells; pairs that are close enough and
+have similar names are joined with union-find, as long as every stop in the
+joined cluster stays within the radius of every other. Each cluster keeps its first
+stop's ID, and route stop references are rewritten to the kept IDs.
+"""
+
+import json
+import math
+from difflib import SequenceMatcher
+from typing import Dict, List, Tuple
+
+from geocache import normalize
+
+METERS_PER_DEGREE = 111320
+MERGE_RADIUS = 150       # metres
+MIN_SIMILARITY = 0.85
+# Words that only say "this is a stop" or are spelled several ways
+ABBREVIATIONS = {'jn': 'junction', 'jct': 'junction', 'jnc': 'junction', 'rd': 'road',
+                 'stn': 'station', 'st': 'street', 'hosp': 'hospital', 'clg': 'college'}
+FILLER = {'bus', 'stop', 'busstop', 'the', 'near'}
+# Words a name may add and still be the same stop: "Palayam" / "Palayam Junction".
+# Not 'hospital', 'college' or 'station': "Beach Hospital" is not "Beach"
+STOP_WORDS = {'junction', 'road'}
+
+
+def name_key(name: str) -> str:
+    words = (ABBREVIATIONS.get(word, word) for word in normalize(name).split())
+    return ' '.join(word for word in words if word not in FILLER)
+
+
+def similar(a: str, b: str, min_similarity: float = MIN_SIMILARITY) -> bool:
+    """Name keys that match closely, or where one is the other with stop words added"""
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    words_a, words_b = set(a.split()), set(b.split())
+    # "Palayam Market" is not "Palayam": other added words must pass the ratio too
+    if (words_a <= words_b or words_b <= words_a) and words_a ^ words_b <= STOP_WORDS:
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= min_similarity
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    R = 6371000
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 2 * R * math.asin(math.sqrt(a))
+
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> int:
+        """The lower index stays the root, so a cluster keeps its earliest stop"""
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+        return min(i, j)
+
+
+def dedupe_stops(stops: List[Dict], radius: float = MERGE_RADIUS,
+                 min_similarity: float = MIN_SIMILARITY) -> Tuple[List[Dict], Dict[str, str], List[Dict]]:
+    """
+    stops: dicts with stop_id, stop_name, latitude and longitude.
+    Returns (kept stops, merged stop_id -> kept stop_id, merge report).
+    No two stops in a cluster are more than radius apart, so chains of
+    neighbours don't merge a whole street. Kept stops sit at the mean
+    position of their cluster.
+    """
+    keys = [name_key(stop['stop_name']) for stop in stops]
+    cell_deg = radius / METERS_PER_DEGREE
+    cells: Dict[Tuple[int, int], List[int]] = {}
+    clusters = UnionFind(len(stops))
+    groups: Dict[int, List[int]] = {i: [i] for i in range(len(stops))}
+
+    def join(i: int, j: int):
+        first, second = groups[clusters.find(i)], groups[clusters.find(j)]
+        if first is second:
+            return
+        # Rejected if the joined cluster would be wider than radius
+        for a in first:
+            for b in second:
+                if distance_m(stops[a]['latitude'], stops[a]['longitude'],
+                              stops[b]['latitude'], stops[b]['longitude']) > radius:
+                    return
+        groups[clusters.union(i, j)] = first + second
+
+    for i, stop in enumerate(stops):
+        lat, lon = stop['latitude'], stop['longitude']
+        row, col = math.floor(lat / cell_deg), math.floor(lon / cell_deg)
+        # A longitude cell is narrower than radius away from the equator
+        span = math.ceil(1 / max(math.cos(math.radians(lat)), 0.01))
+        for r in range(row - 1, row + 2):
+            for c in range(col - span, col + span + 1):
+                for j in cells.get((r, c), ()):
+                    other = stops[j]
+                    if (distance_m(lat, lon, other['latitude'], other['longitude']) <= radius
+                            and similar(keys[i], keys[j], min_similarity)):
+                        join(i, j)
+        cells.setdefault((row, col), []).append(i)
+
+    members: Dict[int, List[int]] = {}
+    for i in range(len(stops)):
+        members.setdefault(clusters.find(i), []).append(i)
+
+    kept, aliases, report = [], {}, []
+    for root in sorted(members):
+        group = members[root]
+        stop = dict(stops[root])
+        if len(group) > 1:
+            stop['latitude'] = sum(stops[i]['latitude'] for i in group) / len(group)
+            stop['longitude'] = sum(stops[i]['longitude'] for i in group) / len(group)
+            if not stop.get('landmark'):
+                stop['landmark'] = next((stops[i]['landmark'] for i in group if stops[i].get('landmark')), '')
+            merged = []
+            for i in group[1:]:
+                aliases[stops[i]['stop_id']] = stop['stop_id']
+                merged.append({'stop_id': stops[i]['stop_id'], 'stop_name': stops[i]['stop_name'],
+                               'distance_m': round(distance_m(stop['latitude'], stop['longitude'],
+                                                              stops[i]['latitude'], stops[i]['longitude']), 1)})
+            report.append({'stop_id': stop['stop_id'], 'stop_name': stop['stop_name'], 'merged': merged})
+        kept.append(stop)
+    return kept, aliases, report
+
+
+def rewrite_stop_ids(stop_ids: List[str], aliases: Dict[str, str]) -> List[str]:
+    """Route stop list on kept IDs; a stop merged into its neighbour is visited once"""
+    rewritten = []
+    for stop_id in stop_ids:
+        stop_id = aliases.get(stop_id, stop_id)
+        if not rewritten or rewritten[-1] != stop_id:
+            rewritten.append(stop_id)
+    return rewritten
+
+
+def dedupe_network(data: Dict, radius: float = MERGE_RADIUS,
+                   min_similarity: float = MIN_SIMILARITY) -> Tuple[Dict, List[Dict]]:
+    """An exported {"bus_stops", "bus_routes"} file with duplicates merged, and the merge report"""
+    stops, aliases, report = dedupe_stops(data['bus_stops'], radius, min_similarity)
+    routes = [{**route, 'stops': rewrite_stop_ids(route['stops'], aliases)} for route in data['bus_routes']]
+    return {**data, 'bus_stops': stops, 'bus_routes': routes}, report
+
+
+def print_report(report: List[Dict], total: int):
+    merged = sum(len(entry['merged']) for entry in report)
+    print(f"🧹 Merged {merged} duplicate stops into {len(report)} ({total} -> {total - merged} stops)")
+    for entry in report:
+        names = ', '.join(f"{m['stop_name']} ({m['stop_id']}, {m['distance_m']}m)" for m in entry['merged'])
+        print(f"  {entry['stop_name']} ({entry['stop_id']}) <- {names}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge duplicate stops in an exported bus data file")
+    parser.add_argument('input')
+    parser.add_argument('-o', '--output', help="defaults to overwriting the input")
+    parser.add_argument('--radius', type=float, default=MERGE_RADIUS, help="metres")
+    parser.add_argument('--min-similarity', type=float, default=MIN_SIMILARITY)
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    deduped, report = dedupe_network(data, args.radius, args.min_similarity)
+    print_report(report, len(data['bus_stops']))
+    with open(args.output or args.input, 'w', encoding='utf-8') as f:
+        json.dump(deduped, f, indent=2, ensure_ascii=False)
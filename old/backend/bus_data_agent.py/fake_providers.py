@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the collection agent's providers, for throughput tests
+One server answers both APIs the agent talks to:
+
+    GET  /search                  Nominatim search (q=..., format=json)
+    POST /v1/chat/completions     OpenAI-compatible chat completions
+
+Latency, random 5xx errors and a requests-per-second limit (429 +
+Retry-After) are configurable. Answers come from a recordings file when it
+has one for the request, and are otherwise made up deterministically from
+the request, so runs are repeatable. Whatever was served can be saved as a
+recordings file for later runs. Running the file benchmarks the agent's
+whole pipeline against it:
+
+    python fake_providers.py --stops 200 --latency-ms 150 --limit-rps 20
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# Synthetic coordinates land in this box (around Kozhikode)
+BBOX = (11.15, 75.70, 11.45, 75.95)
+# Rough token count of generated text, for usage and max_tokens cut-offs
+CHARS_PER_TOKEN = 4
+
+
+def digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode('utf-8')).digest()[:8], 'big')
+
+
+def synthetic_coords(text: str):
+    h = digest(text)
+    south, west, north, east = BBOX
+    return (round(south + (h % 10007) / 10007 * (north - south), 6),
+            round(west + (h // 10007 % 10009) / 10009 * (east - west), 6))
+
+
+class FakeProviders(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, port: int = 0, latency_ms: float = 150, error_rate: float = 0.0,
+                 limit_rps: float = 0, miss_rate: float = 0.1, llm_latency_ms: float = 800,
+                 recordings: Optional[Dict] = None):
+        """
+        limit_rps: Nominatim requests per second before answering 429; 0 for no limit
+        miss_rate: share of Nominatim queries that find nothing (sends the agent to its LLM fallback)
+        """
+        super().__init__(('127.0.0.1', port), FakeProvidersHandler)
+        self.latency = latency_ms / 1000
+        self.llm_latency = llm_latency_ms / 1000
+        self.error_rate = error_rate
+        self.limit_rps = limit_rps
+        self.miss_rate = miss_rate
+        self.recordings = recordings or {}
+        self.served: Dict[str, Dict] = {'nominatim': {}, 'chat': {}}
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.counts = {'nominatim': 0, 'chat': 0, 'rate_limited': 0, 'errors': 0, 'replayed': 0}
+        self.stop_serial = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def admit(self, limited: bool) -> str:
+        """'ok', 'rate_limited' or 'error' for the next request"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start, self.window_count = now, 0
+            if limited and self.limit_rps and self.window_count >= self.limit_rps:
+                self.counts['rate_limited'] += 1
+                return 'rate_limited'
+            if limited:
+                self.window_count += 1
+            if random.random() < self.error_rate:
+                self.counts['errors'] += 1
+                return 'error'
+            return 'ok'
+
+    def recorded(self, kind: str, key: str):
+        answer = self.recordings.get(kind, {}).get(key)
+        if answer is not None:
+            with self.lock:
+                self.counts['replayed'] += 1
+        return answer
+
+    def remember(self, kind: str, key: str, answer):
+        with self.lock:
+            self.counts[kind] += 1
+            self.served[kind][key] = answer
+
+    def save_recordings(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.served, f, indent=1, ensure_ascii=False)
+
+    def start(self) -> 'FakeProviders':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    # Made-up answers, shaped like the real providers' answers to the agent's prompts
+
+    def search(self, query: str) -> List[Dict]:
+        if digest('miss:' + query) % 1000 < self.miss_rate * 1000:
+            return []
+        lat, lon = synthetic_coords(query)
+        return [{'lat': str(lat), 'lon': str(lon), 'display_name': query}]
+
+    def complete(self, prompt: str) -> str:
+        match = re.search(r'List (\d+) bus stops in ', prompt)
+        if match:
+            count = int(match.group(1))
+            with self.lock:
+                first, self.stop_serial = self.stop_serial, self.stop_serial + count
+            stops = [{'stop_name': f"Stop {n:04d}", 'address': f"Ward {n % 75 + 1}",
+                      'landmark': f"Landmark {n:04d}", 'importance': 'medium'}
+                     for n in range(first, first + count)]
+            return json.dumps({'stops': stops})
+        match = re.search(r'(\[\{"id".*?\}\])', prompt, re.DOTALL)
+        if match:
+            results = []
+            for item in json.loads(match.group(1)):
+                lat, lon = synthetic_coords(f"llm:{item['stop_name']}")
+                results.append({'id': item['id'], 'latitude': lat, 'longitude': lon})
+            return json.dumps({'results': results})
+        stop_ids = re.findall(r'\((BS\d+)\)', prompt)
+        if stop_ids:
+            rng = random.Random(digest(prompt))
+            routes = []
+            for n in range(1, min(12, max(1, len(stop_ids) // 4)) + 1):
+                stops = rng.sample(stop_ids, min(len(stop_ids), 8))
+                routes.append({'route_number': str(n), 'route_name': f"Route {n}", 'stops': stops,
+                               'operator': rng.choice(['KSRTC', 'Private']),
+                               'route_type': rng.choice(['ordinary', 'express']),
+                               'frequency_minutes': rng.choice([15, 20, 30]), 'first_bus_time': '06:00',
+                               'last_bus_time': '22:00', 'travel_time_between_stops': rng.randint(3, 8)})
+            return json.dumps(routes)
+        return '{}'
+
+
+class FakeProvidersHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, body, headers: Dict[str, str] = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def refuse(self, outcome: str) -> bool:
+        if outcome == 'rate_limited':
+            self.reply(429, {'error': {'message': 'Too Many Requests'}}, {'Retry-After': '1'})
+        elif outcome == 'error':
+            self.reply(503, {'error': {'message': 'Service unavailable'}})
+        return outcome != 'ok'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/search':
+            self.reply(404, {'error': 'Not found'})
+            return
+        time.sleep(self.server.latency)
+        if self.refuse(self.server.admit(limited=True)):
+            return
+        query = parse_qs(url.query).get('q', [''])[0]
+        answer = self.server.recorded('nominatim', query)
+        if answer is None:
+            answer = self.server.search(query)
+        self.server.remember('nominatim', query, answer)
+        self.reply(200, answer)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if urlparse(self.path).path != '/v1/chat/completions':
+            self.reply(404, {'error': {'message': 'Not found'}})
+            return
+        time.sleep(self.server.llm_latency)
+        if self.refuse(self.server.admit(limited=False)):
+            return
+        messages = body.get('messages', [])
+        key = hashlib.sha1(json.dumps(messages, sort_keys=True).encode('utf-8')).hexdigest()
+        content = self.server.recorded('chat', key)
+        if content is None:
+            content = self.server.complete(messages[-1]['content'] if messages else '')
+        self.server.remember('chat', key, content)
+
+        finish_reason = 'stop'
+        limit = body.get('max_tokens')
+        if limit and len(content) > limit * CHARS_PER_TOKEN:
+            content, finish_reason = content[:limit * CHARS_PER_TOKEN], 'length'
+        prompt_tokens = sum(len(m.get('content', '')) for m in messages) // CHARS_PER_TOKEN
+        completion_tokens = math.ceil(len(content) / CHARS_PER_TOKEN)
+        self.reply(200, {
+            'id': f"chatcmpl-{key[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake'),
+            'choices': [{'index': 0, 'finish_reason': finish_reason,
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        })
+
+
+def benchmark(stops: int = 200, latency_ms: float = 150, error_rate: float = 0.02,
+              limit_rps: float = 20, miss_rate: float = 0.1, llm_latency_ms: float = 800,
+              nominatim_rate: float = 18, recordings: Optional[Dict] = None,
+              save: Optional[str] = None) -> Dict:
+    """
+    The agent's stop generation, geocoding, dedupe and routes against the
+    stand-ins: once on an empty geocode cache, then again on the warm one
+    """
+    from openai import OpenAI
+
+    from agent import BusDataCollectionAgent
+    from geocache import GeocodeStore
+
+    server = FakeProviders(latency_ms=latency_ms, error_rate=error_rate, limit_rps=limit_rps,
+                           miss_rate=miss_rate, llm_latency_ms=llm_latency_ms, recordings=recordings).start()
+    workdir = tempfile.mkdtemp(prefix='agent_bench_')
+    store = GeocodeStore(os.path.join(workdir, 'geocode_cache.db'))
+    results = {'stops_requested': stops}
+
+    for run in ('cold', 'warm'):
+        client = OpenAI(api_key='fake', base_url=f"{server.url}/v1")
+        agent = BusDataCollectionAgent('fake', 'Kozhikode', client=client, geocode_store=store,
+                                       nominatim_url=f"{server.url}/search")
+        agent.geocoder.nominatim_rate = nominatim_rate
+        before = dict(server.counts)
+
+        started = time.perf_counter()
+        stops_data = agent.get_district_bus_stops(target=stops)
+        generated = time.perf_counter()
+        processed = agent.process_bus_stops(stops_data)
+        geocoded = time.perf_counter()
+        processed, _ = agent.dedupe_bus_stops(processed)
+        routes = agent.process_bus_routes(agent.generate_bus_routes(processed))
+        finished = time.perf_counter()
+
+        geocoder, usage = agent.geocoder.stats, agent.usage.as_dict()
+        results[run] = {
+            'stops': len(stops_data),
+            'geocoded': len(agent.collected_stops) + len(agent.stop_aliases),
+            'routes': len(routes),
+            'stop_generation_seconds': generated - started,
+            'geocoding_seconds': geocoded - generated,
+            'geocoded_per_s': len(stops_data) / (geocoded - generated),
+            'pipeline_seconds': finished - started,
+            'stops_per_s': len(stops_data) / (finished - started),
+            'cache_hit_rate': geocoder['cache'] / len(stops_data) if stops_data else 0.0,
+            'nominatim_requests': geocoder['requests'],
+            'nominatim_retries': geocoder['retries'],
+            'llm_estimates': geocoder['openai'],
+            'llm_requests': usage['requests'],
+            'llm_tokens': usage['total_tokens'],
+            'llm_truncated': usage['truncated_responses'],
+            'server_429s': server.counts['rate_limited'] - before['rate_limited'],
+            'server_5xx': server.counts['errors'] - before['errors'],
+            'server_replayed': server.counts['replayed'] - before['replayed'],
+        }
+        # Same stop names next time, so the warm run finds them in the cache
+        server.stop_serial = 0
+
+    results['geocode_store'] = store.stats()
+    if save:
+        server.save_recordings(save)
+    server.shutdown()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Collection agent throughput against local provider stand-ins")
+    parser.add_argument('--stops', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=150, help="Nominatim answer latency")
+    parser.add_argument('--llm-latency-ms', type=float, default=800)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--limit-rps', type=float, default=20, help="Nominatim server-side limit; 0 for none")
+    parser.add_argument('--miss-rate', type=float, default=0.1, help="share of Nominatim queries with no match")
+    parser.add_argument('--nominatim-rate', type=float, default=18, help="agent's Nominatim token bucket rate")
+    parser.add_argument('--recordings', help="replay answers from this file where it has them")
+    parser.add_argument('--save', metavar='PATH', help="write every answer served to PATH")
+    parser.add_argument('--serve', type=int, metavar='PORT', help="only run the stand-ins on PORT")
+    args = parser.parse_args()
+
+    recordings = None
+    if args.recordings:
+        with open(args.recordings, 'r', encoding='utf-8') as f:
+            recordings = json.load(f)
+
+    if args.serve:
+        server = FakeProviders(args.serve, args.latency_ms, args.error_rate, args.limit_rps,
+                               args.miss_rate, args.llm_latency_ms, recordings)
+        print(f"🧪 Provider stand-ins on {server.url} "
+              f"(set NOMINATIM_URL={server.url}/search and OPENAI_BASE_URL={server.url}/v1)")
+        try:
+            server.serve_forever()
+        finally:
+            if args.save:
+                server.save_recordings(args.save)
+    else:
+        results = benchmark(args.stops, args.latency_ms, args.error_rate, args.limit_rps, args.miss_rate,
+                            args.llm_latency_ms, args.nominatim_rate, recordings, args.save)
+        for run in ('cold', 'warm'):
+            print(f"\n📊 {run.capitalize()} geocode cache")
+            for name, value in results[run].items():
+                print(f"  {name}: {value:.2f}" if isinstance(value, float) else f"  {name}: {value}")
+        print(f"\n📊 Geocode store: {results['geocode_store']}")
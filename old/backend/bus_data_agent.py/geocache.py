@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Persistent geocoding cache for the collection agent
+Keyed on the normalized (stop_name, address, district, state) so reruns and
+districts that share stops reuse earlier answers instead of queueing behind
+Nominatim's one-request-per-second limit again. Each entry remembers which
+provider produced it; LLM estimates expire sooner than real geocodes so
+they get another chance at a proper answer.
+"""
+
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_DB = os.getenv('AGENT_GEOCODE_CACHE_DB',
+                       os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geocode_cache.db'))
+DAY = 24 * 3600
+PROVIDER_TTL = {'nominatim': 180 * DAY, 'openai': 30 * DAY}
+DEFAULT_TTL = 30 * DAY
+# SQLite caps the number of bound parameters per statement
+PREFETCH_CHUNK = 500
+
+# (latitude, longitude, provider)
+CachedCoords = Tuple[float, float, str]
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+
+class GeocodeStore:
+    def __init__(self, path: str = DEFAULT_DB, provider_ttl: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.provider_ttl = provider_ttl if provider_ttl is not None else PROVIDER_TTL
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocodes (
+                key TEXT PRIMARY KEY,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                provider TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(stop_name: str, address: str, district: str, state: str) -> str:
+        return '|'.join(normalize(part) for part in (stop_name, address, district, state))
+
+    def prefetch(self, keys: Iterable[str]) -> Dict[str, CachedCoords]:
+        """Every live entry among keys, in a few bulk reads"""
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found: Dict[str, CachedCoords] = {}
+        for start in range(0, len(keys), PREFETCH_CHUNK):
+            chunk = keys[start:start + PREFETCH_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT key, latitude, longitude, provider FROM geocodes '
+                f'WHERE key IN ({placeholders}) AND expires_at > ?', (*chunk, now))
+            for key, lat, lon, provider in rows:
+                found[key] = (lat, lon, provider)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: List[Tuple[str, float, float, str]]):
+        """(key, lat, lon, provider) rows in one transaction"""
+        if not entries:
+            return
+        now = time.time()
+        rows = [(key, lat, lon, provider, now, now + self.provider_ttl.get(provider, DEFAULT_TTL))
+                for key, lat, lon, provider in entries]
+        with self.conn:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def purge_expired(self) -> int:
+        return self.conn.execute('DELETE FROM geocodes WHERE expires_at <= ?', (time.time(),)).rowcount
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        by_provider = dict(self.conn.execute('SELECT provider, COUNT(*) FROM geocodes GROUP BY provider'))
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'stored': by_provider}
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Concurrent geocoding for the collection agent
+Stops are geocoded together on one pooled async HTTP client. A token bucket
+per provider keeps each one at its allowed request rate, a semaphore bounds
+how many LLM fallbacks run at once, and results come back in input order.
+Wall time is set by the provider rate limits rather than the sum of latencies.
+"""
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from geocache import GeocodeStore
+
+NOMINATIM_URL = os.getenv('NOMINATIM_URL', 'https://nominatim.openstreetmap.org/search')
+# Nominatim's usage policy allows at most one request per second
+NOMINATIM_RATE = float(os.getenv('NOMINATIM_RATE', '1.0'))
+LLM_CONCURRENCY = int(os.getenv('GEOCODE_LLM_CONCURRENCY', '4'))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class AsyncTokenBucket:
+    """
+    `rate` requests per second with bursts up to `burst`. Callers reserve a
+    slot under the lock and sleep outside it, so waiters are served in order.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Provider asked us to back off: push every later slot back"""
+        self.tokens -= seconds * self.rate
+
+
+@dataclass
+class GeocodeResult:
+    latitude: Optional[float]
+    longitude: Optional[float]
+    provider: Optional[str] = None  # 'cache', 'nominatim', 'openai' or None if unresolved
+
+
+class GeocodingPipeline:
+    def __init__(self, district: str, state: str,
+                 estimate: Callable[[str, str], Tuple[Optional[float], Optional[float]]],
+                 cache: Optional[Dict[str, Tuple[float, float]]] = None,
+                 store: Optional[GeocodeStore] = None,
+                 estimate_batch: Optional[Callable[[List[Dict]], List[Optional[Tuple[float, float]]]]] = None,
+                 nominatim_url: str = NOMINATIM_URL, nominatim_rate: float = NOMINATIM_RATE,
+                 llm_concurrency: int = LLM_CONCURRENCY, max_retries: int = 3,
+                 timeout: float = 10, user_agent: str = 'BusDataAgent/1.0'):
+        """
+        estimate: blocking (stop_name, address) -> (lat, lon) fallback, run in a thread
+        cache: in-process GeocodeStore.key -> (lat, lon) mapping, read and filled in
+        store: persistent cache; entries for the whole batch are prefetched up
+        front and new results written back when the batch ends
+        estimate_batch: blocking many-stops fallback; when given, every Nominatim
+        miss is estimated together after the lookups instead of one by one
+        """
+        self.district = district
+        self.state = state
+        self.estimate = estimate
+        self.cache = cache if cache is not None else {}
+        self.store = store
+        self.estimate_batch = estimate_batch
+        self.nominatim_url = nominatim_url
+        self.nominatim_rate = nominatim_rate
+        self.llm_concurrency = llm_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.stats = {'requests': 0, 'retries': 0, 'cache': 0, 'nominatim': 0, 'openai': 0, 'failed': 0}
+
+    def cache_key(self, stop: Dict) -> str:
+        return GeocodeStore.key(stop['stop_name'], stop['address'], self.district, self.state)
+
+    async def _nominatim(self, client: httpx.AsyncClient, bucket: AsyncTokenBucket,
+                         stop: Dict) -> Optional[Tuple[float, float]]:
+        params = {
+            'q': f"{stop['stop_name']}, {stop['address']}, {self.district}, {self.state}, India",
+            'format': 'json',
+            'limit': 1,
+            'countrycodes': 'in',
+        }
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            self.stats['requests'] += 1
+            try:
+                response = await client.get(self.nominatim_url, params=params)
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code == 200:
+                    # A block page or malformed body fails this attempt, not the whole batch
+                    try:
+                        data = response.json()
+                        return (float(data[0]['lat']), float(data[0]['lon'])) if data else None
+                    except (ValueError, KeyError, TypeError, IndexError) as e:
+                        error = f"bad response: {type(e).__name__}: {e}"
+                else:
+                    error = f"HTTP {response.status_code}"
+                    if response.status_code not in RETRY_STATUSES:
+                        break
+                    if response.status_code == 429:
+                        try:
+                            bucket.pause(float(response.headers.get('Retry-After') or 1))
+                        except ValueError:  # HTTP-date form
+                            bucket.pause(1)
+            if attempt < self.max_retries:
+                self.stats['retries'] += 1
+                await asyncio.sleep(0.5 * (2 ** attempt) * (0.5 + random.random()))
+        print(f"⚠️  Nominatim gave up on {stop['stop_name']}: {error}")
+        return None
+
+    async def _geocode_one(self, client: httpx.AsyncClient, bucket: AsyncTokenBucket,
+                           llm_slots: asyncio.Semaphore, stop: Dict) -> GeocodeResult:
+        key = self.cache_key(stop)
+        if key in self.cache:
+            self.stats['cache'] += 1
+            return GeocodeResult(*self.cache[key], 'cache')
+
+        coords = await self._nominatim(client, bucket, stop)
+        provider = 'nominatim'
+        if coords is None and self.estimate_batch is not None:
+            return GeocodeResult(None, None)  # estimated with the other misses in geocode_all
+        if coords is None:
+            # Fallback: Use OpenAI to estimate coordinates
+            async with llm_slots:
+                lat, lon = await asyncio.to_thread(self.estimate, stop['stop_name'], stop['address'])
+            coords = (lat, lon) if lat and lon else None
+            provider = 'openai'
+
+        return self._resolved(key, coords, provider)
+
+    def _resolved(self, key: str, coords: Optional[Tuple[float, float]], provider: str) -> GeocodeResult:
+        if coords is None:
+            self.stats['failed'] += 1
+            return GeocodeResult(None, None)
+        self.stats[provider] += 1
+        self.cache[key] = coords
+        self._new_entries.append((key, coords[0], coords[1], provider))
+        return GeocodeResult(coords[0], coords[1], provider)
+
+    async def _geocode_indexed(self, client: httpx.AsyncClient, bucket: AsyncTokenBucket,
+                               llm_slots: asyncio.Semaphore, index: int, stop: Dict,
+                               on_result: Optional[Callable[[int, GeocodeResult], None]]) -> GeocodeResult:
+        result = await self._geocode_one(client, bucket, llm_slots, stop)
+        if on_result is not None and result.provider is not None:
+            on_result(index, result)
+        return result
+
+    async def geocode_all(self, stops: List[Dict],
+                          on_result: Optional[Callable[[int, GeocodeResult], None]] = None) -> List[GeocodeResult]:
+        """
+        Geocode every stop concurrently; result i belongs to stops[i].
+        on_result(i, result) is called as soon as each stop is resolved.
+        """
+        if self.store is not None:
+            missing = [key for key in map(self.cache_key, stops) if key not in self.cache]
+            for key, (lat, lon, _) in self.store.prefetch(missing).items():
+                self.cache[key] = (lat, lon)
+
+        bucket = AsyncTokenBucket(self.nominatim_rate)
+        llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        limits = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+        self._new_entries = []
+        try:
+            async with httpx.AsyncClient(limits=limits, timeout=self.timeout,
+                                         headers={'User-Agent': self.user_agent}) as client:
+                results = await asyncio.gather(*(self._geocode_indexed(client, bucket, llm_slots, i, stop, on_result)
+                                                 for i, stop in enumerate(stops)))
+            if self.estimate_batch is not None:
+                misses = [i for i, result in enumerate(results) if result.provider is None]
+                if misses:
+                    estimates = await asyncio.to_thread(self.estimate_batch, [stops[i] for i in misses])
+                    for i, coords in zip(misses, estimates):
+                        results[i] = self._resolved(self.cache_key(stops[i]), coords, 'openai')
+                        if on_result is not None and results[i].provider is not None:
+                            on_result(i, results[i])
+            return results
+        finally:
+            # Whatever was resolved is kept, even if the batch was interrupted
+            if self.store is not None:
+                self.store.put_many(self._new_entries)
+
+    def run(self, stops: List[Dict],
+            on_result: Optional[Callable[[int, GeocodeResult], None]] = None) -> List[GeocodeResult]:
+        started = time.time()
+        results = asyncio.run(self.geocode_all(stops, on_result))
+        self.stats['seconds'] = round(time.time() - started, 2)
+        return results
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Helpers for batched LLM requests in the collection agent
+Parsing of JSON answers that may have been cut off at max_tokens, and token
+and wall-time accounting across all requests of a run.
+"""
+
+import json
+import threading
+from typing import Dict, List, Tuple
+
+
+def salvage_objects(text: str) -> List[Dict]:
+    """Every complete object in the first JSON array of text, even if the text stops mid-array"""
+    start = text.find('[')
+    if start < 0:
+        return []
+    decoder = json.JSONDecoder()
+    items = []
+    i = start + 1
+    while True:
+        while i < len(text) and text[i] in ' \t\r\n,':
+            i += 1
+        if i >= len(text) or text[i] == ']':
+            break
+        try:
+            obj, i = decoder.raw_decode(text, i)
+        except json.JSONDecodeError:
+            break  # the cut-off object
+        if isinstance(obj, dict):
+            items.append(obj)
+    return items
+
+
+def parse_items(content: str, key: str) -> Tuple[List[Dict], bool]:
+    """
+    Items under key in a {"key": [...]} answer (a bare array is accepted too).
+    Returns (items, complete); incomplete answers keep what could be parsed.
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return salvage_objects(content), False
+    items = data.get(key, []) if isinstance(data, dict) else data
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else [], True
+
+
+class LLMUsage:
+    """Token and time totals over every request of a run"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.truncated = 0
+        self.retried_items = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, response, seconds: float):
+        usage = getattr(response, 'usage', None)
+        with self._lock:
+            self.requests += 1
+            self.seconds += seconds
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
+            if response.choices and response.choices[0].finish_reason == 'length':
+                self.truncated += 1
+
+    def add_retries(self, count: int):
+        with self._lock:
+            self.retried_items += count
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'total_tokens': self.prompt_tokens + self.completion_tokens,
+                'truncated_responses': self.truncated,
+                'retried_items': self.retried_items,
+                'request_seconds': round(self.seconds, 2),
+            }
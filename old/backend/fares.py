@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Table-driven bus fares
+Fares come from tables per (operator, route type): a boarding fare plus a
+fare per stage, an optional published fare-by-stages list, a minimum fare
+and a discount for transferring between buses of the same operator. Every
+route gets its cumulative stage count per stop and its fares by number of
+stages up front, so a segment fare is one subtraction and one lookup.
+
+Tables can be overridden with a JSON file (FARES_FILE, default fares.json
+beside the data files):
+
+    {"tables": [{"operator": "KSRTC", "route_type": "express",
+                 "base": 15, "per_stage": 2, "minimum": 15}]}
+
+"operator" and "route_type" default to "*" (any). The built-in tables give
+the fares the finder has always charged.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+FARES_FILE = os.getenv('FARES_FILE', os.path.join(DATA_DIR, 'fares.json'))
+ANY = '*'
+
+
+@dataclass(frozen=True)
+class FareTable:
+    base: float                  # boarding fare
+    per_stage: float             # added for every fare stage travelled
+    stops_per_stage: int = 1     # stage length, for routes without published stage points
+    minimum: float = 0.0
+    # Published fares by number of stages; the base + per_stage rule applies past its end
+    stage_fares: Tuple[float, ...] = ()
+    # Off a ride boarded as a transfer from a bus of the same operator
+    transfer_discount: float = 0.0
+
+    def fare(self, stages: int) -> float:
+        if stages < len(self.stage_fares):
+            fare = self.stage_fares[stages]
+        else:
+            fare = self.base + stages * self.per_stage
+        return max(fare, self.minimum)
+
+
+DEFAULT_TABLES: Dict[Tuple[str, str], FareTable] = {
+    (ANY, 'express'): FareTable(base=15.0, per_stage=2.0),
+    (ANY, ANY): FareTable(base=8.0, per_stage=1.5),
+}
+
+
+def load_fare_tables(path: str = FARES_FILE) -> Dict[Tuple[str, str], FareTable]:
+    """Built-in tables, overridden per (operator, route_type) by the JSON file if there is one"""
+    tables = dict(DEFAULT_TABLES)
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for entry in json.load(f).get('tables', []):
+                entry = dict(entry)
+                key = (entry.pop('operator', ANY), entry.pop('route_type', ANY))
+                entry['stage_fares'] = tuple(entry.get('stage_fares', ()))
+                tables[key] = FareTable(**entry)
+        print(f"💰 Fare tables loaded from {path}")
+    return tables
+
+
+@dataclass
+class RouteFares:
+    """One route's table with its stage count at every stop and fares by stages travelled"""
+    table: FareTable
+    stage_at: List[int]
+    fare_by_stages: List[float]
+
+    def fare(self, from_idx: int, to_idx: int) -> float:
+        return self.fare_by_stages[self.stage_at[to_idx] - self.stage_at[from_idx]]
+
+
+class FareEngine:
+    def __init__(self, tables: Optional[Dict[Tuple[str, str], FareTable]] = None):
+        self.tables = tables if tables is not None else load_fare_tables()
+        self.routes: Dict[str, RouteFares] = {}
+
+    def table_for(self, operator: str, route_type: str) -> FareTable:
+        for key in ((operator, route_type), (operator, ANY), (ANY, route_type), (ANY, ANY)):
+            if key in self.tables:
+                return self.tables[key]
+        raise KeyError(f"No fare table for {operator} {route_type}")
+
+    def add_route(self, route: Dict) -> RouteFares:
+        """
+        Precompute a route's fares. A route may list "fare_stages", the stop_ids
+        where fare stages begin; otherwise a stage is every stops_per_stage stops.
+        """
+        table = self.table_for(route.get("operator", ANY), route.get("route_type", ANY))
+        stops = route["stops"]
+        if route.get("fare_stages"):
+            stage_points = set(route["fare_stages"])
+            stage_at, stage = [], 0
+            for i, stop_id in enumerate(stops):
+                if i and stop_id in stage_points:
+                    stage += 1
+                stage_at.append(stage)
+        else:
+            stage_at = [i // table.stops_per_stage for i in range(len(stops))]
+        most_stages = stage_at[-1] if stops else 0
+        fares = RouteFares(table, stage_at, [table.fare(stages) for stages in range(most_stages + 1)])
+        self.routes[route["route_id"]] = fares
+        return fares
+
+    def segment_fare(self, route_id: str, from_idx: int, to_idx: int) -> float:
+        return self.routes[route_id].fare(from_idx, to_idx)
+
+    def transfer_discount(self, previous_operator: Optional[str], segment) -> float:
+        """Discount on a RouteSegment boarded straight off a bus of previous_operator"""
+        if previous_operator != segment.operator:
+            return 0.0
+        table = self.routes[segment.route_id].table
+        return min(table.transfer_discount, max(segment.fare - table.minimum, 0.0))
+
+    def journey_fare(self, segments: Sequence) -> float:
+        total, previous_operator = 0.0, None
+        for segment in segments:
+            total += segment.fare - self.transfer_discount(previous_operator, segment)
+            previous_operator = segment.operator
+        return total
@@ -6,12 +6,25 @@ Implements complete pathfinding with live bus timing information
 
 import json
 import math
+import os
 import heapq
-from typing import List, Dict, Tuple, Optional, Set
+import random
+import sys
+import time
+import tracemalloc
+from typing import List, Dict, Tuple, Optional
 from datetime import datetime, timedelta
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 
-def load_bus_data_from_files(stops_file="backend/bus_stops.json", routes_file="backend/bus_routes.json"):
+from fares import FareEngine
+from scoring import DEFAULT_PROFILE, ScoringProfile, rank_journeys
+from shapes import format_distance, haversine, route_shape
+from skyline import Criteria, dominates, skyline_mask
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_bus_data_from_files(stops_file=os.path.join(DATA_DIR, "bus_stops.json"),
+                             routes_file=os.path.join(DATA_DIR, "bus_routes.json")):
     """Load and format bus data from external JSON files"""
     try:
         # Load bus stops
@@ -57,6 +70,10 @@ def load_bus_data_from_files(stops_file="backend/bus_stops.json", routes_file="b
                 "last_bus_time": route.get("last_bus_time", "22:00"),
                 "travel_time_between_stops": route.get("travel_time_between_stops", 5)
             }
+            # Optional fields (fares.py, shapes.py) pass through as given
+            for key in ("fare_stages", "shape"):
+                if route.get(key):
+                    formatted_route[key] = route[key]
             formatted_routes.append(formatted_route)
         
         return {
@@ -77,8 +94,11 @@ print(BUS_DATA)
 
 # Sample data with enhanced scheduling information
 
+# The graph holds a RouteSegment and BusSchedule per edge; without a
+# __dict__ each one is about half the size (dataclass slots need 3.10+)
+SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+@dataclass(**SLOTS)
 class BusSchedule:
     """Real-time bus schedule information"""
     route_id: str
@@ -89,7 +109,7 @@ class BusSchedule:
     subsequent_arrivals: List[datetime]
     minutes_until_next: int
 
-@dataclass
+@dataclass(**SLOTS)
 class RouteSegment:
     """Represents one segment of a journey (single bus ride)"""
     route_id: str
@@ -104,9 +124,11 @@ class RouteSegment:
     stops_count: int
     fare: float
     route_type: str
-    schedule: BusSchedule  # Real-time schedule info
+    schedule: Optional[BusSchedule]  # Real-time schedule info; None on graph edges (see scheduled)
+    from_index: int = 0  # position of from_stop_id in the route's stops
+    distance_m: float = 0.0  # along the route shape
 
-@dataclass
+@dataclass(**SLOTS)
 class Journey:
     """Complete journey from origin to destination with real-time info"""
     segments: List[RouteSegment]
@@ -119,27 +141,128 @@ class Journey:
     departure_time: datetime
     arrival_time: datetime
     next_departure_in_minutes: int
+    # Metres between alighting and boarding stops at each transfer
+    transfer_distances: List[float] = field(default_factory=list)
     
     def __post_init__(self):
         self.total_transfers = len(self.segments) - 1
         self.total_stops = sum(seg.stops_count for seg in self.segments)
         self.total_fare = sum(seg.fare for seg in self.segments)
 
-@dataclass
-class PathState:
-    """State in pathfinding algorithm"""
-    current_stop: str
-    total_cost: float
-    total_duration: int
-    transfers: int
-    segments: List[RouteSegment]
-    visited_routes: Set[str]
-    current_time: datetime
+def journey_criteria(journey: Journey) -> Criteria:
+    """What dominance between journeys is judged on"""
+    return (journey.total_duration, journey.total_transfers, journey.total_fare, journey.walking_distance)
+
+class PathLabel:
+    """
+    Search label: the ride that reached a stop and the label it extends.
+    Labels share their parents' paths, so pushing one copies nothing; the
+    segment list is rebuilt only for journeys that are returned.
+    """
+    __slots__ = ('stop', 'cost', 'transfers', 'segment', 'parent')
+    
+    def __init__(self, stop: str, cost: float, transfers: int,
+                 segment: Optional['RouteSegment'] = None, parent: Optional['PathLabel'] = None):
+        self.stop = stop
+        self.cost = cost
+        self.transfers = transfers
+        self.segment = segment
+        self.parent = parent
     
     def __lt__(self, other):
-        if self.total_cost != other.total_cost:
-            return self.total_cost < other.total_cost
+        if self.cost != other.cost:
+            return self.cost < other.cost
         return self.transfers < other.transfers
+    
+    def uses_route(self, route_id: str) -> bool:
+        label = self
+        while label.segment is not None:
+            if label.segment.route_id == route_id:
+                return True
+            label = label.parent
+        return False
+    
+    def segments(self) -> List['RouteSegment']:
+        path = []
+        label = self
+        while label.segment is not None:
+            path.append(label.segment)
+            label = label.parent
+        path.reverse()
+        return path
+
+class SearchBudget:
+    """
+    Time budget for one search. expired() only reads the clock every
+    CHECK_EVERY calls, so it is cheap enough for the inner search loop.
+    deadline is a time.monotonic() timestamp; None means unbounded.
+    """
+    CHECK_EVERY = 128
+    
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.exhausted = False
+        self._countdown = 1
+    
+    def expired(self) -> bool:
+        if self.deadline is None or self.exhausted:
+            return self.exhausted
+        self._countdown -= 1
+        if self._countdown <= 0:
+            return self.check()
+        return self.exhausted
+    
+    def extend(self, seconds: float):
+        """Push the deadline back for time spent on something other than searching"""
+        if self.deadline is not None:
+            self.deadline += seconds
+    
+    def check(self) -> bool:
+        """expired(), reading the clock now; for the boundaries between search phases"""
+        if self.deadline is not None and not self.exhausted:
+            self._countdown = self.CHECK_EVERY
+            self.exhausted = time.monotonic() >= self.deadline
+        return self.exhausted
+
+class RouteResults(list):
+    """Search results; partial is True when the deadline cut the search short"""
+    
+    def __init__(self, items=(), partial: bool = False):
+        super().__init__(items)
+        self.partial = partial
+
+class StopGrid:
+    """
+    Uniform lat/lng grid over the stops, so a nearest-stop query only looks
+    at the cells within the walking radius instead of every stop
+    """
+    METERS_PER_DEGREE = 111320
+    
+    def __init__(self, stops: Dict[str, Dict], cell_meters: float = 500):
+        self.cell_deg = cell_meters / self.METERS_PER_DEGREE
+        # (row, col) -> [(stop_id, lat, lon)]
+        self.cells: Dict[Tuple[int, int], List[Tuple[str, float, float]]] = {}
+        for stop_id, stop_data in stops.items():
+            lat, lon = stop_data["latitude"], stop_data["longitude"]
+            self.cells.setdefault(self.cell(lat, lon), []).append((stop_id, lat, lon))
+    
+    def cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+    
+    def candidates(self, lat: float, lon: float, radius: float):
+        """Stops in every cell overlapping the radius-metre box around (lat, lon)"""
+        dlat = radius / self.METERS_PER_DEGREE
+        dlon = radius / (self.METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        row0, col0 = self.cell(lat - dlat, lon - dlon)
+        row1, col1 = self.cell(lat + dlat, lon + dlon)
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > len(self.cells):
+            # Huge radius: walking the occupied cells is cheaper
+            for entries in self.cells.values():
+                yield from entries
+            return
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                yield from self.cells.get((row, col), ())
 
 class AdvancedBusRouteFinder:
     def __init__(self):
@@ -147,7 +270,11 @@ class AdvancedBusRouteFinder:
         self.routes = {}
         self.stop_routes = {}
         self.route_graph = {}
+        self.stop_grid = None
+        self.shapes = {}
+        self.fares = FareEngine()
         self.current_time = datetime.now()
+        self.schedules = {}
         self.load_BUS_DATA()
         self.build_route_graph()
     
@@ -157,9 +284,12 @@ class AdvancedBusRouteFinder:
         
         for stop_data in BUS_DATA["bus_stops"]:
             self.stops[stop_data["stop_id"]] = stop_data
+        self.stop_grid = StopGrid(self.stops)
         
         for route_data in BUS_DATA["bus_routes"]:
             self.routes[route_data["route_id"]] = route_data
+            self.fares.add_route(route_data)
+            self.shapes[route_data["route_id"]] = route_shape(route_data, self.stops)
             
             for stop_id in route_data["stops"]:
                 if stop_id not in self.stop_routes:
@@ -243,9 +373,30 @@ class AdvancedBusRouteFinder:
             minutes_until_next=minutes_until_next
         )
     
+    def refresh_schedules(self, now: Optional[datetime] = None):
+        """
+        Move the finder to a new query time. Departures are worked out again
+        as they are needed; the graph itself doesn't depend on the time, so
+        it stays as built (and shared with forked workers).
+        """
+        self.current_time = now or datetime.now()
+        self.schedules = {}
+    
+    def schedule_for(self, route_id: str, stop_id: str) -> BusSchedule:
+        """Next departures of a route from a stop at current_time, computed once per query"""
+        key = (route_id, stop_id)
+        schedule = self.schedules.get(key)
+        if schedule is None:
+            schedule = self.schedules[key] = self.get_next_bus_times(route_id, stop_id)
+        return schedule
+    
+    def scheduled(self, segment: RouteSegment) -> RouteSegment:
+        """Copy of a graph edge carrying its bus's current departures"""
+        return replace(segment, schedule=self.schedule_for(segment.route_id, segment.from_stop_id))
+    
     def build_route_graph(self):
-        """Build a graph representation with real-time scheduling"""
-        print("🔄 Building route network graph with real-time data...")
+        """Build the graph once; schedules are attached to returned journeys per query"""
+        print("🔄 Building route network graph...")
         
         self.route_graph = {}
         
@@ -264,9 +415,6 @@ class AdvancedBusRouteFinder:
                         if target_stop == stop_id:
                             continue
                         
-                        # Get real-time schedule
-                        schedule = self.get_next_bus_times(route_id, stop_id)
-                        
                         duration = self.calculate_segment_duration(route_id, current_idx, target_idx)
                         fare = self.calculate_segment_fare(route_id, current_idx, target_idx)
                         
@@ -283,12 +431,14 @@ class AdvancedBusRouteFinder:
                             stops_count=target_idx - current_idx,
                             fare=fare,
                             route_type=route["route_type"],
-                            schedule=schedule
+                            schedule=None,
+                            from_index=current_idx,
+                            distance_m=self.shapes[route_id].distance(current_idx, target_idx)
                         )
                         
                         self.route_graph[stop_id].append(segment)
         
-        print("✅ Route graph built with real-time scheduling")
+        print("✅ Route graph built")
     
     def calculate_segment_duration(self, route_id: str, from_idx: int, to_idx: int) -> int:
         """Calculate duration for a route segment"""
@@ -298,18 +448,8 @@ class AdvancedBusRouteFinder:
         return stops_count * route["travel_time_between_stops"]
     
     def calculate_segment_fare(self, route_id: str, from_idx: int, to_idx: int) -> float:
-        """Calculate fare for a route segment"""
-        route = self.routes[route_id]
-        stops_count = to_idx - from_idx
-        
-        if route["route_type"] == "express":
-            base_fare = 15.0
-            per_stop = 2.0
-        else:
-            base_fare = 8.0
-            per_stop = 1.5
-        
-        return base_fare + (stops_count * per_stop)
+        """Calculate fare for a route segment (fare tables in fares.py)"""
+        return self.fares.segment_fare(route_id, from_idx, to_idx)
     
     def calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Calculate distance between coordinates using Haversine formula"""
@@ -327,17 +467,24 @@ class AdvancedBusRouteFinder:
         
         return R * c
     
-    def find_nearest_stops(self, lat: float, lon: float, max_distance: float = 1000) -> List[Tuple[str, float]]:
+    def stop_distance(self, from_stop: str, to_stop: str) -> float:
+        if from_stop == to_stop:
+            return 0.0
+        a, b = self.stops[from_stop], self.stops[to_stop]
+        return haversine(a["latitude"], a["longitude"], b["latitude"], b["longitude"])
+    
+    def find_nearest_stops(self, lat: float, lon: float, max_distance: float = 1000,
+                           limit: int = 3) -> List[Tuple[str, float]]:
         """Find nearest bus stops to given coordinates"""
         nearby_stops = []
         
-        for stop_id, stop_data in self.stops.items():
-            distance = self.calculate_distance(lat, lon, stop_data["latitude"], stop_data["longitude"])
+        for stop_id, stop_lat, stop_lon in self.stop_grid.candidates(lat, lon, max_distance):
+            distance = self.calculate_distance(lat, lon, stop_lat, stop_lon)
             if distance <= max_distance:
                 nearby_stops.append((stop_id, distance))
         
         nearby_stops.sort(key=lambda x: x[1])
-        return nearby_stops[:3]
+        return nearby_stops[:limit]
     
     def format_journey_output(self, journey: Journey) -> Dict:
         """Format journey in the requested output structure"""
@@ -357,21 +504,24 @@ class AdvancedBusRouteFinder:
                 })
                 walking_added = True
             
-            # Add bus segment
+            # Add bus segment; route_id and stop indexes fetch its shape from /route_shape
             plan.append({
                 'type': 'bus',
-                'distance': f"{segment.stops_count * 2}km",  # Approximate distance
+                'distance': format_distance(segment.distance_m),
                 'route_number': segment.route_number,
                 'from': segment.from_stop_name,
                 'to': segment.to_stop_name,
-                'operator': segment.operator
+                'operator': segment.operator,
+                'route_id': segment.route_id,
+                'from_index': segment.from_index,
+                'to_index': segment.from_index + segment.stops_count
             })
             
-            # Add transfer segments (auto/taxi) between buses
+            # Walk from the alighting stop to the next boarding stop (0m when they're the same)
             if i < len(journey.segments) - 1:
                 plan.append({
-                    'type': 'auto',  # Could be 'taxi' based on distance
-                    'distance': '500m'  # Transfer distance
+                    'type': 'walk',
+                    'distance': format_distance(journey.transfer_distances[i])
                 })
         
         # Format subsequent bus times
@@ -394,46 +544,109 @@ class AdvancedBusRouteFinder:
     
     def find_routes_with_realtime(self, origin_lat: float, origin_lon: float, 
                                  dest_lat: float, dest_lon: float, 
-                                 max_transfers: int = 2,max_walkingsdis: int = 1000) -> List[Dict]:
+                                 max_transfers: int = 2,max_walkingsdis: int = 1000,
+                                 deadline: Optional[float] = None,
+                                 profile: ScoringProfile = DEFAULT_PROFILE) -> RouteResults:
         """Find routes and return in the requested format"""
-        print("🔍 Finding routes with real-time information...")
-        
-        # Update current time
-        self.current_time = datetime.now()
-        
-        # Rebuild graph with current time
-        self.build_route_graph()
-        
-        # Find nearest stops
-        origin_stops = self.find_nearest_stops(origin_lat, origin_lon, max_walkingsdis)
-        dest_stops = self.find_nearest_stops(dest_lat, dest_lon, max_walkingsdis)
-        
-        if not origin_stops or not dest_stops:
-            return []
-        
-        all_journeys = []
-        
-        # Simple pathfinding for demo (can be enhanced with full Dijkstra)
-        for origin_stop_id, origin_walking_dist in origin_stops[:2]:  # Limit for performance
-            for dest_stop_id, dest_walking_dist in dest_stops[:2]:
-                
-                if origin_stop_id == dest_stop_id:
-                    continue
-                
-                # Find direct routes first
-                journeys = self.find_direct_routes(origin_stop_id, dest_stop_id, origin_walking_dist, dest_walking_dist)
-                all_journeys.extend(journeys)
-        
-        # Sort by departure time and quality
-        all_journeys.sort(key=lambda x: (x.next_departure_in_minutes, x.journey_score))
+        journeys = self.find_journeys_with_realtime(origin_lat, origin_lon, dest_lat, dest_lon,
+                                                    max_transfers, max_walkingsdis, deadline=deadline,
+                                                    profile=profile)
         
         # Format output
-        formatted_results = []
-        for journey in all_journeys[:5]:  # Top 5 results
+        formatted_results = RouteResults(partial=journeys.partial)
+        for journey in journeys:
             formatted_results.append(self.format_journey_output(journey))
         
         return formatted_results
     
+    def find_journeys_with_realtime(self, origin_lat: float, origin_lon: float,
+                                    dest_lat: float, dest_lon: float,
+                                    max_transfers: int = 2, max_walkingsdis: int = 1000,
+                                    limit: int = 5, deadline: Optional[float] = None,
+                                    profile: ScoringProfile = DEFAULT_PROFILE) -> RouteResults:
+        """
+        Best journeys under profile, unformatted, for callers that serialize
+        them themselves. When the deadline passes, the best journeys found so
+        far are returned with partial=True.
+        """
+        budget = SearchBudget(deadline)
+        all_journeys = list(self.iter_routes_with_realtime(origin_lat, origin_lon, dest_lat, dest_lon,
+                                                           max_transfers, max_walkingsdis, budget, profile))
+        
+        # Dominated journeys dropped, the rest scored together; the default
+        # profile puts the soonest departure first
+        keep = skyline_mask([journey_criteria(journey) for journey in all_journeys])
+        non_dominated = [journey for journey, kept in zip(all_journeys, keep) if kept]
+        return RouteResults(rank_journeys(non_dominated, profile, limit), partial=budget.exhausted)
+    
+    def iter_routes_with_realtime(self, origin_lat: float, origin_lon: float,
+                                  dest_lat: float, dest_lon: float,
+                                  max_transfers: int = 2, max_walkingsdis: int = 1000,
+                                  budget: Optional[SearchBudget] = None,
+                                  profile: ScoringProfile = DEFAULT_PROFILE):
+        """
+        Yield journeys as soon as they are found: every non-dominated direct
+        route first, ranked by profile, then multi-transfer journeys in the
+        order the search settles them, skipping any that a journey already
+        yielded dominates.
+        Stops early once budget expires (check budget.exhausted afterwards).
+        """
+        print("🔍 Finding routes with real-time information...")
+        
+        # Departures at the current time; the graph is built once, in __init__
+        self.refresh_schedules()
+        
+        od_pairs = self.find_stop_pairs(origin_lat, origin_lon, dest_lat, dest_lon, max_walkingsdis)
+        if not od_pairs:
+            return
+        
+        # Direct routes are cheap to find, so they go out first
+        direct_journeys = []
+        for origin_stop_id, dest_stop_id, origin_walking_dist, dest_walking_dist in od_pairs:
+            direct_journeys.extend(self.find_direct_routes(origin_stop_id, dest_stop_id,
+                                                           origin_walking_dist, dest_walking_dist))
+        keep = skyline_mask([journey_criteria(journey) for journey in direct_journeys])
+        yielded = [journey for journey, kept in zip(direct_journeys, keep) if kept]
+        yield from rank_journeys(yielded, profile, len(yielded))
+        
+        if max_transfers == 0:
+            return
+        
+        seen = {self.journey_key(journey) for journey in direct_journeys}
+        for origin_stop_id, dest_stop_id, origin_walking_dist, dest_walking_dist in od_pairs:
+            if budget is not None and budget.check():
+                return
+            for journey in self.iter_dijkstra_pathfind(origin_stop_id, dest_stop_id, max_transfers,
+                                                      origin_walking_dist + dest_walking_dist, budget):
+                key = self.journey_key(journey)
+                if journey.total_transfers == 0 or key in seen:
+                    continue
+                seen.add(key)
+                criteria = journey_criteria(journey)
+                if any(dominates(journey_criteria(earlier), criteria) for earlier in yielded):
+                    continue
+                yielded.append(journey)
+                journey.journey_score = profile.score(journey.total_duration, journey.total_transfers,
+                                                      journey.total_fare, journey.walking_distance)
+                yield journey
+    
+    def find_stop_pairs(self, origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float,
+                        max_walking_distance: float, limit: int = 2) -> List[Tuple[str, str, float, float]]:
+        """Candidate (origin_stop, dest_stop, origin_walk, dest_walk) pairs for a query"""
+        origin_stops = self.find_nearest_stops(origin_lat, origin_lon, max_walking_distance)
+        dest_stops = self.find_nearest_stops(dest_lat, dest_lon, max_walking_distance)
+        
+        pairs = []
+        for origin_stop_id, origin_walking_dist in origin_stops[:limit]:  # Limit for performance
+            for dest_stop_id, dest_walking_dist in dest_stops[:limit]:
+                if origin_stop_id != dest_stop_id:
+                    pairs.append((origin_stop_id, dest_stop_id, origin_walking_dist, dest_walking_dist))
+        return pairs
+    
+    def journey_key(self, journey: Journey) -> Tuple:
+        """Identity of a journey by the rides it takes"""
+        return tuple((seg.route_id, seg.from_stop_id, seg.to_stop_id) for seg in journey.segments)
+    
     def find_direct_routes(self, origin_stop: str, dest_stop: str, origin_walking: float, dest_walking: float) -> List[Journey]:
         """Find direct routes between two stops"""
         journeys = []
@@ -442,6 +655,7 @@ class AdvancedBusRouteFinder:
         for segment in self.route_graph.get(origin_stop, []):
             if segment.to_stop_id == dest_stop:
                 # Direct route found
+                segment = self.scheduled(segment)
                 journey = Journey(
                     segments=[segment],
                     total_duration=segment.duration_minutes + segment.schedule.minutes_until_next,
@@ -449,32 +663,256 @@ class AdvancedBusRouteFinder:
                     total_fare=segment.fare,
                     walking_distance=origin_walking + dest_walking,
                     total_stops=segment.stops_count,
-                    journey_score=0,
+                    journey_score=0,  # Scored with the other candidates when ranked
                     departure_time=segment.schedule.next_departure,
                     arrival_time=segment.schedule.next_arrival,
                     next_departure_in_minutes=segment.schedule.minutes_until_next
                 )
                 
-                journey.journey_score = self.calculate_journey_score(
-                    journey.total_duration, journey.total_transfers, 
-                    journey.total_fare, journey.walking_distance
-                )
-                
                 journeys.append(journey)
         
         return journeys
     
-    def calculate_journey_score(self, duration: int, transfers: int, fare: float, walking_distance: float) -> float:
-        """Calculate overall journey score for ranking"""
-        duration_weight = 1.0
-        transfer_weight = 20.0
-        fare_weight = 0.5
-        walking_weight = 0.01
-        
-        return (duration * duration_weight + 
-                transfers * transfer_weight + 
-                fare * fare_weight + 
-                walking_distance * walking_weight)
+    def calculate_journey_score(self, duration: int, transfers: int, fare: float, walking_distance: float,
+                                profile: ScoringProfile = DEFAULT_PROFILE) -> float:
+        """Calculate overall journey score for ranking (ranking itself scores in bulk, see scoring.py)"""
+        return profile.score(duration, transfers, fare, walking_distance)
+    
+    def one_to_all_times(self, origin_stop: str, max_transfers: int = 2) -> Dict[str, int]:
+        """
+        Travel time in minutes from origin_stop to every reachable stop, using
+        the same model as build_journey (wait for the first bus, half a
+        headway at each transfer). One search answers every destination.
+        """
+        # Every graph edge is one boarding, so a label is (minutes, boardings, stop)
+        pq = [(0, 0, origin_stop)]
+        best_by_boardings: Dict[str, List[Tuple[int, int]]] = {}
+        best: Dict[str, int] = {}
+        max_boardings = max_transfers + 1
+        
+        while pq:
+            minutes, boardings, stop = heapq.heappop(pq)
+            
+            # Skip labels dominated by one with no more boardings and no more time
+            settled = best_by_boardings.setdefault(stop, [])
+            if any(b <= boardings and m <= minutes for b, m in settled):
+                continue
+            settled.append((boardings, minutes))
+            if boardings and minutes < best.get(stop, minutes + 1):
+                best[stop] = minutes
+            
+            if boardings == max_boardings:
+                continue
+            
+            for segment in self.route_graph.get(stop, []):
+                if boardings == 0:
+                    wait = self.schedule_for(segment.route_id, stop).minutes_until_next
+                else:
+                    wait = self.routes[segment.route_id]["frequency_minutes"] // 2
+                heapq.heappush(pq, (minutes + wait + segment.duration_minutes, boardings + 1, segment.to_stop_id))
+        
+        return best
+    
+    def one_to_all_fares(self, origin_stop: str, max_transfers: int = 2) -> Dict[str, float]:
+        """
+        Cheapest fare from origin_stop to every reachable stop, transfer
+        discounts included; the fare counterpart of one_to_all_times
+        """
+        # A label is (fare, boardings, stop, operator of the bus we got off or '')
+        pq = [(0.0, 0, origin_stop, '')]
+        settled: Dict[Tuple[str, str], List[Tuple[int, float]]] = {}
+        best: Dict[str, float] = {}
+        max_boardings = max_transfers + 1
+        
+        while pq:
+            fare, boardings, stop, operator = heapq.heappop(pq)
+            
+            labels = settled.setdefault((stop, operator), [])
+            if any(b <= boardings and f <= fare for b, f in labels):
+                continue
+            labels.append((boardings, fare))
+            if boardings and fare < best.get(stop, math.inf):
+                best[stop] = fare
+            
+            if boardings == max_boardings:
+                continue
+            
+            for segment in self.route_graph.get(stop, []):
+                discount = self.fares.transfer_discount(operator, segment)
+                heapq.heappush(pq, (fare + segment.fare - discount, boardings + 1,
+                                    segment.to_stop_id, segment.operator))
+        
+        return best
+    
+    def build_journey(self, segments: List[RouteSegment], walking_distance: float) -> Journey:
+        """Assemble a multi-segment journey, waiting half a headway at each transfer"""
+        segments = [self.scheduled(segment) for segment in segments]
+        first_segment = segments[0]
+        ride_minutes = sum(seg.duration_minutes for seg in segments)
+        transfer_wait = sum(self.routes[seg.route_id]["frequency_minutes"] // 2 for seg in segments[1:])
+        
+        journey = Journey(
+            segments=segments,
+            total_duration=first_segment.schedule.minutes_until_next + ride_minutes + transfer_wait,
+            total_transfers=0,  # Calculated in __post_init__
+            total_fare=0,  # Calculated in __post_init__
+            walking_distance=walking_distance,
+            total_stops=0,  # Calculated in __post_init__
+            journey_score=0,  # Scored with the other candidates when ranked
+            departure_time=first_segment.schedule.next_departure,
+            arrival_time=first_segment.schedule.next_departure + timedelta(minutes=ride_minutes + transfer_wait),
+            next_departure_in_minutes=first_segment.schedule.minutes_until_next
+        )
+        # Transfer discounts apply to the journey, not to single rides
+        journey.total_fare = self.fares.journey_fare(segments)
+        journey.transfer_distances = [self.stop_distance(a.to_stop_id, b.from_stop_id)
+                                      for a, b in zip(segments, segments[1:])]
+        return journey
+    
+    def find_all_routes(self, origin_lat: float, origin_lon: float, 
+                       dest_lat: float, dest_lon: float, 
+                       max_transfers: int = 3, max_walking_distance: float = 1000,
+                       deadline: Optional[float] = None,
+                       profile: ScoringProfile = DEFAULT_PROFILE) -> RouteResults:
+        """
+        Complete pathfinding algorithm using modified Dijkstra's algorithm
+        Finds all possible routes with comprehensive transfer options.
+        When the deadline passes, ranks what was found so far (partial=True).
+        """
+        budget = SearchBudget(deadline)
+        print("🔍 Finding optimal routes...")
+        
+        origin_stops = self.find_nearest_stops(origin_lat, origin_lon, max_walking_distance)
+        dest_stops = self.find_nearest_stops(dest_lat, dest_lon, max_walking_distance)
+        
+        if not origin_stops or not dest_stops:
+            print("❌ No nearby bus stops found!")
+            return RouteResults()
+        
+        all_journeys = []
+        for origin_stop_id, origin_walking_dist in origin_stops:
+            for dest_stop_id, dest_walking_dist in dest_stops:
+                if origin_stop_id == dest_stop_id or budget.check():
+                    continue
+                
+                all_journeys.extend(self.dijkstra_pathfind(origin_stop_id, dest_stop_id, max_transfers,
+                                                           origin_walking_dist + dest_walking_dist, budget))
+        
+        if budget.exhausted:
+            print(f"⏱️  Search deadline reached; ranking {len(all_journeys)} journeys found so far")
+        return RouteResults(self.filter_and_rank_journeys(all_journeys, max_transfers, profile),
+                            partial=budget.exhausted)
+    
+    def dijkstra_pathfind(self, origin_stop: str, dest_stop: str, max_transfers: int,
+                          walking_distance: float = 0, budget: Optional[SearchBudget] = None) -> List[Journey]:
+        """Dijkstra's algorithm implementation for bus route pathfinding"""
+        return list(self.iter_dijkstra_pathfind(origin_stop, dest_stop, max_transfers, walking_distance, budget))
+    
+    def iter_dijkstra_pathfind(self, origin_stop: str, dest_stop: str, max_transfers: int,
+                               walking_distance: float = 0, budget: Optional[SearchBudget] = None):
+        """
+        Yield journeys to dest_stop in the order the search reaches them (cheapest first).
+        Returns early, keeping what was already yielded, once budget expires.
+        """
+        # Priority queue: (cost, stop, label)
+        pq = [(0, origin_stop, PathLabel(origin_stop, 0, 0))]
+        
+        # Track best cost to reach each (stop, transfer_count) state
+        best_costs = {}
+        
+        while pq:
+            if budget is not None and budget.expired():
+                return
+            
+            current_cost, current_stop, label = heapq.heappop(pq)
+            
+            if label.transfers > max_transfers:
+                continue
+            
+            if current_stop == dest_stop and label.segment is not None:
+                yield self.build_journey(label.segments(), walking_distance)
+                continue
+            
+            # Pruning: skip if we've found a better path to this state
+            state_key = (current_stop, label.transfers)
+            if state_key in best_costs and best_costs[state_key] < current_cost:
+                continue
+            best_costs[state_key] = current_cost
+            
+            for segment in self.route_graph.get(current_stop, []):
+                
+                # Skip if this would create a loop (visiting same route again)
+                if label.uses_route(segment.route_id):
+                    continue
+                
+                # Every ride after the first is on another route, so it's a transfer
+                new_transfers = label.transfers + (label.segment is not None)
+                if new_transfers > max_transfers:
+                    continue
+                cost = current_cost + segment.duration_minutes + (new_transfers * 15)  # Transfer penalty
+                # Labels the pruning above would discard on arrival are never queued
+                target_best = best_costs.get((segment.to_stop_id, new_transfers))
+                if target_best is not None and target_best < cost and segment.to_stop_id != dest_stop:
+                    continue
+                heapq.heappush(pq, (cost, segment.to_stop_id,
+                                    PathLabel(segment.to_stop_id, cost, new_transfers, segment, label)))
+    
+    def filter_and_rank_journeys(self, journeys: List[Journey], max_transfers: int,
+                                 profile: ScoringProfile = DEFAULT_PROFILE) -> List[Journey]:
+        """Filter impractical routes and rank by quality"""
+        if not journeys:
+            return []
+        
+        print(f"🔍 Filtering from {len(journeys)} possible journeys...")
+        
+        # Step 1: Basic filtering
+        filtered = []
+        for journey in journeys:
+            if (journey.total_transfers <= max_transfers and 
+                journey.total_duration <= 180 and  # Max 3 hours
+                journey.walking_distance <= 2000):  # Max 2km walking
+                filtered.append(journey)
+        
+        if not filtered:
+            return []
+        
+        # Step 2: Remove dominated routes
+        # A route is dominated if another route is better in all aspects
+        keep = skyline_mask([journey_criteria(journey) for journey in filtered])
+        non_dominated = [journey for journey, kept in zip(filtered, keep) if kept]
+        
+        # Step 3: Rank by journey score (lower is better)
+        print(f"✅ Filtered to {len(non_dominated)} optimal journeys")
+        return rank_journeys(non_dominated, profile, 10, soonest_first=False)  # Return top 10
+
+def measure_search_memory(finder: AdvancedBusRouteFinder, searches: int = 50,
+                          max_transfers: int = 3, seed: int = 0) -> Dict[str, float]:
+    """
+    Peak memory traced (tracemalloc) during a stop-to-stop search, and time
+    per search untraced, over random pairs of the finder's stops
+    """
+    rng = random.Random(seed)
+    stop_ids = list(finder.stops)
+    pairs = [tuple(rng.sample(stop_ids, 2)) for _ in range(searches)]
+    
+    peaks, journeys = [], 0
+    tracemalloc.start()
+    try:
+        for origin, dest in pairs:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            journeys += len(finder.dijkstra_pathfind(origin, dest, max_transfers))
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    
+    started = time.perf_counter()
+    for origin, dest in pairs:
+        finder.dijkstra_pathfind(origin, dest, max_transfers)
+    elapsed = time.perf_counter() - started
+    return {'searches': searches, 'journeys': journeys,
+            'peak_kib': sum(peaks) / len(peaks) / 1024, 'max_peak_kib': max(peaks) / 1024,
+            'ms_per_search': elapsed / searches * 1000}
 
 # Example usage and testing
 def main():
@@ -522,4 +960,18 @@ def main():
         routes.append(singleobj)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Real-time bus route finder")
+    parser.add_argument('--memory', type=int, metavar='SEARCHES',
+                        help="measure search memory over this many random stop pairs instead of the demo")
+    parser.add_argument('--max-transfers', type=int, default=3)
+    args = parser.parse_args()
+    
+    if args.memory:
+        results = measure_search_memory(AdvancedBusRouteFinder(), args.memory, args.max_transfers)
+        print("\n📊 Search memory")
+        for name, value in results.items():
+            print(f"  {name}: {value:.1f}" if isinstance(value, float) else f"  {name}: {value}")
+    else:
+        main()
\ No newline at end of file
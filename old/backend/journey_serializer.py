@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Fast journey serialization
+Writes route responses straight from Journey objects into JSON text built
+from preencoded name fragments, instead of formatting nested dicts with
+format_journey_output and encoding them again with jsonify. MessagePack is
+available for the mobile client when the msgpack package is installed.
+"""
+
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from shapes import format_distance
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are optional
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# JSON string literals for stop names, route names, operators... A network has
+# a fixed set of them, so each is encoded once per process
+_fragments: Dict[str, str] = {}
+
+
+def fragment(text: str) -> str:
+    """JSON literal for text, cached"""
+    encoded = _fragments.get(text)
+    if encoded is None:
+        encoded = json.dumps(text, ensure_ascii=False)
+        _fragments[text] = encoded
+    return encoded
+
+
+def dumps(obj) -> bytes:
+    """Generic fast JSON encoder for envelopes and non-journey payloads"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def clock_time(moment: datetime) -> str:
+    """Same text as strftime('%I:%M %p') without going through strftime"""
+    hour = moment.hour % 12 or 12
+    return f"{hour:02d}:{moment.minute:02d} {'AM' if moment.hour < 12 else 'PM'}"
+
+
+def next_bus_minutes(journey, current_time: datetime) -> List[int]:
+    first_segment = journey.segments[0]
+    return [int((dept_time - current_time).total_seconds() / 60)
+            for dept_time in first_segment.schedule.subsequent_departures[:2]]
+
+
+def encode_journey(journey, current_time: datetime) -> str:
+    """One journey as JSON text, matching format_journey_output field for field"""
+    first_segment = journey.segments[0]
+    walking = f"{journey.walking_distance:.0f}m"
+
+    plan = []
+    last = len(journey.segments) - 1
+    for i, segment in enumerate(journey.segments):
+        if i == 0 and journey.walking_distance > 0:
+            plan.append('{"type":"walk","distance":"%s"}' % walking)
+        plan.append('{"type":"bus","distance":"%s","route_number":%s,"from":%s,"to":%s,"operator":%s,'
+                    '"route_id":%s,"from_index":%d,"to_index":%d}' % (
+            format_distance(segment.distance_m),
+            fragment(segment.route_number),
+            fragment(segment.from_stop_name),
+            fragment(segment.to_stop_name),
+            fragment(segment.operator),
+            fragment(segment.route_id),
+            segment.from_index,
+            segment.from_index + segment.stops_count,
+        ))
+        if i < last:
+            plan.append('{"type":"walk","distance":"%s"}' % format_distance(journey.transfer_distances[i]))
+
+    next_buses = ','.join('"%d minutes"' % m for m in next_bus_minutes(journey, current_time))
+    return (
+        '{"bus_name":%s,"departure_in":"%d","next_buses":[%s],"arrival":"%s","duration":"%dh %dm",'
+        '"transfers":"%d","fare":"₹%.0f","walking_distance":"%s","plan":[%s]}' % (
+            fragment(f"{first_segment.route_number} - {first_segment.route_name}"),
+            first_segment.schedule.minutes_until_next,
+            next_buses,
+            clock_time(journey.arrival_time),
+            journey.total_duration // 60, journey.total_duration % 60,
+            journey.total_transfers,
+            journey.total_fare,
+            walking,
+            ','.join(plan),
+        )
+    )
+
+
+def encode_routes_json(journeys, current_time: datetime, extra: Optional[Dict] = None) -> bytes:
+    """Complete {"routes": [...], ...extra} response body"""
+    body = '{"routes":[' + ','.join(encode_journey(j, current_time) for j in journeys) + ']'
+    if extra:
+        body += ',' + dumps(extra).decode('utf-8')[1:-1]
+    return (body + '}').encode('utf-8')
+
+
+def journey_record(journey, current_time: datetime) -> list:
+    """
+    Compact positional record for binary clients:
+    [bus_name, departure_in, next_buses, arrival, duration_min, transfers,
+     fare, walking_m, [[route_number, from, to, operator, stops_count, distance_m], ...],
+     transfer_walk_m]
+    transfer_walk_m[i] is the walk between bus legs i and i + 1, as in the
+    JSON plan's walk steps. Numbers stay numbers; the client formats them.
+    """
+    first_segment = journey.segments[0]
+    return [
+        f"{first_segment.route_number} - {first_segment.route_name}",
+        first_segment.schedule.minutes_until_next,
+        next_bus_minutes(journey, current_time),
+        clock_time(journey.arrival_time),
+        journey.total_duration,
+        journey.total_transfers,
+        round(journey.total_fare, 2),
+        round(journey.walking_distance),
+        [[s.route_number, s.from_stop_name, s.to_stop_name, s.operator, s.stops_count, round(s.distance_m)]
+         for s in journey.segments],
+        [round(distance) for distance in journey.transfer_distances],
+    ]
+
+
+def encode_routes_msgpack(journeys, current_time: datetime, extra: Optional[Dict] = None) -> bytes:
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    payload = {'routes': [journey_record(j, current_time) for j in journeys]}
+    if extra:
+        payload.update(extra)
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def wants_msgpack(accept_header: str) -> bool:
+    return msgpack is not None and any(m in accept_header for m in MSGPACK_MIMETYPES)
+
+
+def benchmark(finder, origin, dest, rounds: int = 2000) -> Dict[str, float]:
+    """Microseconds per response: old dict + json path vs this module"""
+    journeys = finder.find_journeys_with_realtime(*origin, *dest, 4, 5000)
+    now = finder.current_time
+    results = {'journeys': len(journeys)}
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        json.dumps({'routes': [finder.format_journey_output(j) for j in journeys]})
+    results['format_journey_output_us'] = (time.perf_counter() - started) / rounds * 1e6
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        encode_routes_json(journeys, now)
+    results['encode_routes_json_us'] = (time.perf_counter() - started) / rounds * 1e6
+
+    if msgpack is not None:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            encode_routes_msgpack(journeys, now)
+        results['encode_routes_msgpack_us'] = (time.perf_counter() - started) / rounds * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    from findbus import AdvancedBusRouteFinder
+
+    finder = AdvancedBusRouteFinder()
+    stops = list(finder.stops.values())
+    origin = (stops[0]["latitude"], stops[0]["longitude"])
+    dest = (stops[-1]["latitude"], stops[-1]["longitude"])
+    print("\n📊 Serialization cost per response")
+    for name, value in benchmark(finder, origin, dest).items():
+        print(f"  {name}: {value:.1f}" if isinstance(value, float) else f"  {name}: {value}")
@@ -3,23 +3,57 @@
 
 from modulefinder import test
 from turtle import distance
-from flask import Flask, request, jsonify, send_from_directory, render_template_string
+from flask import Flask, Response, request, jsonify, send_from_directory, render_template_string, stream_with_context
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import random
 import math
 import json
-from findbus import AdvancedBusRouteFinder
+from findbus import AdvancedBusRouteFinder, SearchBudget
+from scoring import DEFAULT_PROFILE, get_profile
+from singleflight import SingleFlight, FlightTimeout
+from static_assets import StaticAssets
+import prefork
+from admission import AdmissionController, Overloaded
+import odmatrix
+import journey_serializer
+import shapes
+import argparse
+import threading
 import time
 import os
 
 FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../frontend'))
+# Output of build_assets.py: hashed, precompressed copies of FRONTEND_DIR
+ASSETS_DIR = os.getenv('ASSETS_DIR', os.path.join(FRONTEND_DIR, 'dist'))
 
-app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
+# Static files go through static_proxy below rather than Flask's own static route
+app = Flask(__name__, static_folder=None)
 CORS(app, origins=['*'])  # Allow requests from any origin for development
 routes = []
+assets = StaticAssets(ASSETS_DIR)
 
-# finder = AdvancedBusRouteFinder()
+finder = None
+finder_lock = threading.Lock()
+search_lock = threading.Lock()
+
+# Coalesces identical in-flight route searches (e.g. everyone leaving college at once)
+route_flight = SingleFlight()
+ROUTE_WAIT_TIMEOUT = float(os.getenv('ROUTE_WAIT_TIMEOUT', '20'))
+# Upper bound on time spent searching one query; past it the best journeys
+# found so far are returned flagged partial
+ROUTE_SEARCH_BUDGET = float(os.getenv('ROUTE_SEARCH_BUDGET_MS', '1500')) / 1000
+# Larger batches belong in the odmatrix.py CLI, which uses every core
+BATCH_MAX_CELLS = int(os.getenv('BATCH_MAX_CELLS', '10000'))
+
+# Searches are CPU-bound and serialized per process (scale out with --workers),
+# so only a short queue is worth keeping; the rest get a fast 503
+admission = AdmissionController(
+    max_concurrent=int(os.getenv('ROUTE_MAX_CONCURRENT', '1')),
+    max_queue=int(os.getenv('ROUTE_MAX_QUEUE', '32')),
+    queue_timeout=float(os.getenv('ROUTE_QUEUE_TIMEOUT', '2.0')),
+    degrade_queue_depth=int(os.getenv('ROUTE_DEGRADE_QUEUE_DEPTH', '8')),
+)
 
 
 # Health check route
@@ -94,107 +128,347 @@ def testpass():
     return response
     
 
-# @app.route('/find_buses', methods=['POST', 'OPTIONS'])
-# def find_buses():
-#     time.sleep(1)
-#     # Handle preflight requests
-#     if request.method == 'OPTIONS':
-#         response = jsonify({'status': 'ok'})
-#         response.headers.add('Access-Control-Allow-Origin', '*')
-#         response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
-#         response.headers.add('Access-Control-Allow-Methods', 'POST')
-#         return response
-    
-#     data = request.get_json()
-#     from_place = data.get('from', 'Unknown')
-#     to_place = data.get('to', 'Unknown')
-    
-#     # Parse structured place data
-#     from_place_data = None
-#     to_place_data = None
-    
-#     try:
-#         if data.get('fromPlaceData'):
-#             from_place_data = json.loads(data.get('fromPlaceData'))
-#         if data.get('toPlaceData'):
-#             to_place_data = json.loads(data.get('toPlaceData'))
-#     except json.JSONDecodeError as e:
-#         print(f"Error parsing place data: {e}")
-    
-#     print(f"Route request: {from_place} → {to_place}")
-    
-#     if to_place_data and from_place_data:
-#         print(f"From: {from_place_data.get('name')} ({from_place_data.get('place_id')}) at {from_place_data.get('coordinates')}")
-#         print(f"To: {to_place_data.get('name')} ({to_place_data.get('place_id')}) at {to_place_data.get('coordinates')}")
-        
-#         # Generate realistic sample data based on the locations
-        
-#         # Example: Find routes from Central Station area to University area
-#         # origin_lat, origin_lon = 11.2588, 75.7804  # Near Central Station
-#         # dest_lat, dest_lon = 11.1271, 75.8449      # Near University
-#         origin_lat, origin_lon = from_place_data.get('coordinates')["lat"],from_place_data.get('coordinates')["lng"]      # Near University  # Near Central Station
-#         dest_lat, dest_lon = to_place_data.get('coordinates')["lat"],to_place_data.get('coordinates')["lng"]      # Near University
-        
-#         results = finder.find_routes_with_realtime(origin_lat, origin_lon, dest_lat, dest_lon,4,5000)
-        
-#         print("\n🚌 REAL-TIME BUS ROUTE RESULTS")
-#         print("=" * 60)
-
-#         print(results)
-#         for i, result in enumerate(results, 1):
-#             print(f"\nOption {i}:")
-#             print(f"Bus: {result['bus_name']}")
-#             print(f"Departure in: {result['departure_in']}")
-#             print(f"Next buses: {', '.join(result['next_buses'])}")
-#             print(f"Arrival: {result['arrival']}")
-#             print(f"Duration: {result['duration']}")
-#             print(f"Transfers: {result['transfers']}")
-#             print(f"Fare: {result['fare']}")
-#             print(f"Walking: {result['walking_distance']}")
-#             print("\nJourney Plan:")
-#             for j, step in enumerate(result['plan'], 1):
-#                 print(f"  {j}. {step['type'].title()}: {step['distance']}")
-#             print("-" * 40)
-
-#         for i, result in enumerate(results, 1):
-#             plan = []
-#             for j , step in enumerate(result['plan'],1):
-#                 singlplan = {'type': step['type'].title(), 'distance': step['distance']}            
-#                 plan.append(singlplan)
-#             singleobj = {
-#                 'bus_name': result['bus_name'],
-#                 'departure_in': result['departure_in'],
-#                 'arrival': result['arrival'],
-#                 'duration': result['duration'],
-#                 'transfers': result['transfers'],
-#                 'fare': result['fare'],
-#                 'plan': plan
-#             }
-#             routes.append(singleobj)
+def parse_place_coordinates(data):
+    """Pull (origin_lat, origin_lon, dest_lat, dest_lon) out of a route request body"""
+    coords = []
+    for field in ('fromPlaceData', 'toPlaceData'):
+        place_data = data.get(field)
+        try:
+            if isinstance(place_data, str):
+                place_data = json.loads(place_data)
+            point = place_data['coordinates']
+            coords.extend([float(point['lat']), float(point['lng'])])
+        except (TypeError, KeyError, ValueError) as e:
+            print(f"Error parsing {field}: {e}")
+            return None
+    return tuple(coords)
 
-    
-#     # Sample bus routes with new structure
-    
-    
-#     response = jsonify({'routes': routes})
-#     response.headers.add('Access-Control-Allow-Origin', '*')
-#     print("send compledte")   
 
-#     return response
+def parse_search_limits(data, max_transfers=4, max_walking=5000):
+    """(maxTransfers, maxWalking) from a route request body; ValueError when they aren't numbers"""
+    try:
+        return int(data.get('maxTransfers', max_transfers)), int(data.get('maxWalking', max_walking))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"maxTransfers and maxWalking must be numbers: {e}") from None
+
+
+def route_query_key(coords, max_transfers, max_walking, profile=DEFAULT_PROFILE):
+    """Key identical route queries share; ~10m coordinate precision"""
+    return tuple(round(c, 4) for c in coords) + (max_transfers, max_walking, profile.name)
+
+
+def get_finder():
+    """Build the route finder on first use"""
+    global finder
+    with finder_lock:
+        if finder is None:
+            finder = AdvancedBusRouteFinder()
+    return finder
+
+
+def search_routes(coords, max_transfers, max_walking, profile=DEFAULT_PROFILE):
+    """Run one admitted search; under pressure only direct routes are searched"""
+    with admission.admit() as ticket:
+        if ticket.degraded:
+            max_transfers = 0
+        # Searches share the finder's query time and schedules, so they must not interleave
+        with search_lock:
+            route_finder = get_finder()
+            journeys = route_finder.find_journeys_with_realtime(
+                *coords, max_transfers, max_walking, deadline=time.monotonic() + ROUTE_SEARCH_BUDGET,
+                profile=profile)
+            current_time = route_finder.current_time
+    # 'encoded' memoizes response bodies so coalesced waiters share the bytes
+    return {'journeys': journeys, 'current_time': current_time, 'degraded': ticket.degraded,
+            'partial': journeys.partial, 'encoded': {}}
+
+
+def encoded_body(result, use_msgpack):
+    """Serialize a search result once per format"""
+    fmt = 'msgpack' if use_msgpack else 'json'
+    body = result['encoded'].get(fmt)
+    if body is None:
+        encode = (journey_serializer.encode_routes_msgpack if use_msgpack
+                  else journey_serializer.encode_routes_json)
+        body = encode(result['journeys'], result['current_time'],
+                      {'degraded': result['degraded'], 'partial': result['partial']})
+        result['encoded'][fmt] = body
+    return body
+
+
+def overloaded_response(error):
+    response = jsonify({'error': 'Server busy, please retry', 'retry_after': error.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+
+@app.route('/find_buses', methods=['POST', 'OPTIONS'])
+def find_buses():
+    # Handle preflight requests
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'ok'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+        response.headers.add('Access-Control-Allow-Methods', 'POST')
+        return response
+
+    data = request.get_json(silent=True) or {}
+    coords = parse_place_coordinates(data)
+    if coords is None:
+        return jsonify({'error': 'fromPlaceData and toPlaceData must include coordinates'}), 400
+
+    try:
+        max_transfers, max_walking = parse_search_limits(data)
+        profile = get_profile(data.get('profile'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    print(f"Route request: {data.get('from', 'Unknown')} → {data.get('to', 'Unknown')} ({profile.name})")
+
+    # Identical queries arriving together share a single search
+    key = route_query_key(coords, max_transfers, max_walking, profile)
+    try:
+        result = route_flight.do(key, lambda: search_routes(coords, max_transfers, max_walking, profile),
+                                 timeout=ROUTE_WAIT_TIMEOUT)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except FlightTimeout:
+        return jsonify({'error': 'Route search timed out'}), 504
+    except Exception as e:
+        print(f"❌ Route search failed: {e}")
+        return jsonify({'error': 'Route search failed'}), 500
+
+    use_msgpack = journey_serializer.wants_msgpack(request.headers.get('Accept', ''))
+    response = Response(encoded_body(result, use_msgpack),
+                        mimetype='application/msgpack' if use_msgpack else journey_serializer.JSON_MIMETYPE)
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+def stream_route_events(coords, max_transfers, max_walking, profile=DEFAULT_PROFILE, on_searched=None):
+    """
+    Route search events as (type, JSON text): one per journey as it is
+    found, then a final 'done'. The search lock is taken for finding and
+    encoding each journey and released before it is written, so a slow
+    reader never blocks other searches, and only time spent searching
+    counts against the budget. on_searched() is called once the search is
+    over, before the last event is written.
+    """
+    started = time.time()
+    count = 0
+    budget = SearchBudget(time.monotonic() + ROUTE_SEARCH_BUDGET)
+    route_finder = get_finder()
+    journeys = route_finder.iter_routes_with_realtime(*coords, max_transfers, max_walking, budget, profile)
+    query_time = None
+    released = None
+    while True:
+        with search_lock:
+            if released is not None:
+                budget.extend(time.monotonic() - released)
+            # Another search may have moved the finder's clock while we were writing
+            if query_time is not None and route_finder.current_time != query_time:
+                route_finder.refresh_schedules(query_time)
+            failed = False
+            route_json = None
+            try:
+                journey = next(journeys, None)
+                if journey is not None:
+                    route_json = journey_serializer.encode_journey(journey, route_finder.current_time)
+            except Exception as e:
+                print(f"❌ Route search failed: {e}")
+                failed = True
+            query_time = route_finder.current_time
+        released = time.monotonic()
+        if (failed or route_json is None) and on_searched is not None:
+            on_searched()
+        if failed:
+            yield 'error', json.dumps({'type': 'error', 'error': 'Route search failed'})
+            return
+        if route_json is None:
+            break
+        count += 1
+        yield 'journey', '{"type":"journey","route":' + route_json + '}'
+    yield 'done', json.dumps({'type': 'done', 'count': count, 'partial': budget.exhausted,
+                              'elapsed_ms': int((time.time() - started) * 1000)})
+
+
+@app.route('/find_buses/stream', methods=['POST', 'OPTIONS'])
+def find_buses_stream():
+    """
+    Streaming variant of /find_buses. Sends NDJSON by default, or
+    Server-Sent Events when the client accepts text/event-stream.
+    """
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'ok'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+        response.headers.add('Access-Control-Allow-Methods', 'POST')
+        return response
+
+    data = request.get_json(silent=True) or {}
+    coords = parse_place_coordinates(data)
+    if coords is None:
+        return jsonify({'error': 'fromPlaceData and toPlaceData must include coordinates'}), 400
+
+    try:
+        max_transfers, max_walking = parse_search_limits(data)
+        profile = get_profile(data.get('profile'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+
+    try:
+        ticket = admission.acquire()
+    except Overloaded as e:
+        return overloaded_response(e)
+    if ticket.degraded:
+        max_transfers = 0
+
+    def generate():
+        # The slot is freed as soon as the search is done, not when a slow
+        # client has finished reading, and if the client goes away mid-stream
+        try:
+            for event_type, payload in stream_route_events(coords, max_transfers, max_walking, profile,
+                                                           on_searched=ticket.release):
+                if use_sse:
+                    yield f"event: {event_type}\ndata: {payload}\n\n"
+                else:
+                    yield payload + '\n'
+        finally:
+            ticket.release()
+
+    response = Response(stream_with_context(generate()),
+                        mimetype='text/event-stream' if use_sse else 'application/x-ndjson')
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    # Stop proxies from buffering the stream, which would defeat the point
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Safety net for a response closed before the generator ever ran
+    response.call_on_close(ticket.release)
+    return response
+
+def parse_points(items):
+    """[{'id', 'lat', 'lng'}, ...] -> [(id, lat, lng), ...]"""
+    return [(str(item.get('id', i)), float(item['lat']), float(item['lng'])) for i, item in enumerate(items)]
+
+
+@app.route('/batch_routes', methods=['POST'])
+def batch_routes():
+    """
+    Travel times (or cheapest fares, with 'metric': 'fare') for many OD points in one call. Send either
+    {'origins': [...], 'destinations': [...]} for a matrix, or
+    {'pairs': [{'from': {...}, 'to': {...}}, ...]} for a list.
+    """
+    data = request.get_json(silent=True) or {}
+    metric = data.get('metric', 'minutes')
+    if metric not in odmatrix.METRICS:
+        return jsonify({'error': f"metric must be one of {', '.join(odmatrix.METRICS)}"}), 400
+    try:
+        max_transfers = int(data.get('maxTransfers', 2))
+        max_walking = float(data.get('maxWalking', 1000))
+        if 'pairs' in data:
+            pairs = [(parse_points([p['from']])[0], parse_points([p['to']])[0]) for p in data['pairs']]
+            cells = len(pairs)
+        else:
+            origins = parse_points(data['origins'])
+            destinations = parse_points(data.get('destinations', data['origins']))
+            cells = len(origins) * len(destinations)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid batch request: {e}'}), 400
+    if cells > BATCH_MAX_CELLS:
+        return jsonify({'error': f'Batch too large ({cells} cells, limit {BATCH_MAX_CELLS}); use odmatrix.py'}), 413
+
+    try:
+        with admission.admit():
+            with search_lock:
+                if 'pairs' in data:
+                    values = odmatrix.compute_pairs(pairs, max_transfers, max_walking, finder=get_finder(),
+                                                    metric=metric)
+                    result = {metric: values}
+                else:
+                    matrix = odmatrix.compute_matrix(origins, destinations, max_transfers, max_walking,
+                                                     finder=get_finder(), metric=metric)
+                    result = {'origin_ids': [p[0] for p in origins],
+                              'destination_ids': [p[0] for p in destinations],
+                              metric: matrix}
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    # Unreachable cells are NaN internally; JSON gets null
+    if 'pairs' in data:
+        result[metric] = [None if v != v else v for v in result[metric]]
+    else:
+        result[metric] = [[None if v != v else v for v in row] for row in result[metric]]
+    return jsonify(result)
+
+@app.route('/route_shape/<route_id>')
+def route_shape(route_id):
+    """
+    A route's line simplified for the map's zoom, as an encoded polyline, with
+    its stops. 'from' and 'to' (stop indexes, as in a journey's bus legs) cut
+    it down to one ride.
+    """
+    route_finder = get_finder()
+    shape = route_finder.shapes.get(route_id)
+    if shape is None:
+        return jsonify({'error': f'Unknown route {route_id}'}), 404
+    last = len(shape.stops) - 1
+    try:
+        zoom = int(request.args.get('zoom', shapes.DEFAULT_ZOOM))
+        from_idx = int(request.args.get('from', 0))
+        to_idx = int(request.args.get('to', last))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid shape request: {e}'}), 400
+    if not 0 <= from_idx <= to_idx <= last:
+        return jsonify({'error': f'Stop indexes must satisfy 0 <= from <= to <= {last}'}), 400
+
+    stop_ids = route_finder.routes[route_id]['stops'][from_idx:to_idx + 1]
+    response = jsonify({
+        'route_id': route_id,
+        'zoom': zoom,
+        'distance_m': round(shape.distance(from_idx, to_idx)),
+        'polyline': shapes.encode_polyline(shape.geometry(zoom, from_idx, to_idx)),
+        'stops': [{'stop_id': stop_id, 'stop_name': route_finder.stops[stop_id]['stop_name'],
+                   'lat': lat, 'lng': lng}
+                  for stop_id, (lat, lng) in zip(stop_ids, shape.stops[from_idx:to_idx + 1])],
+    })
+    # Shapes only change with the network data
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Admission queue depth, shed counts and request coalescing for this process"""
+    return jsonify({'admission': admission.metrics(), 'single_flight': route_flight.stats()})
+
+@app.route('/worker')
+def worker_stats():
+    """Which process served this request, how fast it started and what memory it holds"""
+    return jsonify(dict(prefork.worker_info, memory_kib=prefork.memory_usage()))
 
 # Serve the main index.html
 @app.route('/')
 def index():
-    return send_from_directory(FRONTEND_DIR, 'index.html')
+    return assets.serve('index.html') or send_from_directory(FRONTEND_DIR, 'index.html')
 
-# Serve all static files (js, css, images, etc.)
+# Serve all static files (js, css, images, etc.), precompressed when built
 @app.route('/<path:path>')
 def static_proxy(path):
-    return send_from_directory(FRONTEND_DIR, path)
+    return assets.serve(path) or send_from_directory(FRONTEND_DIR, path)
 
 # Run the app (for development)
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True) 
+    parser = argparse.ArgumentParser(description="Bus Time Finder backend")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', '0')),
+                        help="preload the network once and fork this many workers (0 = dev server)")
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        # Build the finder before forking so every worker shares it
+        prefork.serve(app, '0.0.0.0', args.port, args.workers, preload=get_finder)
+    else:
+        app.run(host='0.0.0.0', port=args.port, debug=True)
 
 
 
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Batch route planning: origin-destination travel time matrices
+Groups queries by origin and answers each origin with one one-to-all
+search, spreading origins across a process pool
+"""
+
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # CSV output still works without numpy
+    np = None
+
+from findbus import AdvancedBusRouteFinder
+
+WALKING_SPEED_M_PER_MIN = 80  # ~4.8 km/h
+UNREACHABLE = math.nan
+# 'minutes' of travel time, or cheapest 'fare' (walking is free)
+METRICS = ('minutes', 'fare')
+
+# (point_id, lat, lng)
+Point = Tuple[str, float, float]
+
+# Per-process finder: built once per worker, or inherited from the parent on fork
+_finder: Optional[AdvancedBusRouteFinder] = None
+
+
+def _init_worker(snapshot: datetime):
+    """Forked workers inherit the parent's finder; others build one at the batch's schedule time"""
+    global _finder
+    if _finder is None:
+        _finder = AdvancedBusRouteFinder()
+        _finder.refresh_schedules(snapshot)
+
+
+def nearest_stops_for(finder: AdvancedBusRouteFinder, points: Sequence[Point],
+                      max_walking: float) -> List[List[Tuple[str, float]]]:
+    return [finder.find_nearest_stops(lat, lng, max_walking) for _, lat, lng in points]
+
+
+def walk_cost(metric: str, meters: float) -> float:
+    return meters / WALKING_SPEED_M_PER_MIN if metric == 'minutes' else 0.0
+
+
+def origin_row(finder: AdvancedBusRouteFinder, origin: Point, destinations: Sequence[Point],
+               dest_stops: List[List[Tuple[str, float]]], max_transfers: int, max_walking: float,
+               metric: str = 'minutes') -> List[float]:
+    """Travel minutes (or fare) from one origin to every destination (NaN if unreachable)"""
+    _, origin_lat, origin_lng = origin
+    origin_stops = finder.find_nearest_stops(origin_lat, origin_lng, max_walking)
+    one_to_all = finder.one_to_all_times if metric == 'minutes' else finder.one_to_all_fares
+
+    # stop_id -> best cost to stand at that stop, including the walk to the first stop
+    reach: Dict[str, float] = {}
+    for stop_id, walk in origin_stops:
+        walk_to_stop = walk_cost(metric, walk)
+        for target, cost in one_to_all(stop_id, max_transfers).items():
+            total = walk_to_stop + cost
+            if total < reach.get(target, math.inf):
+                reach[target] = total
+
+    row = []
+    for (_, dest_lat, dest_lng), stops in zip(destinations, dest_stops):
+        best = math.inf
+        direct_walk = finder.calculate_distance(origin_lat, origin_lng, dest_lat, dest_lng)
+        if direct_walk <= max_walking:
+            best = walk_cost(metric, direct_walk)
+        for stop_id, walk in stops:
+            if stop_id in reach:
+                best = min(best, reach[stop_id] + walk_cost(metric, walk))
+        row.append(round(best, 1) if best < math.inf else UNREACHABLE)
+    return row
+
+
+def _rows_for_origins(origins: Sequence[Point], destinations: Sequence[Point],
+                      max_transfers: int, max_walking: float, metric: str = 'minutes') -> List[List[float]]:
+    dest_stops = nearest_stops_for(_finder, destinations, max_walking)
+    return [origin_row(_finder, origin, destinations, dest_stops, max_transfers, max_walking, metric)
+            for origin in origins]
+
+
+def compute_matrix(origins: Sequence[Point], destinations: Sequence[Point], max_transfers: int = 2,
+                   max_walking: float = 1000, workers: int = 1,
+                   finder: Optional[AdvancedBusRouteFinder] = None, metric: str = 'minutes') -> List[List[float]]:
+    """
+    Travel time matrix in minutes (or cheapest fares with metric='fare'),
+    rows = origins, columns = destinations.
+    With workers > 1 the origins are split into chunks across a process pool.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    global _finder
+    if finder is not None:
+        _finder = finder
+    elif _finder is None:
+        _finder = AdvancedBusRouteFinder()
+    # One schedule snapshot for the whole batch, taken before any worker starts
+    _finder.refresh_schedules()
+    if workers <= 1 or len(origins) < 2:
+        return _rows_for_origins(origins, destinations, max_transfers, max_walking, metric)
+
+    # A few chunks per worker keeps the pool busy when origins differ in cost
+    chunk_size = max(1, math.ceil(len(origins) / (workers * 4)))
+    chunks = [origins[i:i + chunk_size] for i in range(0, len(origins), chunk_size)]
+    # Fork lets workers inherit an already-built finder instead of rebuilding it
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(_finder.current_time,)) as pool:
+        futures = [pool.submit(_rows_for_origins, chunk, destinations, max_transfers, max_walking, metric)
+                   for chunk in chunks]
+        matrix = []
+        for future in futures:
+            matrix.extend(future.result())
+    return matrix
+
+
+def compute_pairs(pairs: Sequence[Tuple[Point, Point]], max_transfers: int = 2, max_walking: float = 1000,
+                  workers: int = 1, finder: Optional[AdvancedBusRouteFinder] = None,
+                  metric: str = 'minutes') -> List[float]:
+    """Travel minutes (or fares) for a list of OD pairs, searching once per distinct origin"""
+    origins: Dict[Tuple[float, float], Point] = {}
+    destinations: Dict[Tuple[float, float], Point] = {}
+    for origin, dest in pairs:
+        origins.setdefault((origin[1], origin[2]), origin)
+        destinations.setdefault((dest[1], dest[2]), dest)
+
+    origin_index = {key: i for i, key in enumerate(origins)}
+    dest_index = {key: i for i, key in enumerate(destinations)}
+    matrix = compute_matrix(list(origins.values()), list(destinations.values()),
+                            max_transfers, max_walking, workers, finder, metric)
+    return [matrix[origin_index[(o[1], o[2])]][dest_index[(d[1], d[2])]] for o, d in pairs]
+
+
+def read_points(path: str) -> List[Point]:
+    """CSV with columns id,lat,lng (header required)"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [(row['id'], float(row['lat']), float(row['lng'])) for row in csv.DictReader(f)]
+
+
+def write_matrix(path: str, origins: Sequence[Point], destinations: Sequence[Point], matrix: List[List[float]],
+                 metric: str = 'minutes'):
+    """Write .npz (float32 values under the metric's name, plus ids) or, for any other extension, a CSV grid"""
+    if path.endswith('.npz'):
+        if np is None:
+            raise RuntimeError("numpy is required for .npz output; use a .csv path instead")
+        np.savez_compressed(
+            path,
+            **{metric: np.asarray(matrix, dtype=np.float32)},
+            origin_ids=np.asarray([p[0] for p in origins]),
+            destination_ids=np.asarray([p[0] for p in destinations]),
+        )
+        return
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['origin_id'] + [p[0] for p in destinations])
+        for origin, row in zip(origins, matrix):
+            writer.writerow([origin[0]] + ['' if math.isnan(v) else v for v in row])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute an OD travel time (minutes) or fare matrix")
+    parser.add_argument('origins', help="CSV of origins: id,lat,lng")
+    parser.add_argument('destinations', nargs='?', help="CSV of destinations (default: same as origins)")
+    parser.add_argument('--out', default='od_matrix.npz', help=".npz or .csv output path")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-transfers', type=int, default=2)
+    parser.add_argument('--max-walking', type=float, default=1000)
+    parser.add_argument('--metric', choices=METRICS, default='minutes')
+    args = parser.parse_args()
+
+    origins = read_points(args.origins)
+    destinations = read_points(args.destinations) if args.destinations else origins
+
+    started = time.time()
+    matrix = compute_matrix(origins, destinations, args.max_transfers, args.max_walking, args.workers,
+                            metric=args.metric)
+    elapsed = time.time() - started
+    write_matrix(args.out, origins, destinations, matrix, args.metric)
+
+    cells = len(origins) * len(destinations)
+    print(f"✅ {len(origins)}×{len(destinations)} matrix written to {args.out}")
+    print(f"📊 {elapsed:.2f}s with {args.workers} workers ({cells / max(elapsed, 1e-9):.0f} OD pairs/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Journey scoring profiles
+A profile is a set of weights over (duration, transfers, fare, walking);
+lower scores rank first. Requests name the profile they want, and all
+candidates of a search are scored together over one feature array, with
+top-k picked by partial selection instead of sorting every candidate.
+"""
+
+import heapq
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # plain Python scoring gives the same ranking
+    np = None
+
+# Below this many candidates plain Python beats building arrays
+NUMPY_MIN_CANDIDATES = 64
+
+
+@dataclass(frozen=True)
+class ScoringProfile:
+    name: str
+    duration: float     # per minute, waiting included
+    transfers: float    # per transfer
+    fare: float         # per rupee
+    walking: float      # per metre
+    # Soonest departure first, score only breaks ties (the original ordering)
+    soonest_first: bool = False
+
+    @property
+    def weights(self):
+        return (self.duration, self.transfers, self.fare, self.walking)
+
+    def score(self, duration: float, transfers: int, fare: float, walking_distance: float) -> float:
+        return (duration * self.duration + transfers * self.transfers +
+                fare * self.fare + walking_distance * self.walking)
+
+
+PROFILES: Dict[str, ScoringProfile] = {profile.name: profile for profile in (
+    ScoringProfile('balanced', duration=1.0, transfers=20.0, fare=0.5, walking=0.01, soonest_first=True),
+    ScoringProfile('fastest', duration=1.0, transfers=5.0, fare=0.0, walking=0.005),
+    ScoringProfile('cheapest', duration=0.1, transfers=5.0, fare=5.0, walking=0.005),
+    ScoringProfile('least_walking', duration=0.2, transfers=10.0, fare=0.1, walking=0.2),
+    ScoringProfile('fewest_transfers', duration=0.5, transfers=100.0, fare=0.2, walking=0.01),
+)}
+DEFAULT_PROFILE = PROFILES['balanced']
+
+
+def get_profile(name) -> ScoringProfile:
+    """Profile by name; None means the default. Raises ValueError for unknown names."""
+    if name is None or name == '':
+        return DEFAULT_PROFILE
+    if isinstance(name, ScoringProfile):
+        return name
+    try:
+        return PROFILES[str(name).lower().replace('-', '_')]
+    except KeyError:
+        raise ValueError(f"Unknown profile {name!r}; choose one of {', '.join(PROFILES)}") from None
+
+
+def features(journeys: Sequence) -> List[tuple]:
+    return [(journey.total_duration, journey.total_transfers, journey.total_fare, journey.walking_distance)
+            for journey in journeys]
+
+
+def score_journeys(journeys: Sequence, profile: ScoringProfile = DEFAULT_PROFILE) -> List[float]:
+    """Every candidate's score in one pass"""
+    rows = features(journeys)
+    if np is not None and len(rows) >= NUMPY_MIN_CANDIDATES:
+        return (np.asarray(rows, dtype=np.float64) @ np.asarray(profile.weights)).tolist()
+    d, t, f, w = profile.weights
+    return [duration * d + transfers * t + fare * f + walking * w
+            for duration, transfers, fare, walking in rows]
+
+
+def top_k(keys: Sequence[Sequence[float]], k: int) -> List[int]:
+    """
+    Indexes of the k smallest rows of the key columns (compared in order,
+    ties by index), the same as the first k of a stable sort
+    """
+    n = len(keys[0]) if keys else 0
+    if k <= 0 or n == 0:
+        return []
+    if np is None or n < NUMPY_MIN_CANDIDATES:
+        return heapq.nsmallest(k, range(n), key=lambda i: tuple(column[i] for column in keys) + (i,))
+    columns = [np.asarray(column, dtype=np.float64) for column in keys]
+    if k < n:
+        # Every row of the top k has a first key no larger than the k-th smallest one
+        bound = np.partition(columns[0], k - 1)[k - 1]
+        candidates = np.flatnonzero(columns[0] <= bound)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort([candidates] + [column[candidates] for column in reversed(columns)])
+    return candidates[order[:k]].tolist()
+
+
+def rank_journeys(journeys: Sequence, profile: ScoringProfile = DEFAULT_PROFILE, k: int = 10,
+                  soonest_first=None) -> List:
+    """
+    Best k journeys under profile. Each journey's journey_score is set to its
+    score under that profile. soonest_first overrides the profile's setting.
+    """
+    scores = score_journeys(journeys, profile)
+    for journey, score in zip(journeys, scores):
+        journey.journey_score = score
+    if soonest_first is None:
+        soonest_first = profile.soonest_first
+    keys = [[journey.next_departure_in_minutes for journey in journeys], scores] if soonest_first else [scores]
+    return [journeys[i] for i in top_k(keys, k)]
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Route shapes
+Every route gets a polyline (its "shape" from the data file, either a list
+of [lat, lng] points or an encoded polyline string, or else the straight
+line through its stops) with the distance along it at every vertex and at
+every stop, so the length of a ride between two stops is one subtraction.
+Maps get the shape simplified for their zoom level; simplifications are
+computed once per route and zoom level and kept.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS = 6371000  # metres
+Point = Tuple[float, float]  # (lat, lng)
+
+# Simplifications are kept for these zoom levels; other zooms use the nearest one
+ZOOM_LEVELS = (10, 12, 14, 16)
+DEFAULT_ZOOM = 14
+# Points closer to the simplified line than this many pixels are dropped
+TOLERANCE_PIXELS = 1.0
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def format_distance(metres: float) -> str:
+    return f"{metres:.0f}m" if metres < 1000 else f"{metres / 1000:.1f}km"
+
+
+def encode_polyline(points: Sequence[Point]) -> str:
+    """Google's encoded polyline format (5 decimals), a few bytes per point"""
+    chunks, last_lat, last_lng = [], 0, 0
+    for lat, lng in points:
+        lat, lng = round(lat * 1e5), round(lng * 1e5)
+        for delta in (lat - last_lat, lng - last_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        last_lat, last_lng = lat, lng
+    return ''.join(chunks)
+
+
+def decode_polyline(text: str) -> List[Point]:
+    points, index, lat, lng = [], 0, 0, 0
+    while index < len(text):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(text[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat, lng = lat + deltas[0], lng + deltas[1]
+        points.append((lat / 1e5, lng / 1e5))
+    return points
+
+
+def tolerance_for_zoom(zoom: int, latitude: float) -> float:
+    """Metres covered by TOLERANCE_PIXELS on a web map at this zoom and latitude"""
+    metres_per_pixel = 156543.03 * math.cos(math.radians(latitude)) / 2 ** zoom
+    return metres_per_pixel * TOLERANCE_PIXELS
+
+
+def simplify(xy: Sequence[Tuple[float, float]], tolerance: float) -> List[int]:
+    """Douglas-Peucker over planar points; indexes of the points kept, ends included"""
+    if len(xy) < 3:
+        return list(range(len(xy)))
+    keep = [False] * len(xy)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(xy) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        farthest, worst = 0, tolerance
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            if length:
+                offset = abs(dy * (x - x1) - dx * (y - y1)) / length
+            else:
+                offset = math.hypot(x - x1, y - y1)
+            if offset > worst:
+                farthest, worst = i, offset
+        if farthest:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+class RouteShape:
+    """
+    One route's polyline. cumulative[k] is the distance in metres from the
+    start to points[k]; stop i lies on the leg after points[stop_leg[i]],
+    stop_offset[i] metres along the shape.
+    """
+
+    def __init__(self, points: List[Point], stops: List[Point]):
+        self.points = points
+        self.stops = stops
+        # Flat projection around the route is accurate to well under a metre at city scale
+        self.ref_lat = sum(lat for lat, _ in points) / len(points) if points else 0.0
+        self.scale = math.cos(math.radians(self.ref_lat))
+        self.xy = [self.to_xy(point) for point in points]
+        self.cumulative = [0.0]
+        for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+            self.cumulative.append(self.cumulative[-1] + haversine(lat1, lon1, lat2, lon2))
+        self.stop_leg: List[int] = []
+        self.stop_offset: List[float] = []
+        self.locate_stops()
+        self._simplified: Dict[int, List[int]] = {}
+
+    def to_xy(self, point: Point) -> Tuple[float, float]:
+        lat, lng = point
+        return (math.radians(lng) * self.scale * EARTH_RADIUS, math.radians(lat) * EARTH_RADIUS)
+
+    def locate_stops(self):
+        """Project each stop onto the shape, never behind the previous stop"""
+        last_leg = max(len(self.points) - 2, 0)
+        leg = 0
+        for stop in self.stops:
+            px, py = self.to_xy(stop)
+            best = None
+            for k in range(leg, last_leg + 1):
+                (x1, y1), (x2, y2) = self.xy[k], self.xy[min(k + 1, len(self.xy) - 1)]
+                dx, dy = x2 - x1, y2 - y1
+                span = dx * dx + dy * dy
+                t = min(max(((px - x1) * dx + (py - y1) * dy) / span, 0.0), 1.0) if span else 0.0
+                off = math.hypot(x1 + t * dx - px, y1 + t * dy - py)
+                if best is None or off < best[0]:
+                    best = (off, k, t)
+            _, leg, t = best
+            length = self.cumulative[min(leg + 1, len(self.cumulative) - 1)] - self.cumulative[leg]
+            self.stop_leg.append(leg)
+            self.stop_offset.append(self.cumulative[leg] + t * length)
+
+    def distance(self, from_idx: int, to_idx: int) -> float:
+        """Metres along the shape between two of the route's stops"""
+        return self.stop_offset[to_idx] - self.stop_offset[from_idx]
+
+    def simplified(self, zoom: int) -> List[int]:
+        """Indexes of the points kept at a zoom level, computed once per level"""
+        level = min(ZOOM_LEVELS, key=lambda z: (abs(z - zoom), -z))
+        kept = self._simplified.get(level)
+        if kept is None:
+            kept = simplify(self.xy, tolerance_for_zoom(level, self.ref_lat))
+            self._simplified[level] = kept
+        return kept
+
+    def geometry(self, zoom: int = DEFAULT_ZOOM, from_idx: int = 0,
+                 to_idx: Optional[int] = None) -> List[Point]:
+        """Simplified line from one stop to another, starting and ending on the stops"""
+        if to_idx is None:
+            to_idx = len(self.stops) - 1
+        kept = self.simplified(zoom)
+        inner = kept[bisect_right(kept, self.stop_leg[from_idx]):bisect_left(kept, self.stop_leg[to_idx] + 1)]
+        line = [self.stops[from_idx]]
+        for point in [self.points[k] for k in inner] + [self.stops[to_idx]]:
+            if point != line[-1]:  # stops sitting on shape points
+                line.append(point)
+        return line
+
+
+def route_shape(route: Dict, stops: Dict[str, Dict]) -> RouteShape:
+    """
+    Shape for a route from the data file; the line through its stops when it
+    has none (an empty shape for a route with no stops either)
+    """
+    stop_points = [(stops[stop_id]["latitude"], stops[stop_id]["longitude"]) for stop_id in route["stops"]]
+    shape = route.get("shape")
+    if isinstance(shape, str):
+        points = decode_polyline(shape)
+    elif shape:
+        points = [(float(lat), float(lng)) for lat, lng in shape]
+    else:
+        points = []
+    if not points:
+        points = list(stop_points)
+    return RouteShape(points, stop_points)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Single-flight request coalescing
+Runs one computation per key and hands its result to every caller that asked
+for the same key while it was in flight
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class FlightTimeout(TimeoutError):
+    """Raised when a waiter gives up before the shared computation finishes"""
+
+
+class _Call:
+    """One in-flight computation shared by every waiter on the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls made from threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run fn() for key, or wait for the call already running for key.
+        Errors raised by fn are re-raised in every waiter.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+            call.waiters += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        elif not call.done.wait(timeout):
+            raise FlightTimeout(f"Timed out after {timeout}s waiting for {key!r}")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+            }
+
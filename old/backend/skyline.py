@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Pareto skyline of journeys over (duration, transfers, fare, walking)
+A journey is dominated when another one is no worse on all four criteria
+and better on at least one; identical journeys don't dominate each other.
+Sorting lexicographically puts every dominator before the journeys it
+dominates, so one pass in that order only has to ask whether a kept journey
+so far beats the current one. Transfers take a handful of values, so kept
+journeys are grouped by transfer count, each group keeping a staircase over
+(fare, walking) that answers the question with a binary search. Large
+batches are thinned out with numpy first when it is installed.
+"""
+
+from bisect import bisect_right
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # the staircase pass needs nothing but the standard library
+    np = None
+
+# (duration, transfers, fare, walking)
+Criteria = Tuple[float, int, float, float]
+
+# Above this many candidates the vectorized pass is used when numpy is installed
+NUMPY_MIN_BATCH = 10000
+# The numpy filter's pivots come from the skyline of about this many points
+PIVOT_SAMPLE = 1024
+PIVOTS = 8
+
+
+class Staircase:
+    """
+    Non-dominated (fare, walking) points: fares ascending, walking strictly
+    descending, so the best walking among fares <= f is one bisect away
+    """
+
+    def __init__(self):
+        self.fares: List[float] = []
+        self.walking: List[float] = []
+
+    def covers(self, fare: float, walking: float) -> bool:
+        """Some point has fare <= fare and walking <= walking"""
+        i = bisect_right(self.fares, fare)
+        return i > 0 and self.walking[i - 1] <= walking
+
+    def add(self, fare: float, walking: float):
+        if self.covers(fare, walking):
+            return
+        i = bisect_right(self.fares, fare)
+        # Drop the points the new one covers: fare >= fare and walking >= walking
+        j = i
+        while j < len(self.fares) and self.walking[j] >= walking:
+            j += 1
+        if i > 0 and self.fares[i - 1] == fare:
+            i -= 1  # same fare, worse walking
+        self.fares[i:j] = [fare]
+        self.walking[i:j] = [walking]
+
+
+def dominates(a: Criteria, b: Criteria) -> bool:
+    """a is no worse than b on every criterion and better on at least one"""
+    return a != b and all(x <= y for x, y in zip(a, b))
+
+
+def staircase_mask(points: Sequence[Criteria]) -> List[bool]:
+    """skyline_mask without the numpy filter"""
+    order = sorted(range(len(points)), key=points.__getitem__)
+    keep = [False] * len(points)
+    stairs = {}  # transfers -> Staircase of kept journeys with that many transfers
+    start = 0
+    while start < len(order):
+        # Identical points are adjacent and share one answer
+        end = start + 1
+        while end < len(order) and points[order[end]] == points[order[start]]:
+            end += 1
+        _, transfers, fare, walking = points[order[start]]
+        # Everything already kept sorts strictly before this point, so a
+        # kept point no worse on the three remaining criteria dominates it
+        dominated = any(stair.covers(fare, walking)
+                        for level, stair in stairs.items() if level <= transfers)
+        if not dominated:
+            for k in range(start, end):
+                keep[order[k]] = True
+            stairs.setdefault(transfers, Staircase()).add(fare, walking)
+        start = end
+    return keep
+
+
+def skyline_mask(points: Sequence[Criteria]) -> List[bool]:
+    """keep[i] is True when points[i] is not dominated by any other point"""
+    if np is not None and len(points) >= NUMPY_MIN_BATCH:
+        return skyline_mask_numpy(points)
+    return staircase_mask(points)
+
+
+def skyline_mask_numpy(points: Sequence[Criteria]) -> List[bool]:
+    """
+    skyline_mask for large batches. A few skyline points of an evenly spread
+    sample act as pivots: every point a pivot dominates is dropped with
+    vectorized comparisons, and the staircase pass only sorts what is left.
+    Skyline points are never dropped, so the result is the same.
+    """
+    values = np.asarray(points, dtype=np.float64)
+    sample = values[::max(1, len(values) // PIVOT_SAMPLE)]
+    pivots = sample[np.array(staircase_mask([tuple(row) for row in sample.tolist()]))]
+    # Balanced pivots (lowest sum of range-scaled criteria) dominate the most
+    low = values.min(axis=0)
+    span = np.maximum(values.max(axis=0) - low, 1e-9)
+    pivots = pivots[np.argsort(((pivots - low) / span).sum(axis=1))[:PIVOTS]]
+
+    dominated = np.zeros(len(values), dtype=bool)
+    for pivot in pivots:
+        dominated |= (values >= pivot).all(axis=1) & (values > pivot).any(axis=1)
+
+    survivors = np.flatnonzero(~dominated)
+    keep = np.zeros(len(values), dtype=bool)
+    keep[survivors] = staircase_mask([points[i] for i in survivors.tolist()])
+    return keep.tolist()
@@ -0,0 +1,95 @@
+"""
+Serving path for assets produced by build_assets.py
+Negotiates Content-Encoding against the precompressed variants and sets
+strong ETags and long-lived cache headers, so a page load costs one dict
+lookup per file instead of reading and compressing it in Python
+"""
+
+import json
+import mimetypes
+import os
+from typing import Dict, Optional
+
+from flask import Response, request, send_file
+
+from build_assets import MANIFEST_NAME
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+ENCODING_SUFFIX = {'br': '.br', 'gzip': '.gz'}
+# Preferred encoding when the client accepts several equally
+ENCODING_PREFERENCE = ('br', 'gzip')
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map each accepted coding to its q-value"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class StaticAssets:
+    """Precompressed asset store backed by a build manifest"""
+
+    def __init__(self, dist_dir: str):
+        self.dist_dir = dist_dir
+        self.files = {}
+        manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f)['files']
+            print(f"✅ Loaded {len(self.files)} precompressed asset entries")
+        else:
+            print(f"⚠️  No asset manifest in {dist_dir}; run build_assets.py for compressed serving")
+
+    def choose_encoding(self, available: Dict[str, int], accept_encoding: str) -> Optional[str]:
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        best, best_q = None, 0.0
+        for coding in ENCODING_PREFERENCE:
+            if coding not in available:
+                continue
+            q = accepted.get(coding, wildcard)
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def serve(self, path: str) -> Optional[Response]:
+        """Response for path, or None if it is not in the manifest"""
+        entry = self.files.get(path)
+        if entry is None:
+            return None
+
+        encoding = self.choose_encoding(entry['encodings'], request.headers.get('Accept-Encoding', ''))
+        # Each representation gets its own strong validator
+        etag = entry['etag'] + (f"-{encoding}" if encoding else '')
+        cache_control = IMMUTABLE_CACHE if entry['immutable'] else REVALIDATE_CACHE
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            file_path = os.path.join(self.dist_dir, entry['file'])
+            if encoding:
+                file_path += ENCODING_SUFFIX[encoding]
+            mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response = send_file(file_path, mimetype=mimetype, etag=False, conditional=False,
+                                 last_modified=None, max_age=None)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        if entry['encodings']:
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
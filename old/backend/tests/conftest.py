@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The backend, the bot and the collection agent import their modules flat
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, 'whatsaap_bot'), os.path.join(BACKEND_DIR, 'bus_data_agent.py')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def test_grants_up_to_max_concurrent_then_queues():
+    controller = AdmissionController(max_concurrent=2, queue_timeout=0.05)
+    first, second = controller.acquire(), controller.acquire()
+    with pytest.raises(Overloaded) as shed:
+        controller.acquire()
+    assert shed.value.reason == 'queue deadline'
+    first.release()
+    third = controller.acquire()
+    assert controller.metrics()['in_flight'] == 2
+    second.release()
+    third.release()
+    assert controller.metrics()['in_flight'] == 0
+
+
+def test_full_queue_is_shed_at_once_with_a_retry_hint():
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    with controller.admit():
+        with pytest.raises(Overloaded) as shed:
+            controller.acquire()
+    assert shed.value.reason == 'queue full'
+    assert shed.value.retry_after >= 1
+    assert controller.metrics()['shed_queue_full'] == 1
+
+
+def test_queued_request_gets_the_released_slot():
+    controller = AdmissionController(max_concurrent=1, queue_timeout=2.0)
+    holder = controller.acquire()
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(controller.acquire()))
+    waiter.start()
+    holder.release()
+    waiter.join()
+    assert len(granted) == 1 and not granted[0].degraded
+    granted[0].release()
+
+
+def test_deep_queue_admits_degraded():
+    controller = AdmissionController(max_concurrent=1, queue_timeout=2.0, degrade_queue_depth=0)
+    holder = controller.acquire()
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(controller.acquire()))
+    waiter.start()
+    holder.release()
+    waiter.join()
+    assert granted[0].degraded
+    granted[0].release()
+
+
+def test_release_is_idempotent():
+    controller = AdmissionController(max_concurrent=1)
+    ticket = controller.acquire()
+    ticket.release()
+    ticket.release()
+    assert controller.metrics()['in_flight'] == 0
+
+
+def test_find_buses_answers_503_with_retry_after(monkeypatch):
+    import main
+
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(main, 'admission', controller)
+    body = {'fromPlaceData': {'coordinates': {'lat': 11.2582, 'lng': 75.7865}},
+            'toPlaceData': {'coordinates': {'lat': 11.141, 'lng': 75.955}}}
+    with controller.admit():
+        response = main.app.test_client().post('/find_buses', json=body)
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
+
+
+def test_stream_frees_its_slot_before_the_last_event(monkeypatch):
+    import main
+
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(main, 'admission', controller)
+    body = {'fromPlaceData': {'coordinates': {'lat': 11.2582, 'lng': 75.7865}},
+            'toPlaceData': {'coordinates': {'lat': 11.141, 'lng': 75.955}}}
+    response = main.app.test_client().post('/find_buses/stream', json=body, buffered=False)
+    try:
+        for chunk in response.response:
+            if b'"done"' in chunk:
+                break
+        # The client hasn't finished reading, but the search is over
+        assert controller.metrics()['in_flight'] == 0
+    finally:
+        response.close()
+    assert controller.metrics()['in_flight'] == 0
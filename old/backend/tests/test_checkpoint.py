@@ -0,0 +1,40 @@
+import json
+
+from checkpoint import Checkpoint
+
+
+def test_saved_stages_are_loaded_by_a_later_run(tmp_path):
+    Checkpoint('Kozhikode', 'Kerala', str(tmp_path)).save('stops', [{'stop_name': 'Palayam'}], count=1)
+    rerun = Checkpoint('Kozhikode', 'Kerala', str(tmp_path))
+    assert rerun.done('stops') and not rerun.done('geocoding')
+    assert rerun.load('stops') == [{'stop_name': 'Palayam'}]
+    assert rerun.info('stops')['count'] == 1
+
+
+def test_fresh_run_forgets_earlier_stages(tmp_path):
+    Checkpoint('Kozhikode', 'Kerala', str(tmp_path)).save('stops', [])
+    assert not Checkpoint('Kozhikode', 'Kerala', str(tmp_path), fresh=True).done('stops')
+
+
+def test_records_after_a_torn_line_are_kept(tmp_path):
+    run = Checkpoint('Kozhikode', 'Kerala', str(tmp_path))
+    run.append('geocoding', {'index': 0, 'name': 'കോഴിക്കോട്'})
+    # Crash halfway through a line, inside a multi-byte character
+    with open(run.path('geocoding.jsonl'), 'ab') as f:
+        f.write(json.dumps({'index': 1, 'name': 'കോഴിക്കോട്'}, ensure_ascii=False).encode('utf-8')[:-5])
+
+    resumed = Checkpoint('Kozhikode', 'Kerala', str(tmp_path))
+    resumed.append('geocoding', {'index': 2})
+    resumed.append('geocoding', {'index': 3})
+    assert [r['index'] for r in resumed.records('geocoding')] == [0, 2, 3]
+
+    # And again after a second crash, on a later resume
+    with open(resumed.path('geocoding.jsonl'), 'a', encoding='utf-8') as f:
+        f.write('{"index": 4')
+    last = Checkpoint('Kozhikode', 'Kerala', str(tmp_path))
+    last.append('geocoding', {'index': 5})
+    assert [r['index'] for r in last.records('geocoding')] == [0, 2, 3, 5]
+
+
+def test_no_records_before_the_first_append(tmp_path):
+    assert Checkpoint('Kozhikode', 'Kerala', str(tmp_path)).records('geocoding') == []
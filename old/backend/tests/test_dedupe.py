@@ -0,0 +1,69 @@
+import pytest
+
+from dedupe import METERS_PER_DEGREE, dedupe_network, dedupe_stops, name_key, rewrite_stop_ids, similar
+
+
+def stop(stop_id, name, metres_north=0.0, lat=11.25, lon=75.78):
+    return {'stop_id': stop_id, 'stop_name': name, 'latitude': lat + metres_north / METERS_PER_DEGREE,
+            'longitude': lon}
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Palayam Jn', 'Palayam Junction Bus Stop'),
+    ('Palayam', 'Palayam Junction'),
+    ('Beach', 'Beach Rd'),
+    ('Mananchira', 'Mananchra'),
+])
+def test_same_stop_names(a, b):
+    assert similar(name_key(a), name_key(b))
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Palayam', 'Palayam Market'),
+    ('Beach', 'Beach Hospital'),
+    ('Medical College', 'Medical College Hospital'),
+    ('Central Station', 'Central Library'),
+    ('Bus Stop', 'Palayam'),
+])
+def test_different_stop_names(a, b):
+    assert not similar(name_key(a), name_key(b))
+
+
+def test_close_duplicates_merge_into_the_first_stop():
+    stops = [stop('S1', 'Palayam Jn'), stop('S2', 'Palayam Junction Bus Stop', 40), stop('S3', 'Beach', 60)]
+    kept, aliases, report = dedupe_stops(stops)
+    assert [s['stop_id'] for s in kept] == ['S1', 'S3']
+    assert aliases == {'S2': 'S1'}
+    assert kept[0]['latitude'] == pytest.approx((stops[0]['latitude'] + stops[1]['latitude']) / 2)
+    assert report[0]['merged'][0]['stop_id'] == 'S2'
+
+
+def test_far_apart_or_differently_named_stops_stay():
+    stops = [stop('S1', 'Palayam'), stop('S2', 'Palayam', 400), stop('S3', 'Palayam Market', 20)]
+    kept, aliases, _ = dedupe_stops(stops)
+    assert len(kept) == 3 and not aliases
+
+
+def test_chains_of_neighbours_do_not_grow_past_the_radius():
+    stops = [stop(f"S{k}", 'Mavoor Road', 100 * k) for k in range(10)]
+    kept, aliases, _ = dedupe_stops(stops, radius=150)
+    for root in kept:
+        members = [s for s in stops if aliases.get(s['stop_id'], s['stop_id']) == root['stop_id']]
+        spread = (max(s['latitude'] for s in members) - min(s['latitude'] for s in members)) * METERS_PER_DEGREE
+        assert spread <= 150
+    assert len(kept) == 5
+
+
+def test_grid_finds_duplicates_across_cell_edges():
+    # Both sides of a cell boundary, and far from the equator where longitude cells are narrow
+    stops = [stop('S1', 'Palayam', lat=60.0, lon=10.0), stop('S2', 'Palayam Jn', lat=60.0, lon=10.002)]
+    kept, aliases, _ = dedupe_stops(stops)
+    assert aliases == {'S2': 'S1'}
+
+
+def test_routes_are_rewritten_to_kept_stops():
+    assert rewrite_stop_ids(['S1', 'S2', 'S3', 'S2'], {'S2': 'S1'}) == ['S1', 'S3', 'S1']
+    data = {'bus_stops': [stop('S1', 'Palayam Jn'), stop('S2', 'Palayam Junction', 30), stop('S3', 'Beach', 500)],
+            'bus_routes': [{'route_id': 'R1', 'stops': ['S2', 'S1', 'S3']}]}
+    deduped, _ = dedupe_network(data)
+    assert deduped['bus_routes'][0]['stops'] == ['S1', 'S3']
@@ -0,0 +1,74 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from fares import ANY, DEFAULT_TABLES, FareEngine, FareTable, load_fare_tables
+
+STOPS = ['S1', 'S2', 'S3', 'S4', 'S5']
+
+
+def route(route_id='R1', operator='KSRTC', route_type='ordinary', **extra):
+    return {'route_id': route_id, 'operator': operator, 'route_type': route_type, 'stops': STOPS, **extra}
+
+
+def test_default_tables_charge_the_original_fares():
+    engine = FareEngine(dict(DEFAULT_TABLES))
+    engine.add_route(route('R1'))
+    engine.add_route(route('R2', route_type='express'))
+    for from_idx in range(len(STOPS)):
+        for to_idx in range(from_idx, len(STOPS)):
+            stops = to_idx - from_idx
+            assert engine.segment_fare('R1', from_idx, to_idx) == 8.0 + stops * 1.5
+            assert engine.segment_fare('R2', from_idx, to_idx) == 15.0 + stops * 2.0
+
+
+def test_published_stage_points_and_fares():
+    tables = {(ANY, ANY): FareTable(base=10.0, per_stage=5.0, stage_fares=(10.0, 13.0), minimum=12.0)}
+    engine = FareEngine(tables)
+    engine.add_route(route(fare_stages=['S1', 'S3', 'S5']))
+    assert engine.segment_fare('R1', 0, 1) == 12.0   # same stage, raised to the minimum
+    assert engine.segment_fare('R1', 1, 2) == 13.0   # one stage, published fare
+    assert engine.segment_fare('R1', 0, 4) == 20.0   # two stages, past the published list
+
+
+def test_stops_per_stage():
+    engine = FareEngine({(ANY, ANY): FareTable(base=10.0, per_stage=4.0, stops_per_stage=2)})
+    engine.add_route(route())
+    assert [engine.segment_fare('R1', 0, i) for i in range(5)] == [10.0, 10.0, 14.0, 14.0, 18.0]
+
+
+def test_most_specific_table_wins():
+    tables = {('KSRTC', 'express'): FareTable(1, 0), ('KSRTC', ANY): FareTable(2, 0),
+              (ANY, 'express'): FareTable(3, 0), (ANY, ANY): FareTable(4, 0)}
+    engine = FareEngine(tables)
+    assert engine.table_for('KSRTC', 'express').base == 1
+    assert engine.table_for('KSRTC', 'ordinary').base == 2
+    assert engine.table_for('Private', 'express').base == 3
+    assert engine.table_for('Private', 'ordinary').base == 4
+
+
+def test_transfer_discount_only_between_the_same_operator():
+    engine = FareEngine({(ANY, ANY): FareTable(base=10.0, per_stage=1.0, minimum=8.0, transfer_discount=5.0)})
+    engine.add_route(route('R1'))
+    engine.add_route(route('R2'))
+    engine.add_route(route('R3', operator='Private'))
+    ride = lambda route_id, operator, fare: SimpleNamespace(route_id=route_id, operator=operator, fare=fare)
+    # Never below the minimum fare
+    assert engine.journey_fare([ride('R1', 'KSRTC', 12.0), ride('R2', 'KSRTC', 11.0)]) == 12.0 + 8.0
+    assert engine.journey_fare([ride('R1', 'KSRTC', 12.0), ride('R3', 'Private', 11.0)]) == 23.0
+
+
+def test_routes_without_stops():
+    engine = FareEngine(dict(DEFAULT_TABLES))
+    assert engine.add_route({'route_id': 'R0', 'stops': []}).stage_at == []
+
+
+def test_fares_file_overrides_built_in_tables(tmp_path):
+    path = tmp_path / 'fares.json'
+    path.write_text(json.dumps({'tables': [{'operator': 'KSRTC', 'base': 12, 'per_stage': 1,
+                                            'stage_fares': [12, 12]}]}))
+    tables = load_fare_tables(str(path))
+    assert tables[('KSRTC', ANY)] == FareTable(base=12, per_stage=1, stage_fares=(12, 12))
+    assert tables[(ANY, ANY)] == DEFAULT_TABLES[(ANY, ANY)]
+    assert load_fare_tables(str(tmp_path / 'missing.json')) == DEFAULT_TABLES
@@ -0,0 +1,65 @@
+import pytest
+
+from geocoder import GeocodeCache, Gazetteer, Geocoder
+
+PLACES = [
+    {'name': 'Beach Road', 'lat': 11.275, 'lng': 75.7747, 'address': 'Beach Rd, Kozhikode', 'id': 'stop:BS004'},
+    {'name': 'Palayam Market', 'lat': 11.2588, 'lng': 75.7714, 'address': 'Palayam, Kozhikode', 'id': 'stop:BS003'},
+    {'name': 'Mavoor Road', 'lat': 11.25, 'lng': 75.78, 'address': 'Mavoor Rd, Kozhikode', 'id': 'stop:BS009'},
+]
+
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer(PLACES)
+
+
+@pytest.mark.parametrize('query, name', [
+    ('Beach Road', 'Beach Road'),
+    ('beach road, Kozhikode, Kerala, India', 'Beach Road'),
+    ('Palayam Market, Kozhikode, Kerala 673001', 'Palayam Market'),
+    ('Palayam Market, Mavoor Road, Kozhikode', 'Palayam Market'),
+    ('Beach Rd, Calicut', 'Beach Road'),
+])
+def test_local_places_match(gazetteer, query, name):
+    assert gazetteer.lookup(query)['name'] == name
+
+
+@pytest.mark.parametrize('query', [
+    'Beach Road, Chennai',
+    'Palayam Market, Thiruvananthapuram, Kerala',
+    'Beach Rd, Mumbai, Maharashtra',
+])
+def test_places_in_other_cities_miss(gazetteer, query):
+    assert gazetteer.match(query) == (None, 0.0)
+
+
+def test_exact_needs_the_whole_query(gazetteer):
+    assert gazetteer.exact('Palayam Market, Kozhikode')['name'] == 'Palayam Market'
+    assert gazetteer.exact('Palayam Market, Thiruvananthapuram') is None
+    assert gazetteer.exact('Palayam Markt') is None
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return dict(self.body)
+
+
+def test_geocode_sends_other_cities_to_google_and_caches_them(gazetteer, tmp_path):
+    geocoder = Geocoder('key', gazetteer, GeocodeCache(str(tmp_path / 'geocode.db')))
+    requests = []
+
+    def get(url, params, timeout):
+        requests.append(params['address'])
+        return FakeResponse({'status': 'OK', 'results': [{'formatted_address': 'Beach Rd, Chennai',
+                                                          'geometry': {'location': {'lat': 13.05, 'lng': 80.28}}}]})
+
+    geocoder.session.get = get
+    assert geocoder.geocode('Beach Road, Kozhikode')['source'] == 'gazetteer'
+    assert geocoder.geocode('Beach Road, Chennai')['source'] == 'google'
+    assert geocoder.geocode('beach road chennai')['source'] == 'cache'
+    assert requests == ['Beach Road, Chennai']
+    assert geocoder.stats()['external_calls'] == 1
@@ -0,0 +1,91 @@
+import threading
+import time
+
+from jobqueue import JobQueue, WorkerPool
+
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / 'jobs.db'), **kwargs)
+
+
+def test_one_number_is_handled_one_message_at_a_time(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.put('+911', {'Body': 'first'})
+    queue.put('+911', {'Body': 'second'})
+    queue.put('+912', {'Body': 'other'})
+
+    first = queue.claim()
+    other = queue.claim()
+    assert first.payload['Body'] == 'first'
+    assert other.payload['Body'] == 'other'
+    # 'second' waits until 'first' is finished
+    assert queue.claim() is None
+    queue.complete(first)
+    assert queue.claim().payload['Body'] == 'second'
+
+
+def test_failed_job_holds_back_later_messages_until_retried(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.put('+911', {'Body': 'first'})
+    queue.put('+911', {'Body': 'second'})
+    job = queue.claim()
+    queue.fail(job, 'boom')
+    # Backing off, but still ahead of 'second'
+    assert queue.claim() is None
+    assert queue.pending('+911') == 2
+
+
+def test_job_is_parked_after_max_attempts(tmp_path, monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.put('+911', {'Body': 'first'})
+    queue.put('+911', {'Body': 'second'})
+
+    for attempt in (1, 2):
+        job = queue.claim()
+        assert job.payload['Body'] == 'first' and job.attempts == attempt
+        queue.fail(job, 'boom')
+        now[0] += 60  # past the backoff
+
+    assert queue.stats() == {'failed': 1, 'queued': 1}
+    # A parked job no longer blocks the number
+    assert queue.claim().payload['Body'] == 'second'
+
+
+def test_stale_running_jobs_are_handed_out_again(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path, visibility_timeout=10)
+    queue.put('+911', {'Body': 'first'})
+    assert queue.claim() is not None
+    assert queue.requeue_stale() == 0
+    later = time.time() + 11
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert queue.requeue_stale() == 1
+    assert queue.claim().attempts == 2
+
+
+def test_worker_pool_keeps_per_number_order(tmp_path):
+    queue = make_queue(tmp_path)
+    handled = []
+    done = threading.Event()
+    total = 40
+
+    def handler(payload):
+        time.sleep(0.001)
+        handled.append((payload['From'], payload['n']))
+        if len(handled) == total:
+            done.set()
+
+    pool = WorkerPool(queue, handler, workers=4, poll_interval=0.01)
+    pool.start()
+    try:
+        for n in range(total):
+            queue.put(f"+91{n % 4}", {'From': f"+91{n % 4}", 'n': n})
+        assert done.wait(10)
+    finally:
+        pool.stop()
+
+    for number in {number for number, _ in handled}:
+        sequence = [n for sender, n in handled if sender == number]
+        assert sequence == sorted(sequence)
+    assert pool.processed == total and pool.failed == 0
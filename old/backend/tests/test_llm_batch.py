@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from llm_batch import parse_items, salvage_objects
+
+STOPS = [{'stop_name': 'Palayam', 'lat': 11.25}, {'stop_name': 'Beach', 'lat': 11.27},
+         {'stop_name': 'SM Street, "Mittai Theruvu"', 'lat': 11.25}]
+
+
+def test_complete_answer_parses_as_is():
+    content = json.dumps({'stops': STOPS})
+    assert parse_items(content, 'stops') == (STOPS, True)
+    assert parse_items(json.dumps(STOPS), 'stops') == (STOPS, True)
+
+
+@pytest.mark.parametrize('cut', range(1, 80))
+def test_truncated_answer_keeps_every_complete_object(cut):
+    content = json.dumps({'stops': STOPS}, indent=1)
+    truncated = content[:len(content) - cut]
+    items, complete = parse_items(truncated, 'stops')
+    assert not complete
+    # Exactly the objects whose closing brace made it into the text
+    assert items == [stop for stop in STOPS if json.dumps(stop, indent=1).replace('\n', '\n  ') in truncated]
+
+
+def test_salvage_skips_non_objects_and_stops_at_the_cut():
+    assert salvage_objects('noise [1, {"a": 1}, "x", {"b": {"c": [2]}}, {"d": ') == [{'a': 1}, {'b': {'c': [2]}}]
+    assert salvage_objects('{"stops": [') == []
+    assert salvage_objects('no array here') == []
+
+
+def test_non_list_answer_gives_no_items():
+    assert parse_items('{"stops": "none"}', 'stops') == ([], True)
+    assert parse_items('{"stops": [{"a": 1}, 2]}', 'stops') == ([{'a': 1}], True)
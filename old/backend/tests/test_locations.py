@@ -0,0 +1,32 @@
+import pytest
+
+from locations import message_location, parse_location
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('11.2588, 75.7714', (11.2588, 75.7714)),
+    ('  11.2588,75.7714 ', (11.2588, 75.7714)),
+    ('https://www.google.com/maps/place/Palayam/@11.2588,75.7714,17z', (11.2588, 75.7714)),
+    ('https://www.google.com/maps/place/X/@11.25,75.77,17z/data=!3d11.2588!4d75.7714', (11.2588, 75.7714)),
+    ('see https://maps.google.com/?q=11.2588,75.7714 please', (11.2588, 75.7714)),
+])
+def test_coordinates_are_read(text, expected):
+    assert parse_location(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    '1, 2',
+    '11, 75',
+    '95.1, 75.2',
+    'Palayam',
+    'https://maps.app.goo.gl/abc123',
+    'https://example.com/@11.2588,75.7714',
+])
+def test_other_text_is_not_a_location(text):
+    assert parse_location(text) is None
+
+
+def test_shared_pin_wins_over_the_body():
+    payload = {'Latitude': '11.2588', 'Longitude': '75.7714', 'Body': '12.0, 76.0'}
+    assert message_location(payload) == (11.2588, 75.7714)
+    assert message_location({'Latitude': 'x', 'Longitude': 'y', 'Body': '12.0, 76.0'}) == (12.0, 76.0)
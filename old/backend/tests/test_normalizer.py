@@ -0,0 +1,61 @@
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from geocoder import Gazetteer
+from normalizer import PlaceNormalizer
+
+
+class Answer(BaseModel):
+    status: str
+    question: Optional[str] = None
+    place: Optional[str] = None
+    confidence: Optional[str] = None
+    next_action: Optional[str] = None
+
+
+@pytest.fixture
+def llm_calls():
+    return []
+
+
+@pytest.fixture
+def normalizer(tmp_path, llm_calls):
+    def llm(messages):
+        llm_calls.append(messages[-1]['content'])
+        return Answer(status='place_normalized', place=f"{messages[-1]['content']}, Kozhikode", confidence='medium')
+
+    gazetteer = Gazetteer([{'name': 'Palayam', 'lat': 11.2588, 'lng': 75.7714, 'address': 'Palayam', 'id': 'stop:1'}])
+    return PlaceNormalizer(llm, Answer, gazetteer, str(tmp_path / 'normalize.db'))
+
+
+def conversation(*turns):
+    return [{'role': 'system', 'content': 'prompt'}] + [{'role': role, 'content': text} for role, text in turns]
+
+
+@pytest.mark.parametrize('text', ['Palayam', 'palayam, Kozhikode, Kerala'])
+def test_known_stop_is_answered_locally(normalizer, llm_calls, text):
+    answer = normalizer.resolve(conversation(('user', text)))
+    assert answer.place == 'Palayam' and answer.confidence == 'high'
+    assert not llm_calls
+
+
+@pytest.mark.parametrize('text', ['Palayam, Thiruvananthapuram', 'Palayamm', 'Palayam Market'])
+def test_partial_and_fuzzy_matches_go_to_the_model(normalizer, llm_calls, text):
+    normalizer.resolve(conversation(('user', text)))
+    assert llm_calls == [text]
+
+
+def test_follow_ups_are_never_pre_resolved(normalizer, llm_calls):
+    normalizer.resolve(conversation(('user', 'the market'), ('assistant', 'Which market?'), ('user', 'Palayam')))
+    assert llm_calls == ['Palayam']
+
+
+def test_same_text_in_the_same_context_is_cached(normalizer, llm_calls):
+    first = normalizer.resolve(conversation(('user', 'SM Street')))
+    again = normalizer.resolve(conversation(('user', 'sm street!')))
+    assert llm_calls == ['SM Street']
+    assert again.place == first.place
+    stats = normalizer.stats()
+    assert stats['llm_hits'] == 1 and stats['cache_hits'] == 1
@@ -0,0 +1,106 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from fake_twilio import FakeTwilio
+from outbound import MaybeSent, OutboundDispatcher, TokenBucket, TwilioError, retry_after_seconds
+
+MESSAGE = {'From': 'whatsapp:+14155238886', 'To': 'whatsapp:+919000000000', 'Body': 'hi'}
+
+
+@pytest.fixture
+def server():
+    server = FakeTwilio(latency_ms=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def dispatcher_for(api_base, **kwargs):
+    return OutboundDispatcher('ACtest', 'token', api_base=api_base, backoff=0.01, **kwargs)
+
+
+def test_send_returns_the_message_sid(server):
+    dispatcher = dispatcher_for(server.api_base)
+    assert dispatcher.send(MESSAGE).startswith('SM')
+    assert dispatcher.stats() == {'sent': 1, 'retries': 0, 'failed': 0}
+
+
+def test_rate_limited_send_waits_for_retry_after_and_succeeds(server):
+    server.limit_mps = 1
+    dispatcher = dispatcher_for(server.api_base)
+    dispatcher.send(MESSAGE)
+    started = time.monotonic()
+    assert dispatcher.send(MESSAGE).startswith('SM')
+    assert time.monotonic() - started >= 0.9
+    assert server.rate_limited >= 1 and dispatcher.retries >= 1
+
+
+def test_server_error_is_not_resent(server):
+    server.error_rate = 1.0
+    dispatcher = dispatcher_for(server.api_base)
+    with pytest.raises(MaybeSent) as error:
+        dispatcher.send(MESSAGE)
+    assert error.value.status == 503
+    assert server.errors == 1 and dispatcher.retries == 0
+
+
+def test_refused_connection_is_retried_and_not_ambiguous():
+    server = FakeTwilio(latency_ms=0)
+    api_base = server.api_base
+    server.server_close()  # nothing listens on that port now
+    dispatcher = dispatcher_for(api_base, max_retries=2)
+    with pytest.raises(TwilioError) as error:
+        dispatcher.send(MESSAGE)
+    assert not isinstance(error.value, MaybeSent)
+    assert dispatcher.retries == 2
+
+
+def test_send_batch_keeps_order(server):
+    dispatcher = dispatcher_for(server.api_base)
+    batch = [dict(MESSAGE, Body=str(i)) for i in range(20)]
+    results = dispatcher.send_batch(batch, concurrency=4)
+    assert len(results) == 20 and all(isinstance(sid, str) for sid in results)
+    assert len(set(results)) == 20
+
+
+def test_retry_after_forms():
+    assert retry_after_seconds('3') == 3.0
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds('soon') is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= retry_after_seconds(later) <= 30
+
+
+def test_token_bucket_paces_sends():
+    bucket = TokenBucket(rate=50, burst=1)
+    started = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.18
+
+
+def test_reply_that_may_have_arrived_completes_the_step(tmp_path, monkeypatch):
+    pytest.importorskip('twilio')
+    import webhook
+    from statestore import StateStore
+
+    monkeypatch.setattr(webhook, 'user_state', StateStore(str(tmp_path / 'state.db')))
+
+    def lost_answer(number, text):
+        raise MaybeSent('Twilio returned 503', 503)
+
+    monkeypatch.setattr(webhook, 'reply', lost_answer)
+    # Handled, so the worker completes the job instead of retrying it
+    webhook.process_message({'From': 'whatsapp:+919000000000', 'Body': 'hi'})
+    assert webhook.user_state.get('whatsapp:+919000000000') == {'step': 'awaiting_destination'}
+
+    def rejected(number, text):
+        raise TwilioError('Twilio returned 400', 400)
+
+    monkeypatch.setattr(webhook, 'reply', rejected)
+    with pytest.raises(TwilioError):
+        webhook.process_message({'From': 'whatsapp:+919000000001', 'Body': 'hi'})
+    assert webhook.user_state.get('whatsapp:+919000000001') == {}
@@ -0,0 +1,39 @@
+import pytest
+
+from findbus import AdvancedBusRouteFinder, journey_criteria
+from skyline import dominates
+
+
+@pytest.fixture(scope='module')
+def finder():
+    return AdvancedBusRouteFinder()
+
+
+def stop_pairs(finder):
+    stops = list(finder.stops.values())
+    return [(a['latitude'], a['longitude'], b['latitude'], b['longitude'])
+            for a in stops for b in stops if a is not b]
+
+
+def test_find_journeys_drops_dominated_journeys(finder):
+    found = 0
+    for coords in stop_pairs(finder):
+        criteria = [journey_criteria(j) for j in finder.find_journeys_with_realtime(*coords, 4, 5000)]
+        found += len(criteria)
+        assert not any(dominates(a, b) for a in criteria for b in criteria)
+    assert found
+
+
+def test_stream_never_yields_a_journey_an_earlier_one_dominates(finder):
+    for coords in stop_pairs(finder):
+        streamed = [journey_criteria(j) for j in finder.iter_routes_with_realtime(*coords, 4, 5000)]
+        for i, later in enumerate(streamed):
+            assert not any(dominates(earlier, later) for earlier in streamed[:i])
+
+
+def test_non_streaming_results_are_the_non_dominated_streamed_ones(finder):
+    for coords in stop_pairs(finder):
+        streamed = [journey_criteria(j) for j in finder.iter_routes_with_realtime(*coords, 4, 5000)]
+        skyline = {c for c in streamed if not any(dominates(other, c) for other in streamed)}
+        ranked = finder.find_journeys_with_realtime(*coords, 4, 5000, limit=len(streamed) or 1)
+        assert {journey_criteria(j) for j in ranked} == skyline
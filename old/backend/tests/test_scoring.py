@@ -0,0 +1,57 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import scoring
+from scoring import DEFAULT_PROFILE, PROFILES, get_profile, rank_journeys, score_journeys, top_k
+
+
+def journey(duration, transfers, fare, walking, departs_in=0):
+    return SimpleNamespace(total_duration=duration, total_transfers=transfers, total_fare=fare,
+                           walking_distance=walking, next_departure_in_minutes=departs_in, journey_score=0.0)
+
+
+def random_journeys(rng, count):
+    return [journey(rng.randint(10, 120), rng.randint(0, 3), rng.randint(5, 40), rng.randint(0, 10) * 100,
+                    rng.randint(0, 30)) for _ in range(count)]
+
+
+def test_get_profile():
+    assert get_profile(None) is DEFAULT_PROFILE
+    assert get_profile('Least-Walking') is PROFILES['least_walking']
+    with pytest.raises(ValueError):
+        get_profile('scenic')
+
+
+@pytest.mark.parametrize('count', [10, 200])
+def test_bulk_scores_match_the_profile(count):
+    journeys = random_journeys(random.Random(count), count)
+    for profile in PROFILES.values():
+        expected = [profile.score(j.total_duration, j.total_transfers, j.total_fare, j.walking_distance)
+                    for j in journeys]
+        assert score_journeys(journeys, profile) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('count, k', [(0, 3), (5, 10), (50, 5), (500, 20), (500, 500)])
+@pytest.mark.parametrize('numpy', [True, False])
+def test_top_k_is_the_head_of_a_stable_sort(monkeypatch, count, k, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(scoring, 'np', None)
+    rng = random.Random(count + k)
+    keys = [[rng.randint(0, 10) for _ in range(count)], [rng.randint(0, 3) for _ in range(count)]]
+    expected = sorted(range(count), key=lambda i: (keys[0][i], keys[1][i]))[:k]
+    assert top_k(keys, k) == expected
+
+
+def test_rank_journeys_orders_by_profile():
+    slow_cheap = journey(90, 0, 10, 0, departs_in=1)
+    fast_dear = journey(30, 0, 40, 0, departs_in=5)
+    assert rank_journeys([slow_cheap, fast_dear], PROFILES['fastest']) == [fast_dear, slow_cheap]
+    assert rank_journeys([slow_cheap, fast_dear], PROFILES['cheapest']) == [slow_cheap, fast_dear]
+    # The default profile puts the soonest departure first
+    assert rank_journeys([fast_dear, slow_cheap]) == [slow_cheap, fast_dear]
+    assert rank_journeys([fast_dear, slow_cheap], soonest_first=False)[0] is fast_dear
+    assert fast_dear.journey_score == DEFAULT_PROFILE.score(30, 0, 40, 0)
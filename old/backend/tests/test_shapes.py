@@ -0,0 +1,61 @@
+import pytest
+
+from shapes import RouteShape, decode_polyline, encode_polyline, haversine, route_shape, simplify
+
+STOPS = {
+    'S1': {'latitude': 8.5000, 'longitude': 76.9000},
+    'S2': {'latitude': 8.5100, 'longitude': 76.9000},
+    'S3': {'latitude': 8.5200, 'longitude': 76.9100},
+}
+# A road bending through the stops, with points between them
+SHAPE = [(8.5000, 76.9000), (8.5050, 76.9005), (8.5100, 76.9000),
+         (8.5150, 76.9030), (8.5180, 76.9070), (8.5200, 76.9100)]
+
+
+def test_polyline_round_trip():
+    # Google's documented example
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline(points) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+    assert decode_polyline(encode_polyline(SHAPE)) == pytest.approx(SHAPE)
+
+
+def test_straight_line_through_stops_without_a_shape():
+    shape = route_shape({'route_id': 'R1', 'stops': ['S1', 'S2', 'S3']}, STOPS)
+    assert shape.points == shape.stops
+    assert shape.distance(0, 2) == pytest.approx(
+        haversine(8.5, 76.9, 8.51, 76.9) + haversine(8.51, 76.9, 8.52, 76.91))
+
+
+def test_distance_follows_the_shape():
+    encoded = route_shape({'route_id': 'R1', 'stops': ['S1', 'S2', 'S3'],
+                           'shape': encode_polyline(SHAPE)}, STOPS)
+    listed = route_shape({'route_id': 'R1', 'stops': ['S1', 'S2', 'S3'],
+                          'shape': [list(p) for p in SHAPE]}, STOPS)
+    for shape in (encoded, listed):
+        assert shape.distance(0, 2) == pytest.approx(shape.cumulative[-1], abs=1)
+        assert shape.distance(0, 1) + shape.distance(1, 2) == pytest.approx(shape.distance(0, 2))
+        assert shape.distance(1, 2) > haversine(8.51, 76.9, 8.52, 76.91)
+
+
+def test_simplify_keeps_the_ends_and_corners():
+    line = [(0, 0), (1, 0.01), (2, 0), (3, 5), (4, 0)]
+    assert simplify(line, 0.5) == [0, 2, 3, 4]
+    assert simplify(line, 100) == [0, 4]
+    assert simplify(line[:2], 100) == [0, 1]
+
+
+def test_geometry_starts_and_ends_on_the_stops():
+    shape = RouteShape(SHAPE, [(8.5001, 76.9001), (8.5100, 76.9000), (8.5199, 76.9099)])
+    for zoom in (10, 16):
+        line = shape.geometry(zoom)
+        assert line[0] == shape.stops[0] and line[-1] == shape.stops[-1]
+        assert len(line) == len(set(line))
+    part = shape.geometry(16, 1, 2)
+    assert part[0] == shape.stops[1] and part[-1] == shape.stops[2]
+    assert (8.5150, 76.9030) in part
+
+
+def test_route_without_stops_or_shape():
+    shape = route_shape({'route_id': 'R0', 'stops': []}, STOPS)
+    assert shape.points == [] and shape.stop_offset == []
+    assert shape.simplified(14) == []
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import FlightTimeout, SingleFlight
+
+
+def run_together(flight, key, fn, callers, **kwargs):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn, **kwargs))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'routes'
+
+    results, errors = run_together(flight, 'trip', slow, 8)
+    assert results == ['routes'] * 8 and not errors
+    assert len(calls) == 1
+    assert flight.stats() == {'in_flight': 0, 'executed': 1, 'coalesced': 7}
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    def broken():
+        time.sleep(0.2)
+        raise ValueError('no graph')
+
+    results, errors = run_together(flight, 'trip', broken, 4)
+    assert not results
+    assert len(errors) == 4 and all(isinstance(e, ValueError) for e in errors)
+
+
+def test_later_calls_run_again():
+    flight = SingleFlight()
+    counter = iter(range(10))
+    assert flight.do('trip', lambda: next(counter)) == 0
+    assert flight.do('trip', lambda: next(counter)) == 1
+
+
+def test_waiter_timeout_leaves_the_call_running():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.3)
+        return 'late'
+
+    leader = threading.Thread(target=lambda: flight.do('trip', slow))
+    leader.start()
+    started.wait()
+    with pytest.raises(FlightTimeout):
+        flight.do('trip', slow, timeout=0.05)
+    leader.join()
+    assert flight.stats()['executed'] == 1
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import skyline
+from skyline import dominates, skyline_mask, skyline_mask_numpy, staircase_mask
+
+
+def brute_force(points):
+    return [not any(dominates(other, point) for other in points) for point in points]
+
+
+def random_points(rng, count):
+    # Few distinct values per criterion, so ties and duplicates are common
+    return [(rng.randint(20, 60), rng.randint(0, 3), rng.choice([10.0, 15.0, 20.0, 25.0]), rng.randint(0, 5) * 100.0)
+            for _ in range(count)]
+
+
+def test_dominates():
+    assert dominates((30, 1, 15.0, 200.0), (30, 1, 20.0, 200.0))
+    assert not dominates((30, 1, 15.0, 200.0), (30, 1, 15.0, 200.0))
+    assert not dominates((30, 0, 15.0, 200.0), (20, 1, 15.0, 200.0))
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_staircase_matches_brute_force(seed):
+    rng = random.Random(seed)
+    points = random_points(rng, rng.randint(0, 200))
+    assert staircase_mask(points) == brute_force(points)
+
+
+def test_identical_points_are_kept_together():
+    points = [(30, 1, 15.0, 200.0), (30, 1, 15.0, 200.0), (40, 1, 15.0, 200.0)]
+    assert skyline_mask(points) == [True, True, False]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_numpy_filter_matches_brute_force(seed):
+    pytest.importorskip('numpy')
+    rng = random.Random(seed)
+    points = random_points(rng, 3000)
+    assert skyline_mask_numpy(points) == brute_force(points)
+
+
+def test_large_batches_use_numpy_when_installed(monkeypatch):
+    pytest.importorskip('numpy')
+    used = []
+    monkeypatch.setattr(skyline, 'NUMPY_MIN_BATCH', 10)
+    monkeypatch.setattr(skyline, 'skyline_mask_numpy', lambda points: used.append(len(points)) or [True] * len(points))
+    skyline_mask(random_points(random.Random(0), 20))
+    assert used == [20]
+
+
+def test_find_all_routes_keeps_only_non_dominated_journeys():
+    from findbus import AdvancedBusRouteFinder, journey_criteria
+
+    finder = AdvancedBusRouteFinder()
+    stops = list(finder.stops.values())
+    for a in stops:
+        for b in stops:
+            if a is b:
+                continue
+            journeys = finder.find_all_routes(a['latitude'], a['longitude'], b['latitude'], b['longitude'])
+            criteria = [journey_criteria(j) for j in journeys]
+            assert all(brute_force(criteria))
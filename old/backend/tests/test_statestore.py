@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from statestore import StateBusy, StateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path / 'state.db'), max_entries=2, ttl=60)
+
+
+def test_session_saves_and_deletes(store):
+    with store.session('+911') as state:
+        state['step'] = 'awaiting_destination'
+    assert store.get('+911') == {'step': 'awaiting_destination'}
+    with store.session('+911') as state:
+        state.clear()
+    assert store.get('+911') == {}
+
+
+def test_session_is_not_saved_when_the_block_raises(store):
+    store.set('+911', {'step': 'awaiting_destination'})
+    with pytest.raises(RuntimeError):
+        with store.session('+911') as state:
+            state['step'] = 'awaiting_current_location'
+            raise RuntimeError('send failed')
+    assert store.get('+911') == {'step': 'awaiting_destination'}
+    # The lock was released too
+    with store.session('+911', timeout=0) as state:
+        assert state['step'] == 'awaiting_destination'
+
+
+def test_get_returns_a_copy(store):
+    store.set('+911', {'messages': [1]})
+    store.get('+911')['messages'].append(2)
+    assert store.get('+911') == {'messages': [1]}
+
+
+def test_state_expires_after_ttl(store, monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    store.set('+911', {'step': 'awaiting_destination'})
+    now[0] += 59
+    assert store.get('+911')
+    now[0] += 2
+    assert store.get('+911') == {}
+    assert store.purge_expired() == 1
+
+
+def test_memory_is_bounded_and_evicted_numbers_read_back_from_disk(store):
+    for n in range(3):
+        store.set(f"+91{n}", {'n': n})
+    assert list(store._memory) == ['+911', '+912']
+    misses = store.misses
+    assert store.get('+910') == {'n': 0}
+    assert store.misses == misses + 1
+    # Reading it back made it the most recent; the least recent one went
+    assert list(store._memory) == ['+912', '+910']
+
+
+def test_state_survives_a_restart(tmp_path):
+    StateStore(str(tmp_path / 'state.db')).set('+911', {'step': 'awaiting_destination'})
+    assert StateStore(str(tmp_path / 'state.db')).get('+911') == {'step': 'awaiting_destination'}
+
+
+def test_shared_store_sees_other_processes_writes(tmp_path):
+    mine = StateStore(str(tmp_path / 'state.db'), shared=True)
+    theirs = StateStore(str(tmp_path / 'state.db'), shared=True)
+    mine.set('+911', {'step': 'awaiting_destination'})
+    assert mine.get('+911')
+    theirs.set('+911', {'step': 'awaiting_current_location'})
+    assert mine.get('+911') == {'step': 'awaiting_current_location'}
+
+
+def test_busy_session_times_out(store):
+    held = threading.Event()
+    release = threading.Event()
+
+    def worker():
+        with store.session('+911'):
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    held.wait()
+    try:
+        started = time.monotonic()
+        with pytest.raises(StateBusy):
+            with store.session('+911', timeout=0.05):
+                pass
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        thread.join()
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip('twilio')
+
+import webhook
+from jobqueue import JobQueue
+from statestore import StateStore
+
+NUMBER = 'whatsapp:+919000000000'
+PIN = {'From': NUMBER, 'Body': '', 'Latitude': '11.2588', 'Longitude': '75.7714'}
+
+
+class Finder:
+    stops = {'BS003': {'stop_name': 'Palayam Market'}}
+
+    def find_nearest_stops(self, lat, lng, max_distance, limit):
+        return [('BS003', 12.0)]
+
+    def find_routes_with_realtime(self, *args, **kwargs):
+        return []
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    monkeypatch.setattr(webhook, 'user_state', StateStore(str(tmp_path / 'state.db')))
+    monkeypatch.setattr(webhook, 'jobs', JobQueue(str(tmp_path / 'jobs.db')))
+    monkeypatch.setattr(webhook, '_finder', Finder())
+    monkeypatch.setattr(webhook, 'INLINE_LOCK_WAIT', 0.05)
+    return webhook.app.test_client()
+
+
+def test_pins_are_answered_inline(bot):
+    assert 'Welcome' in bot.post('/Whatsapp', data={'From': NUMBER, 'Body': 'hi'}).get_data(as_text=True)
+    answer = bot.post('/Whatsapp', data=PIN).get_data(as_text=True)
+    assert 'near Palayam Market (12 m)' in answer
+    assert webhook.jobs.pending(NUMBER) == 0
+
+
+def test_typed_places_go_to_a_worker(bot):
+    bot.post('/Whatsapp', data={'From': NUMBER, 'Body': 'hi'})
+    bot.post('/Whatsapp', data={'From': NUMBER, 'Body': 'Palayam'})
+    assert webhook.jobs.pending(NUMBER) == 1
+
+
+def test_busy_state_lock_hands_over_to_a_worker(bot):
+    bot.post('/Whatsapp', data={'From': NUMBER, 'Body': 'hi'})
+    lock = webhook.user_state.lock(NUMBER)
+    with lock:
+        assert bot.post('/Whatsapp', data=PIN).get_data(as_text=True) == ''
+    assert webhook.jobs.pending(NUMBER) == 1
+    assert webhook.user_state.get(NUMBER)['step'] == 'awaiting_destination'
+
+
+def test_busy_search_hands_over_without_touching_state(bot):
+    bot.post('/Whatsapp', data={'From': NUMBER, 'Body': 'hi'})
+    bot.post('/Whatsapp', data=PIN)
+    with webhook._search_lock:
+        assert bot.post('/Whatsapp', data=PIN).get_data(as_text=True) == ''
+    assert webhook.jobs.pending(NUMBER) == 1
+    assert webhook.user_state.get(NUMBER)['step'] == 'awaiting_current_location'
@@ -1,5 +1,5 @@
 import os
-import requests
+import threading
 from openai import OpenAI
 from pydantic import BaseModel, Field
 from typing import Literal, Optional
@@ -49,7 +49,7 @@ Return JSON in one of two formats:
 Only respond with one of these JSON formats. Do not explain.
 """
 
-def call_agent(messages):
+def ask_llm(messages):
     response = client.beta.chat.completions.parse(
         model="gpt-4o",
         messages=messages,
@@ -57,6 +57,20 @@ def call_agent(messages):
     )
     return response.choices[0].message.parsed
 
+_normalizer = None
+# Bot workers call in from several threads; each cache is built once
+_init_lock = threading.Lock()
+
+def call_agent(messages):
+    """Stop names and inputs normalized before are answered without the model"""
+    global _normalizer
+    if _normalizer is None:
+        with _init_lock:
+            if _normalizer is None:
+                from normalizer import PlaceNormalizer
+                _normalizer = PlaceNormalizer(ask_llm, AgentResponse)
+    return _normalizer.resolve(messages)
+
 def resolve_place_interactively():
     user_input = input("User: ")
     messages = [{"role": "system", "content": system_prompt},
@@ -73,11 +87,17 @@ def resolve_place_interactively():
 
     return parsed, messages
 
+_geocoder = None
+
 def get_coordinates(place):
-    endpoint = "https://maps.googleapis.com/maps/api/geocode/json"
-    params = {"address": place, "key": gmap_api_key}
-    response = requests.get(endpoint, params=params)
-    return response.json()
+    """Google-style geocode result; our stops and cached answers skip the API call"""
+    global _geocoder
+    if _geocoder is None:
+        with _init_lock:
+            if _geocoder is None:
+                from geocoder import Geocoder
+                _geocoder = Geocoder(gmap_api_key)
+    return _geocoder.geocode(place)
 
 def confirm_location_loop(parsed, messages):
     while True:
@@ -124,76 +144,78 @@ def getaddress():
     return result
 
 
-user = {
-    "user_id": None,
-    "to": None,
-    "current": None,
-    'stage': 'new'
-    }
+def main():
+    user = {
+        "user_id": None,
+        "to": None,
+        "current": None,
+        'stage': 'new'
+        }
 
 
-   
 
 
-# -----------------------------
-# Main Flow
-# -----------------------------
-print('TEMPLATE‼️ hello there welcome to busbot whwre do you want to go?')
 
-result = getaddress()
-if result:
-    print("\n✅ Finalized Location:")
-    to_addres = result
-    user['to'] = to_addres
-    user['stage'] = "recived_to"
+    # -----------------------------
+    # Main Flow
+    # -----------------------------
+    print('TEMPLATE‼️ hello there welcome to busbot whwre do you want to go?')
 
-else:
-    print("⚠️ Could not resolve the location.")
+    result = getaddress()
+    if result:
+        print("\n✅ Finalized Location:")
+        to_addres = result
+        user['to'] = to_addres
+        user['stage'] = "recived_to"
 
+    else:
+        print("⚠️ Could not resolve the location.")
 
 
 
-print(
-    "\nTEMPLATE‼️ 🗺️ Great! Now, where are you starting from?\n"
-    "Please choose one of the following:\n"
-    "1. Type your current address\n"
-    "2. Paste a Google Maps link\n"
-    "3. Type 'send current location' "
-)
 
-user_input = input("User: ").strip()
+    print(
+        "\nTEMPLATE‼️ 🗺️ Great! Now, where are you starting from?\n"
+        "Please choose one of the following:\n"
+        "1. Type your current address\n"
+        "2. Paste a Google Maps link\n"
+        "3. Type 'send current location' "
+    )
 
-if user_input.lower() == "send current location" or user_input.lower() == "s":
-    # Use hardcoded landmark for demo
-    current_address = "Landmark World, Calicut, Kerala, India"
-    print(f"\nUsing test location: {current_address}")
-    
+    user_input = input("User: ").strip()
 
-# elif "https://maps.google.com" in user_input or "goo.gl/maps" in user_input:
-#     # Attempt to extract the place from Google Maps URL
-#     print("TEMPLATE‼️ 📎 You sent a Google Maps link. Trying to resolve...")
-#     messages = [{"role": "system", "content": system_prompt},
-#                 {"role": "user", "content": user_input}]
-#     parsed = call_agent(messages)
-#     confirmed = confirm_location_loop(parsed, messages)
-#     user["current"] = confirmed
-
-else:
-    # Treat input as free text
-    print("TEMPLATE‼️ 📍 Resolving typed address...")
-    current_address = getaddress()
-    
-user["current"] = current_address
-user["stage"] = "received_current"
+    if user_input.lower() == "send current location" or user_input.lower() == "s":
+        # Use hardcoded landmark for demo
+        current_address = "Landmark World, Calicut, Kerala, India"
+        print(f"\nUsing test location: {current_address}")
+
+
+    # elif "https://maps.google.com" in user_input or "goo.gl/maps" in user_input:
+    #     # Attempt to extract the place from Google Maps URL
+    #     print("TEMPLATE‼️ 📎 You sent a Google Maps link. Trying to resolve...")
+    #     messages = [{"role": "system", "content": system_prompt},
+    #                 {"role": "user", "content": user_input}]
+    #     parsed = call_agent(messages)
+    #     confirmed = confirm_location_loop(parsed, messages)
+    #     user["current"] = confirmed
+
+    else:
+        # Treat input as free text
+        print("TEMPLATE‼️ 📍 Resolving typed address...")
+        current_address = getaddress()
 
-print("\n✅ Final Status:")
-print("🚌 Destination:", user["to"]["place"])
-print("📍 Current Location:", user["current"])
+    user["current"] = current_address
+    user["stage"] = "received_current"
 
-# if input("user: ") == ' send current location':
-#     currentloc = 'landmark world calicut kerala india '
-# elif if include map link 
-# else call gett to_addres
+    print("\n✅ Final Status:")
+    print("🚌 Destination:", user["to"]["place"])
+    print("📍 Current Location:", user["current"])
 
+    # if input("user: ") == ' send current location':
+    #     currentloc = 'landmark world calicut kerala india '
+    # elif if include map link 
+    # else call gett to_addres
 
 
+if __name__ == '__main__':
+    main()
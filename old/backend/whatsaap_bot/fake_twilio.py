@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Twilio Messages API, for outbound throughput tests
+Accepts POST /2010-04-01/Accounts/<sid>/Messages.json like the real API,
+with configurable latency, random 5xx errors and a messages-per-second
+limit answered with 429 + Retry-After. Running the file benchmarks
+OutboundDispatcher against it:
+
+    python fake_twilio.py --messages 1000 --latency-ms 80 --limit-mps 200
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+import requests
+
+from outbound import OutboundDispatcher
+
+
+class FakeTwilio(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for the dispatcher's whole connection pool
+    request_queue_size = 128
+
+    def __init__(self, port: int = 0, latency_ms: float = 80, error_rate: float = 0.0,
+                 limit_mps: float = 0):
+        super().__init__(('127.0.0.1', port), FakeTwilioHandler)
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.limit_mps = limit_mps
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.accepted = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.connections = set()
+
+    @property
+    def api_base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def admit(self) -> str:
+        """'ok', 'rate_limited' or 'error' for the next request"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start, self.window_count = now, 0
+            if self.limit_mps and self.window_count >= self.limit_mps:
+                self.rate_limited += 1
+                return 'rate_limited'
+            self.window_count += 1
+            if random.random() < self.error_rate:
+                self.errors += 1
+                return 'error'
+            self.accepted += 1
+            return 'ok'
+
+    def start(self) -> 'FakeTwilio':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, body: Dict, headers: Dict[str, str] = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not (self.path.startswith('/2010-04-01/Accounts/') and self.path.endswith('/Messages.json')):
+            self.reply(404, {'code': 20404, 'message': 'Not found'})
+            return
+
+        time.sleep(self.server.latency)
+        outcome = self.server.admit()
+        if outcome == 'rate_limited':
+            self.reply(429, {'code': 20429, 'message': 'Too Many Requests'}, {'Retry-After': '1'})
+        elif outcome == 'error':
+            self.reply(503, {'code': 20503, 'message': 'Service unavailable'})
+        else:
+            self.reply(201, {'sid': 'SM' + uuid.uuid4().hex, 'status': 'queued'})
+
+
+def benchmark(messages: int = 1000, latency_ms: float = 80, error_rate: float = 0.02,
+              limit_mps: float = 200, rate: float = 180, concurrency: int = 32,
+              baseline: int = 100) -> Dict:
+    """Fan-out through the dispatcher vs. one fresh connection per message, sequentially"""
+    server = FakeTwilio(latency_ms=latency_ms, error_rate=error_rate, limit_mps=limit_mps).start()
+    results = {'messages': messages}
+
+    dispatcher = OutboundDispatcher('ACfake', 'token', api_base=server.api_base, rate=rate,
+                                    backoff=0.1, pool_size=concurrency)
+    batch = [{'From': 'whatsapp:+14155238886', 'To': f'whatsapp:+9190000{i:05d}', 'Body': 'Service alert'}
+             for i in range(messages)]
+    started = time.perf_counter()
+    outcomes = dispatcher.send_batch(batch, concurrency)
+    elapsed = time.perf_counter() - started
+    results.update({
+        'dispatcher_seconds': elapsed,
+        'dispatcher_per_s': messages / elapsed,
+        'delivered': sum(1 for o in outcomes if isinstance(o, str)),
+        'retries': dispatcher.retries,
+        'server_429s': server.rate_limited,
+        'server_5xx': server.errors,
+        'connections_opened': len(server.connections),
+    })
+
+    # Old behaviour: one blocking request, new connection each time
+    server.error_rate = 0.0
+    started = time.perf_counter()
+    for params in batch[:baseline]:
+        requests.post(f"{server.api_base}/2010-04-01/Accounts/ACfake/Messages.json",
+                      data=params, auth=('ACfake', 'token'), timeout=10)
+    results['sequential_per_s'] = baseline / (time.perf_counter() - started)
+
+    server.shutdown()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Outbound throughput against a local fake Twilio API")
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--limit-mps', type=float, default=200, help="server-side limit; 0 for none")
+    parser.add_argument('--rate', type=float, default=180, help="dispatcher token bucket rate")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--serve', type=int, metavar='PORT', help="only run the fake API on PORT")
+    args = parser.parse_args()
+
+    if args.serve:
+        server = FakeTwilio(args.serve, args.latency_ms, args.error_rate, args.limit_mps)
+        print(f"🧪 Fake Twilio API on {server.api_base} (set TWILIO_API_BASE to use it)")
+        server.serve_forever()
+    else:
+        print(f"\n📊 Sending {args.messages} messages")
+        for name, value in benchmark(args.messages, args.latency_ms, args.error_rate, args.limit_mps,
+                                     args.rate, args.concurrency).items():
+            print(f"  {name}: {value:.2f}" if isinstance(value, float) else f"  {name}: {value}")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Geocoding for the bot, cheapest source first
+1. a local gazetteer of our bus stops (and landmarks.json if present),
+   exact then fuzzy name match
+2. a SQLite cache of earlier answers keyed on the normalized query, LRU-evicted
+3. the Google Geocoding API over a pooled session
+Every answer has the Google response shape, so callers don't care which
+source answered.
+"""
+
+import difflib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STOPS_FILE = os.path.join(BOT_DIR, '..', 'bus_stops.json')
+LANDMARKS_FILE = os.getenv('LANDMARKS_FILE', os.path.join(BOT_DIR, 'landmarks.json'))
+DEFAULT_CACHE_DB = os.getenv('GEOCODE_CACHE_DB', os.path.join(BOT_DIR, 'geocode_cache.db'))
+GOOGLE_GEOCODE_URL = os.getenv('GOOGLE_GEOCODE_URL', 'https://maps.googleapis.com/maps/api/geocode/json')
+
+# Trailing parts the LLM adds to every normalized place; they never tell stops apart
+REGION_WORDS = {'kozhikode', 'calicut', 'kerala', 'india'}
+FUZZY_CUTOFF = 0.85
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, accents and punctuation folded, single spaces"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+
+def google_shape(lat: float, lng: float, address: str, source: str, place_id: str = '') -> Dict:
+    return {
+        'status': 'OK',
+        'results': [{
+            'formatted_address': address,
+            'geometry': {'location': {'lat': lat, 'lng': lng}},
+            'place_id': place_id,
+        }],
+        'source': source,
+    }
+
+
+class Gazetteer:
+    """Name -> coordinates for places we know without asking anyone"""
+
+    def __init__(self, places: List[Dict]):
+        self.places: Dict[str, Dict] = {}
+        # word -> names containing it, so fuzzy matching only scores plausible names
+        self.by_word: Dict[str, set] = defaultdict(set)
+        for place in places:
+            for name in [place['name']] + place.get('aliases', []):
+                key = normalize_query(name)
+                if key and key not in self.places:
+                    self.places[key] = place
+                    for word in key.split():
+                        self.by_word[word].add(key)
+
+    @classmethod
+    def from_files(cls, stops_file: str = STOPS_FILE, landmarks_file: str = LANDMARKS_FILE) -> 'Gazetteer':
+        places = []
+        if os.path.exists(stops_file):
+            with open(stops_file, 'r', encoding='utf-8') as f:
+                for stop in json.load(f):
+                    places.append({'name': stop['stop_name'], 'lat': stop['latitude'], 'lng': stop['longitude'],
+                                   'address': stop.get('address') or stop['stop_name'],
+                                   'id': f"stop:{stop['stop_id']}"})
+        if os.path.exists(landmarks_file):
+            # [{"name", "latitude", "longitude", "address"?, "aliases"?: [...]}, ...]
+            with open(landmarks_file, 'r', encoding='utf-8') as f:
+                for landmark in json.load(f):
+                    places.append({'name': landmark['name'], 'lat': landmark['latitude'],
+                                   'lng': landmark['longitude'], 'address': landmark.get('address') or landmark['name'],
+                                   'aliases': landmark.get('aliases', []), 'id': f"landmark:{landmark['name']}"})
+        return cls(places)
+
+    def candidates(self, key: str) -> List[str]:
+        """Query variants: as typed and without region words"""
+        variants = [key]
+        words = [w for w in key.split() if w not in REGION_WORDS]
+        if words and ' '.join(words) != key:
+            variants.append(' '.join(words))
+        return variants
+
+    def exact(self, query: str) -> Optional[Dict]:
+        """Place whose name or alias is the whole query, region words aside"""
+        for variant in self.candidates(normalize_query(query)):
+            if variant in self.places:
+                return self.places[variant]
+        return None
+
+    def elsewhere(self, query: str) -> bool:
+        """
+        True when a part after the first comma is neither our region, a postcode
+        nor one of our places: 'Beach Road, Chennai' is not our Beach Road
+        """
+        for part in query.split(',')[1:]:
+            key = normalize_query(part)
+            if key and key not in self.places and not all(w in REGION_WORDS or w.isdigit() for w in key.split()):
+                return True
+        return False
+
+    def match(self, query: str, fuzzy: bool = True) -> Tuple[Optional[Dict], float]:
+        """Best place for query and its similarity (1.0 for an exact name match)"""
+        if self.elsewhere(query):
+            return None, 0.0
+        keys = [normalize_query(query)]
+        head = query.split(',')[0]
+        if head != query:
+            keys.append(normalize_query(head))
+        variants = [v for key in keys for v in self.candidates(key)]
+
+        for variant in variants:
+            if variant in self.places:
+                return self.places[variant], 1.0
+        if not fuzzy:
+            return None, 0.0
+
+        best, best_ratio = None, FUZZY_CUTOFF
+        for variant in variants:
+            pool = set().union(*(self.by_word.get(word, ()) for word in variant.split()))
+            for name in pool:
+                ratio = difflib.SequenceMatcher(None, variant, name).ratio()
+                if ratio > best_ratio:
+                    best, best_ratio = name, ratio
+            # Typos inside the only word: fall back to difflib over all names
+            if not pool:
+                close = difflib.get_close_matches(variant, self.places.keys(), n=1, cutoff=best_ratio)
+                if close:
+                    best, best_ratio = close[0], difflib.SequenceMatcher(None, variant, close[0]).ratio()
+        return (self.places[best], best_ratio) if best else (None, 0.0)
+
+    def lookup(self, query: str, fuzzy: bool = True) -> Optional[Dict]:
+        return self.match(query, fuzzy)[0]
+
+
+_default_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def default_gazetteer() -> Gazetteer:
+    """Process-wide gazetteer from the default files, shared by geocoder and normalizer"""
+    global _default_gazetteer
+    with _gazetteer_lock:
+        if _default_gazetteer is None:
+            _default_gazetteer = Gazetteer.from_files()
+        return _default_gazetteer
+
+
+class GeocodeCache:
+    """Persistent normalized-query -> response cache, evicting least recently used"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_DB, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                query TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS geocode_cache_lru ON geocode_cache (last_used);
+        """)
+        self.size = conn.execute('SELECT COUNT(*) FROM geocode_cache').fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute('SELECT response FROM geocode_cache WHERE query = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute('UPDATE geocode_cache SET last_used = ? WHERE query = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict):
+        conn = self._connect()
+        cursor = conn.execute('INSERT OR REPLACE INTO geocode_cache (query, response, last_used) VALUES (?, ?, ?)',
+                              (key, json.dumps(response, ensure_ascii=False), time.time()))
+        self.size += cursor.rowcount  # approximate (replacements count too); recounted on eviction
+        if self.size > self.max_entries:
+            # Evict a tenth at once rather than one row per insert
+            excess = self.size - int(self.max_entries * 0.9)
+            conn.execute('DELETE FROM geocode_cache WHERE query IN '
+                         '(SELECT query FROM geocode_cache ORDER BY last_used LIMIT ?)', (excess,))
+            self.size = conn.execute('SELECT COUNT(*) FROM geocode_cache').fetchone()[0]
+
+
+class Geocoder:
+    def __init__(self, api_key: Optional[str] = None, gazetteer: Optional[Gazetteer] = None,
+                 cache: Optional[GeocodeCache] = None, url: str = GOOGLE_GEOCODE_URL, timeout: float = 10):
+        self.api_key = api_key
+        self.gazetteer = gazetteer if gazetteer is not None else default_gazetteer()
+        self.cache = cache if cache is not None else GeocodeCache()
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=16))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=16))
+
+        self._lock = threading.Lock()
+        self.counts = {'gazetteer': 0, 'cache': 0, 'google': 0}
+        self.seconds = {'gazetteer': 0.0, 'cache': 0.0, 'google': 0.0}
+
+    def _record(self, source: str, started: float):
+        with self._lock:
+            self.counts[source] += 1
+            self.seconds[source] += time.perf_counter() - started
+
+    def geocode(self, place: str) -> Dict:
+        """Google-style geocode response for place, with 'source' saying who answered"""
+        started = time.perf_counter()
+        found = self.gazetteer.lookup(place)
+        if found is not None:
+            self._record('gazetteer', started)
+            return google_shape(found['lat'], found['lng'], found['address'], 'gazetteer', found['id'])
+
+        key = normalize_query(place)
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached['source'] = 'cache'
+            self._record('cache', started)
+            return cached
+
+        response = self.session.get(self.url, params={'address': place, 'key': self.api_key},
+                                    timeout=self.timeout).json()
+        # Only real answers are kept; errors and quota failures are worth retrying
+        if response.get('status') in ('OK', 'ZERO_RESULTS'):
+            self.cache.put(key, response)
+        response['source'] = 'google'
+        self._record('google', started)
+        return response
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                'lookups': total,
+                'external_calls': self.counts['google'],
+                'external_rate': round(self.counts['google'] / total, 3) if total else 0.0,
+                **{f"{source}_hits": n for source, n in self.counts.items()},
+                **{f"{source}_avg_ms": round(self.seconds[source] / n * 1000, 3)
+                   for source, n in self.counts.items() if n},
+            }
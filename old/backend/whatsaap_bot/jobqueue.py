@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Local job queue for the WhatsApp bot
+The webhook only records the incoming message in a SQLite table and answers
+Twilio at once; a pool of worker threads claims jobs, does the slow part
+(LLM, geocoding, routing) and replies through the Twilio API. Messages from
+the same number are handled one at a time, in arrival order.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_DB = os.getenv('BOT_QUEUE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    claimed_at REAL,
+    enqueued_at REAL NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, id);
+"""
+
+# Oldest ready job whose number has no earlier job still waiting or running
+CLAIM_SQL = """
+UPDATE jobs SET status = 'running', attempts = attempts + 1, claimed_at = :now
+WHERE id = (
+    SELECT j.id FROM jobs AS j
+    WHERE j.status = 'queued' AND j.available_at <= :now
+      AND NOT EXISTS (SELECT 1 FROM jobs AS earlier
+                      WHERE earlier.key = j.key AND earlier.id < j.id
+                        AND earlier.status IN ('queued', 'running'))
+    ORDER BY j.id LIMIT 1
+)
+RETURNING id, key, payload, attempts, enqueued_at
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    key: str
+    payload: Dict
+    attempts: int
+    enqueued_at: float
+
+
+class JobQueue:
+    def __init__(self, path: str = DEFAULT_DB, max_attempts: int = 3, visibility_timeout: float = 120.0):
+        """
+        max_attempts: a job that fails this many times is parked as 'failed'
+        visibility_timeout: seconds after which a 'running' job is assumed lost
+        (worker crashed) and handed out again
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self._local = threading.local()
+        self._ready = threading.Event()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; autocommit, so every statement is its own transaction"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, key: str, payload: Dict) -> int:
+        now = time.time()
+        cursor = self._connect().execute(
+            'INSERT INTO jobs (key, payload, available_at, enqueued_at) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(payload, ensure_ascii=False), now, now))
+        self._ready.set()
+        return cursor.lastrowid
+
+    def claim(self) -> Optional[Job]:
+        row = self._connect().execute(CLAIM_SQL, {'now': time.time()}).fetchone()
+        if row is None:
+            return None
+        return Job(row[0], row[1], json.loads(row[2]), row[3], row[4])
+
+    def complete(self, job: Job):
+        self._connect().execute('DELETE FROM jobs WHERE id = ?', (job.id,))
+        self._ready.set()  # a later message from the same number may be ready now
+
+    def fail(self, job: Job, error: str):
+        """Retry with exponential backoff, or park the job once attempts run out"""
+        conn = self._connect()
+        if job.attempts >= self.max_attempts:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ? WHERE id = ?", (error, job.id))
+        else:
+            conn.execute("UPDATE jobs SET status = 'queued', error = ?, available_at = ? WHERE id = ?",
+                         (error, time.time() + 2 ** job.attempts, job.id))
+        self._ready.set()
+
+    def pending(self, key: str) -> int:
+        """Jobs for key still waiting or running"""
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)).fetchone()[0]
+
+    def requeue_stale(self) -> int:
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND claimed_at < ?",
+            (time.time() - self.visibility_timeout,))
+        return cursor.rowcount
+
+    def wait(self, timeout: float):
+        """Sleep until something is enqueued or finished in this process, or timeout"""
+        self._ready.wait(timeout)
+        self._ready.clear()
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+
+class WorkerPool:
+    """Threads that drain a JobQueue with handler(payload); failures are retried"""
+
+    def __init__(self, queue: JobQueue, handler: Callable[[Dict], None], workers: int = 4,
+                 poll_interval: float = 0.5,
+                 on_done: Optional[Callable[[Job], None]] = None):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.on_done = on_done
+        self.processed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        recovered = self.queue.requeue_stale()
+        if recovered:
+            print(f"♻️  Requeued {recovered} jobs left running by a previous process")
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"bot-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"👷 {self.workers} bot workers started on {self.queue.path}")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self.queue._ready.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def _run(self):
+        last_recovery = time.time()
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                if time.time() - last_recovery > self.queue.visibility_timeout:
+                    self.queue.requeue_stale()
+                    last_recovery = time.time()
+                self.queue.wait(self.poll_interval)
+                continue
+            try:
+                self.handler(job.payload)
+            except Exception as e:
+                print(f"❌ Job {job.id} for {job.key} failed (attempt {job.attempts}): {e}")
+                self.queue.fail(job, str(e))
+                with self._lock:
+                    self.failed += 1
+                continue
+            self.queue.complete(job)
+            with self._lock:
+                self.processed += 1
+            if self.on_done is not None:
+                self.on_done(job)
+
+
+def benchmark(messages: int = 1000, senders: int = 250, workers: int = 8, work_ms: float = 50.0) -> Dict:
+    """
+    Burst of `messages` from `senders` numbers. work_ms stands in for the
+    LLM/geocode/route/send time of one job. Reports how long the webhook side
+    takes to acknowledge and how long the pool takes to drain the burst.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = JobQueue(os.path.join(tmp, 'bench.db'))
+        latencies = []
+        done = threading.Event()
+
+        def on_done(job: Job):
+            latencies.append(time.time() - job.enqueued_at)
+            if len(latencies) == messages:
+                done.set()
+
+        pool = WorkerPool(queue, lambda payload: time.sleep(work_ms / 1000), workers,
+                          poll_interval=0.05, on_done=on_done)
+        pool.start()
+
+        ack_times = []
+        started = time.perf_counter()
+        for i in range(messages):
+            t = time.perf_counter()
+            queue.put(f"+91900000{i % senders:04d}", {'From': f"whatsapp:+91900000{i % senders:04d}",
+                                                        'Body': f"message {i}"})
+            ack_times.append(time.perf_counter() - t)
+        enqueue_seconds = time.perf_counter() - started
+        done.wait()
+        total_seconds = time.perf_counter() - started
+        pool.stop()
+
+    latencies.sort()
+    ack_times.sort()
+    return {
+        'messages': messages,
+        'workers': workers,
+        'work_ms': work_ms,
+        'ack_p50_ms': ack_times[len(ack_times) // 2] * 1000,
+        'ack_p95_ms': ack_times[int(len(ack_times) * 0.95)] * 1000,
+        'enqueue_per_s': messages / enqueue_seconds,
+        'drain_seconds': total_seconds,
+        'processed_per_s': messages / total_seconds,
+        'reply_p50_s': latencies[len(latencies) // 2],
+        'reply_p95_s': latencies[int(len(latencies) * 0.95)],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput of the bot job queue for a message burst")
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--senders', type=int, default=250, help="distinct phone numbers in the burst")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--work-ms', type=float, default=50.0, help="simulated processing time per message")
+    args = parser.parse_args()
+
+    print(f"\n📊 Burst of {args.messages} messages from {args.senders} numbers")
+    for name, value in benchmark(args.messages, args.senders, args.workers, args.work_ms).items():
+        print(f"  {name}: {value:.2f}" if isinstance(value, float) else f"  {name}: {value}")
@@ -0,0 +1,75 @@
+"""
+Coordinates users send us directly: WhatsApp location pins, Google Maps
+links and typed "lat, lng" pairs. All parsed locally, no API calls.
+Short links (maps.app.goo.gl) only redirect to a full link, so they can't
+be read without a request and are left to the normal geocoding path.
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+NUMBER = r'(-?\d{1,3}(?:\.\d+)?)'
+# Typed pairs need decimals: "1, 2" is an answer to a question, not a place
+DECIMAL = r'(-?\d{1,3}\.\d+)'
+# "11.2588, 75.7714" typed or pasted on its own
+BARE_PAIR = re.compile(rf'^\s*{DECIMAL}\s*,\s*{DECIMAL}\s*$')
+# /@11.2588,75.7714,17z in place and directions URLs
+AT_PAIR = re.compile(rf'@{NUMBER},{NUMBER}')
+# !3d11.2588!4d75.7714 in the data= part: the pin itself, more precise than @
+DATA_PAIR = re.compile(rf'!3d{NUMBER}!4d{NUMBER}')
+PAIR = re.compile(rf'^{NUMBER}\s*,\s*{NUMBER}$')
+URL = re.compile(r'https?://\S+')
+QUERY_KEYS = ('q', 'query', 'll', 'destination', 'center')
+
+
+def valid(lat: float, lng: float) -> bool:
+    return -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def pair(lat: str, lng: str) -> Optional[Tuple[float, float]]:
+    lat, lng = float(lat), float(lng)
+    return (lat, lng) if valid(lat, lng) else None
+
+
+def parse_maps_link(url: str) -> Optional[Tuple[float, float]]:
+    parsed = urlparse(url)
+    if 'google.' not in parsed.netloc and 'goo.gl' not in parsed.netloc:
+        return None
+    decoded = unquote(url)
+    for pattern in (DATA_PAIR, AT_PAIR):
+        match = pattern.search(decoded)
+        if match:
+            return pair(*match.groups())
+    query = parse_qs(parsed.query)
+    for key in QUERY_KEYS:
+        for value in query.get(key, ()):
+            match = PAIR.match(value.strip().replace('loc:', ''))
+            if match:
+                return pair(*match.groups())
+    return None
+
+
+def parse_location(text: str) -> Optional[Tuple[float, float]]:
+    """(lat, lng) from a Maps link or a bare coordinate pair in text, else None"""
+    if not text:
+        return None
+    match = BARE_PAIR.match(text)
+    if match:
+        return pair(*match.groups())
+    for url in URL.findall(text):
+        coords = parse_maps_link(url)
+        if coords:
+            return coords
+    return None
+
+
+def message_location(payload: Dict) -> Optional[Tuple[float, float]]:
+    """Shared pin (Latitude/Longitude form fields) or a location written in the body"""
+    latitude, longitude = payload.get('Latitude'), payload.get('Longitude')
+    if latitude and longitude:
+        try:
+            return pair(latitude, longitude)
+        except ValueError:
+            pass
+    return parse_location(payload.get('Body', ''))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Place normalization in front of the LLM
+call_agent asks GPT-4o to turn free text into a normalized place name. Most
+inputs don't need it: a stop name typed as-is can be resolved locally, and
+the same text in the same conversation context normalizes the same way for
+everyone. Both are answered here; only the rest reaches the model.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from geocoder import Gazetteer, default_gazetteer, normalize_query
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DB = os.getenv('NORMALIZE_CACHE_DB', os.path.join(BOT_DIR, 'normalize_cache.db'))
+
+# Earlier non-system turns that are part of the cache key
+CONTEXT_TURNS = 2
+LATENCY_SAMPLES = 5000
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+class PlaceNormalizer:
+    def __init__(self, llm: Callable[[List[Dict]], object], model: type,
+                 gazetteer: Optional[Gazetteer] = None, path: str = DEFAULT_CACHE_DB,
+                 ttl: float = 7 * 24 * 3600, context_turns: int = CONTEXT_TURNS):
+        """
+        llm: the real model call, messages -> parsed response (pydantic model)
+        model: response class used to rebuild cached and pre-resolved answers
+        ttl: seconds a cached normalization is reused
+        """
+        self.llm = llm
+        self.model = model
+        self.gazetteer = gazetteer if gazetteer is not None else default_gazetteer()
+        self.path = path
+        self.ttl = ttl
+        self.context_turns = context_turns
+        self._local = threading.local()
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS normalize_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+        self._lock = threading.Lock()
+        self.counts = {'pre_resolved': 0, 'cache': 0, 'llm': 0}
+        self.latencies = {source: deque(maxlen=LATENCY_SAMPLES) for source in self.counts}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def cache_key(self, messages: List[Dict]) -> str:
+        """Normalized last user message plus the few turns before it"""
+        turns = [m for m in messages if m['role'] != 'system']
+        parts = [f"{m['role']}:{normalize_query(m['content'] or '')}"
+                 for m in turns[-(self.context_turns + 1):]]
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def pre_resolve(self, messages: List[Dict]):
+        """High-confidence local answer for the first message of a conversation, else None"""
+        user_turns = [m for m in messages if m['role'] == 'user']
+        # Follow-ups answer a question from the model; only it knows what it asked
+        if len(user_turns) != 1:
+            return None
+        # Only the whole message naming a place counts: 'Palayam, Thiruvananthapuram'
+        # is not our Palayam, though its first part matches exactly
+        place = self.gazetteer.exact(user_turns[0]['content'] or '')
+        if place is None:
+            return None
+        return self.model(status='place_normalized', place=place['name'], confidence='high',
+                          next_action='call_tool:get_coordinates')
+
+    def _record(self, source: str, started: float):
+        with self._lock:
+            self.counts[source] += 1
+            self.latencies[source].append(time.perf_counter() - started)
+
+    def resolve(self, messages: List[Dict]):
+        started = time.perf_counter()
+        parsed = self.pre_resolve(messages)
+        if parsed is not None:
+            self._record('pre_resolved', started)
+            return parsed
+
+        key = self.cache_key(messages)
+        conn = self._connect()
+        row = conn.execute('SELECT response FROM normalize_cache WHERE key = ? AND expires_at > ?',
+                           (key, time.time())).fetchone()
+        if row is not None:
+            self._record('cache', started)
+            return self.model(**json.loads(row[0]))
+
+        parsed = self.llm(messages)
+        conn.execute('INSERT OR REPLACE INTO normalize_cache (key, response, expires_at) VALUES (?, ?, ?)',
+                     (key, json.dumps(parsed.model_dump(), ensure_ascii=False), time.time() + self.ttl))
+        self._record('llm', started)
+        return parsed
+
+    def purge_expired(self) -> int:
+        return self._connect().execute('DELETE FROM normalize_cache WHERE expires_at <= ?',
+                                       (time.time(),)).rowcount
+
+    def stats(self) -> Dict:
+        """Hit rate and latency per source; saved time is local hits priced at the LLM's p50"""
+        with self._lock:
+            counts = dict(self.counts)
+            latencies = {source: list(samples) for source, samples in self.latencies.items()}
+        total = sum(counts.values())
+        local_hits = counts['pre_resolved'] + counts['cache']
+        stats = {
+            'resolutions': total,
+            'hit_rate': round(local_hits / total, 3) if total else 0.0,
+            **{f"{source}_hits": n for source, n in counts.items()},
+        }
+        for source, samples in latencies.items():
+            if samples:
+                stats[f"{source}_p50_ms"] = round(percentile(samples, 0.5) * 1000, 3)
+                stats[f"{source}_p95_ms"] = round(percentile(samples, 0.95) * 1000, 3)
+        if latencies['llm']:
+            stats['llm_seconds_saved'] = round(local_hits * percentile(latencies['llm'], 0.5), 2)
+        return stats
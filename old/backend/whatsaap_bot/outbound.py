@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Outbound message dispatcher for the Twilio Messages API
+One pooled HTTP session, a token bucket that keeps us under the sender's
+messages-per-second limit, bounded retries with backoff, and an asyncio
+fan-out for sending to many numbers at once. The Messages API has no
+idempotency key, so only failures where Twilio cannot have accepted the
+message are retried: 429s and connections that never opened. A read
+timeout or 5xx after the request went out may still have been delivered,
+and raises MaybeSent instead of risking a duplicate.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Sequence, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+DEFAULT_API_BASE = 'https://api.twilio.com'
+# Rejected before the message is accepted, so safe to send again
+RETRY_STATUSES = (429,)
+
+
+class TwilioError(Exception):
+    """Message rejected by the API, or still failing after all retries"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class MaybeSent(TwilioError):
+    """The request reached Twilio but its answer was lost; sending again may duplicate it"""
+
+
+def not_sent(error: requests.RequestException) -> bool:
+    """Network errors raised before the request reached Twilio"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and not isinstance(error, requests.Timeout):
+        # Refused or unresolvable; a reset after sending wraps a ProtocolError instead
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds, from either the delta-seconds or the HTTP-date form"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """
+    Blocking token bucket: `rate` sends per second with bursts up to `burst`
+    (default: a tenth of a second's worth, so a cold start doesn't overshoot
+    a per-second limit enforced on the other side)
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Provider said slow down (429): nobody sends for `seconds`"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class OutboundDispatcher:
+    def __init__(self, account_sid: str, auth_token: str, api_base: str = DEFAULT_API_BASE,
+                 rate: float = 80, burst: Optional[float] = None, max_retries: int = 4,
+                 backoff: float = 0.5, timeout: float = 10, pool_size: int = 32):
+        """
+        rate: messages per second allowed for the sender (Twilio's MPS limit)
+        max_retries: extra attempts for 429s and connections that never opened
+        backoff: first retry delay in seconds, doubled on every attempt
+        pool_size: keep-alive connections kept open to the API
+        """
+        self.url = f"{api_base.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.bucket = TokenBucket(rate, burst)
+
+        self.session = requests.Session()
+        self.session.auth = (account_sid, auth_token)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def send(self, params: Dict[str, str]) -> str:
+        """POST one message (From/To/Body or ContentSid...) and return its sid"""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            retry_after = None
+            try:
+                response = self.session.post(self.url, data=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not not_sent(e):
+                    error = MaybeSent(f"Network error after sending: {e}")
+                    break  # may have been delivered; don't send it twice
+                error = TwilioError(f"Network error: {e}")
+            else:
+                if response.status_code < 300:
+                    self._count('sent')
+                    return response.json()['sid']
+                error_type = MaybeSent if response.status_code >= 500 else TwilioError
+                error = error_type(f"Twilio returned {response.status_code}: {response.text[:200]}",
+                                   response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+                self.bucket.pause(retry_after if retry_after is not None else 1)
+
+            if attempt == self.max_retries:
+                break
+            self._count('retries')
+            # Jitter so a burst of failures doesn't come back in lockstep
+            time.sleep(retry_after or self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+        self._count('failed')
+        raise error
+
+    async def send_batch_async(self, batch: Sequence[Dict[str, str]],
+                               concurrency: Optional[int] = None) -> List[Union[str, Exception]]:
+        """Send many messages concurrently; results are sids or exceptions, in order"""
+        concurrency = concurrency or self.pool_size
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            async def one(params):
+                async with semaphore:
+                    return await loop.run_in_executor(executor, self.send, params)
+
+            return await asyncio.gather(*(one(params) for params in batch), return_exceptions=True)
+
+    def send_batch(self, batch: Sequence[Dict[str, str]],
+                   concurrency: Optional[int] = None) -> List[Union[str, Exception]]:
+        return asyncio.run(self.send_batch_async(batch, concurrency))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'sent': self.sent, 'retries': self.retries, 'failed': self.failed}
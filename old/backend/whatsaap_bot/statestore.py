@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Conversation state for the WhatsApp bot
+A bounded in-memory LRU with idle expiry in front of a SQLite (WAL) table,
+so state survives restarts, memory stays flat however many people write in,
+and several bot processes can share one database. Sessions are serialized
+per number within a process only; across processes the job queue's
+per-number ordering is what keeps steps for one number apart.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+DEFAULT_DB = os.getenv('BOT_STATE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversation_state (
+    number TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversation_state_expiry ON conversation_state (expires_at);
+"""
+
+# Expired rows are swept every this many writes
+PURGE_EVERY = 500
+
+
+class StateBusy(Exception):
+    """A session for this number (or one sharing its lock stripe) is still open"""
+
+
+class StateStore:
+    def __init__(self, path: str = DEFAULT_DB, max_entries: int = 10000, ttl: float = 1800,
+                 shared: bool = False, lock_stripes: int = 64):
+        """
+        max_entries: conversations kept in memory; older ones are read back from disk
+        ttl: seconds of silence after which a conversation starts over
+        shared: other processes write the same database, so a memory hit is
+        checked against the row version before it is trusted
+        lock_stripes: per-number locks are striped so their count stays fixed
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._local = threading.local()
+        # number -> (version, state, expires_at), least recently used first
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(lock_stripes)]
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def lock(self, number: str) -> threading.Lock:
+        """Lock serializing updates for one number within this process"""
+        return self._stripes[zlib.crc32(number.encode('utf-8')) % len(self._stripes)]
+
+    def _remember(self, number: str, version: int, state: Dict, expires_at: float):
+        with self._memory_lock:
+            self._memory[number] = (version, state, expires_at)
+            self._memory.move_to_end(number)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _forget(self, number: str):
+        with self._memory_lock:
+            self._memory.pop(number, None)
+
+    def _cached(self, number: str) -> Optional[tuple]:
+        with self._memory_lock:
+            entry = self._memory.get(number)
+            if entry is not None:
+                self._memory.move_to_end(number)
+            return entry
+
+    def get(self, number: str) -> Dict:
+        """Current state for number ({} if none or expired); the caller owns the copy"""
+        now = time.time()
+        entry = self._cached(number)
+        if entry is not None and entry[2] > now:
+            if not self.shared:
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            row = self._connect().execute(
+                'SELECT version FROM conversation_state WHERE number = ?', (number,)).fetchone()
+            if row is not None and row[0] == entry[0]:
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+
+        self.misses += 1
+        row = self._connect().execute(
+            'SELECT state, version, expires_at FROM conversation_state WHERE number = ?', (number,)).fetchone()
+        if row is None or row[2] <= now:
+            self._forget(number)
+            return {}
+        state = json.loads(row[0])
+        self._remember(number, row[1], state, row[2])
+        return copy.deepcopy(state)
+
+    def set(self, number: str, state: Dict):
+        expires_at = time.time() + self.ttl
+        row = self._connect().execute(
+            """INSERT INTO conversation_state (number, state, version, expires_at) VALUES (?, ?, 1, ?)
+               ON CONFLICT(number) DO UPDATE SET state = excluded.state, version = version + 1,
+                                                 expires_at = excluded.expires_at
+               RETURNING version""",
+            (number, json.dumps(state, ensure_ascii=False), expires_at)).fetchone()
+        self._remember(number, row[0], copy.deepcopy(state), expires_at)
+
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def delete(self, number: str):
+        self._connect().execute('DELETE FROM conversation_state WHERE number = ?', (number,))
+        self._forget(number)
+
+    @contextmanager
+    def session(self, number: str, timeout: float = -1) -> Iterator[Dict]:
+        """
+        with store.session(number) as state: ... mutate state ...
+        Saved on exit (deleted if left empty); not saved if the block raises.
+        Raises StateBusy if the number's lock isn't free within timeout
+        seconds (-1 waits as long as it takes).
+        """
+        lock = self.lock(number)
+        if not lock.acquire(timeout=timeout):
+            raise StateBusy(number)
+        try:
+            state = self.get(number)
+            yield state
+            if state:
+                self.set(number, state)
+            else:
+                self.delete(number)
+        finally:
+            lock.release()
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        cursor = self._connect().execute('DELETE FROM conversation_state WHERE expires_at <= ?', (now,))
+        with self._memory_lock:
+            for number in [n for n, entry in self._memory.items() if entry[2] <= now]:
+                del self._memory[number]
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        stored = self._connect().execute('SELECT COUNT(*) FROM conversation_state').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'in_memory': len(self._memory),
+            'stored': stored,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -1,6 +1,7 @@
-from twilio.rest import Client
 import os
 from dotenv import load_dotenv
+
+from outbound import DEFAULT_API_BASE, OutboundDispatcher
 load_dotenv()
 
 
@@ -11,27 +12,46 @@ class WabaApi ():
         auth_token = os.getenv("TWILIO_AUTH_TOKEN")
 
         self.fromnumber = "+14155238886"
-        self.client = Client(account_sid, auth_token)
+        # Plain REST calls over one pooled session instead of twilio.rest.Client;
+        # TWILIO_API_BASE points it at fake_twilio.py for load tests
+        self.dispatcher = OutboundDispatcher(
+            account_sid, auth_token,
+            api_base=os.getenv("TWILIO_API_BASE", DEFAULT_API_BASE),
+            rate=float(os.getenv("TWILIO_MPS", "80")),
+        )
+
+    def template_params(self,to_number,templateid,variable=None):
+        params = {
+            'From': f'whatsapp:{self.fromnumber}',
+            'ContentSid': templateid,
+            'To': f'whatsapp:+91{to_number}',
+        }
+        if variable:
+            params['ContentVariables'] = variable
+        return params
+
+    def message_params(self,to_number,message):
+        return {
+            'From': f'whatsapp:{self.fromnumber}',
+            'Body': message,
+            'To': f'whatsapp:+91{to_number}',
+        }
 
     def send_template(self,to_number,templateid,variable=None):
-        message = self.client.messages.create(
-        from_=f'whatsapp:{self.fromnumber}',
-        content_sid= templateid,
-        content_variables= variable,
-        to=f'whatsapp:+91{to_number}')
-        return message.sid
+        return self.dispatcher.send(self.template_params(to_number, templateid, variable))
+
     def send_message(self,to_number,message):
-        message = self.client.messages.create(
-        from_=f'whatsapp:{self.fromnumber}',
-        body=message,
-        to=f'whatsapp:+91{to_number}'
-        )
+        return self.dispatcher.send(self.message_params(to_number, message))
+
+    def broadcast(self,to_numbers,message,concurrency=None):
+        """Same text to many numbers (service alerts); returns sids or exceptions in order"""
+        return self.dispatcher.send_batch([self.message_params(n, message) for n in to_numbers], concurrency)
+
+    def broadcast_template(self,to_numbers,templateid,variable=None,concurrency=None):
+        return self.dispatcher.send_batch(
+            [self.template_params(n, templateid, variable) for n in to_numbers], concurrency)
 
-        return message.sid
-    
 if __name__ == '__main__':
     Wa = WabaApi()
     # print(Wa.send_template('8089438821',"HXb5b62575e6e4ff6129ad7c8efe1f983e",'{"1":"12/1","2":"3pm"}'))
     print(Wa.send_message('8089438821','hello this is a test message'))
-
-       
\ No newline at end of file
@@ -1,47 +1,235 @@
-from flask import Flask,  request 
+import os
+import sys
+import threading
+import time
+
+from flask import Flask,  request
 from twilio.twiml.messaging_response import MessagingResponse
 
+from jobqueue import JobQueue, WorkerPool
+from locations import message_location
+from outbound import MaybeSent
+from statestore import StateBusy, StateStore
+
+# findbus lives one directory up
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 
 app = Flask(__name__)
 
-user_state = {}
+# Conversation state per number: bounded in memory, persisted in SQLite and
+# shareable between bot processes (BOT_SHARED_STATE=1 when running several)
+user_state = StateStore(
+    max_entries=int(os.getenv('BOT_STATE_MAX_ENTRIES', '10000')),
+    ttl=float(os.getenv('BOT_STATE_TTL', '1800')),
+    shared=os.getenv('BOT_SHARED_STATE', '0') == '1',
+)
+
+# Twilio gives up on a webhook after ~15s; LLM + geocoding + routing can take
+# longer, so the request only enqueues and the reply goes out from a worker
+jobs = JobQueue()
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '4'))
+MAX_ROUTES_IN_REPLY = 3
+# Route search time allowed inside the webhook request for pin-to-pin trips
+INLINE_ROUTE_BUDGET = float(os.getenv('BOT_INLINE_ROUTE_BUDGET_MS', '3000')) / 1000
+# Worker searches have no Twilio timeout to respect, but still shouldn't hog the finder
+WORKER_ROUTE_BUDGET = float(os.getenv('BOT_WORKER_ROUTE_BUDGET_MS', '10000')) / 1000
+# How long the webhook waits for a lock a worker holds (state, search) before handing over
+INLINE_LOCK_WAIT = float(os.getenv('BOT_INLINE_LOCK_WAIT_MS', '1000')) / 1000
+SNAP_RADIUS = 2000
+
+_sender = None
+_finder = None
+_finder_lock = threading.Lock()
+# Searches share the finder's query time and schedules, so they must not interleave
+_search_lock = threading.Lock()
+
+
+class FinderBusy(Exception):
+    """The inline path could not get the finder in time; a worker answers instead"""
+
+
+def get_sender():
+    global _sender
+    if _sender is None:
+        from twillioWrapper import WabaApi
+        _sender = WabaApi()
+    return _sender
+
 
+def get_finder():
+    global _finder
+    if _finder is None:
+        with _finder_lock:
+            if _finder is None:
+                from findbus import AdvancedBusRouteFinder
+                _finder = AdvancedBusRouteFinder()
+    return _finder
 
 
+def local_number(from_number):
+    """'whatsapp:+919876543210' -> '9876543210' (WabaApi adds the prefix back)"""
+    number = from_number.replace('whatsapp:', '')
+    return number[3:] if number.startswith('+91') else number.lstrip('+')
+
+
+def reply(from_number, text):
+    get_sender().send_message(local_number(from_number), text)
+
 
 @app.route("/Whatsapp", methods=['POST'])
 def whatsapp_webhook():
-    print(request)
-    incoming_msg = request.values.get('Body','').strip()
     from_number = request.values.get('From','')
-    latitude = request.form.get('Latitude')
-    longitude = request.form.get('Longitude')
-    print(f'message from {from_number}: {incoming_msg}')
-
+    payload = {
+        'From': from_number,
+        'Body': request.values.get('Body','').strip(),
+        'Latitude': request.form.get('Latitude'),
+        'Longitude': request.form.get('Longitude'),
+        'received_at': time.time(),
+    }
     resp = MessagingResponse()
-    msg = resp.message()
-
-    if incoming_msg : 
-        user_state[from_number] = {'step':'awaiting_destination'}
-        msg.body("👋 Welcome! Please type your destination or share a pin 📍.")
-        return str(resp)
-
-    if user_state.get(from_number, {}).get('step') == 'awaiting_destination':
-        if latitude and longitude:
-            # If shared pin
-            user_state[from_number] = {
-                'step': 'awaiting_current_location',
-                'destination_coords': (latitude, longitude)
-            }
-        msg.body(f"📍 Destination received! Now, please share your current location. {latitude}, {longitude}")
 
-    else:
-        # Assume typed destination
-        user_state[from_number] = {
-            'step': 'awaiting_current_location',
-            'destination': incoming_msg.strip().title()
-        }
-        msg.body(f"📍 Destination '{incoming_msg}' noted! Now, please share your current location.")
+    # Pins, Maps links and greetings need no LLM or geocoding, so they are
+    # answered in this response, unless earlier messages are still queued.
+    # Workers hold the state lock through LLM calls and sends, and it is
+    # striped, so the webhook never waits long for it either
+    if not needs_worker(user_state.get(from_number), payload) and jobs.pending(from_number) == 0:
+        try:
+            with user_state.session(from_number, timeout=INLINE_LOCK_WAIT) as state:
+                if not needs_worker(state, payload):
+                    resp.message(conversation_step(state, payload, INLINE_ROUTE_BUDGET, INLINE_LOCK_WAIT))
+                    return str(resp)
+        except (StateBusy, FinderBusy):
+            pass  # state is not saved; the worker starts from the same step
+
+    jobs.put(from_number, payload)
+    # Empty TwiML: nothing is sent inline, the worker replies via the API
     return str(resp)
 
-app.run(port=8000, debug=True)
\ No newline at end of file
+
+@app.route("/stats", methods=['GET'])
+def bot_stats():
+    """Queue depth, state store and how often the LLM / Google were avoided"""
+    stats = {'jobs': jobs.stats(), 'state': user_state.stats()}
+    agent = sys.modules.get('agentMain')
+    if agent is not None:
+        if agent._normalizer is not None:
+            stats['normalizer'] = agent._normalizer.stats()
+        if agent._geocoder is not None:
+            stats['geocoder'] = agent._geocoder.stats()
+    return stats
+
+
+def resolve_place(state, text):
+    """
+    Typed place -> (lat, lng, address), or None after asking the user a
+    clarifying question. The LLM conversation is kept in the state so the
+    next message continues it.
+    """
+    from agentMain import call_agent, get_coordinates, system_prompt
+
+    messages = state.get('messages') or [{"role": "system", "content": system_prompt}]
+    messages.append({"role": "user", "content": text})
+    parsed = call_agent(messages)
+    if parsed.status == "need_more_info":
+        messages.append({"role": "assistant", "content": parsed.question})
+        state['messages'] = messages
+        return None, parsed.question
+
+    state.pop('messages', None)
+    geo_data = get_coordinates(parsed.place)
+    if geo_data.get("status") != "OK":
+        return None, f"❌ I couldn't find '{parsed.place}' on the map. Please try another name or share a pin 📍."
+    location = geo_data["results"][0]["geometry"]["location"]
+    return (location["lat"], location["lng"], geo_data["results"][0]["formatted_address"]), None
+
+
+def format_routes(routes):
+    if not routes:
+        return "😕 No bus routes found between these places. Try a nearby landmark."
+    lines = ["🚌 Buses for your trip:"]
+    for route in routes[:MAX_ROUTES_IN_REPLY]:
+        lines.append(
+            f"\n*{route['bus_name']}*\n"
+            f"⏱️ Leaves in {route['departure_in']} min, arrives {route['arrival']} ({route['duration']})\n"
+            f"🔁 {route['transfers']} transfers | 💰 {route['fare']} | 🚶 {route['walking_distance']}"
+        )
+    return "\n".join(lines)
+
+
+def process_message(payload):
+    """Worker side of the webhook: runs the conversation step and sends the answer"""
+    from_number = payload['From']
+    with user_state.session(from_number) as state:
+        # Replying inside the session: if the send fails, the state is not
+        # saved and the retried job starts from the same step
+        answer = conversation_step(state, payload)
+        try:
+            reply(from_number, answer)
+        except MaybeSent as e:
+            # Retrying would run the step and send it again; treat it as answered
+            print(f"⚠️  Reply to {from_number} may not have been delivered: {e}")
+
+
+def needs_worker(state, payload):
+    """True when this message must go through LLM normalization and geocoding"""
+    awaiting_place = state.get('step') in ('awaiting_destination', 'awaiting_current_location')
+    return awaiting_place and message_location(payload) is None
+
+
+def describe_point(lat, lng):
+    """'near Medical College (120 m)' for a pin, from the stop grid"""
+    nearest = get_finder().find_nearest_stops(lat, lng, SNAP_RADIUS, limit=1)
+    if not nearest:
+        return f"{lat:.5f}, {lng:.5f}"
+    stop_id, distance = nearest[0]
+    return f"near {get_finder().stops[stop_id]['stop_name']} ({distance:.0f} m)"
+
+
+def conversation_step(state, payload, route_budget=WORKER_ROUTE_BUDGET, lock_wait=-1):
+    """
+    Advance one conversation by one message, mutating state; returns the reply.
+    Raises FinderBusy if another search holds the finder for over lock_wait
+    seconds (-1 waits as long as it takes).
+    """
+    incoming_msg = payload['Body']
+    print(f"message from {payload['From']}: {incoming_msg}")
+
+    step = state.get('step')
+    location = message_location(payload)
+
+    if step not in ('awaiting_destination', 'awaiting_current_location'):
+        state.clear()
+        state['step'] = 'awaiting_destination'
+        return "👋 Welcome! Please type your destination or share a pin 📍."
+
+    if location is not None:
+        place = (location[0], location[1], None)
+    else:
+        place, question = resolve_place(state, incoming_msg)
+        if place is None:
+            return question
+
+    if step == 'awaiting_destination':
+        state.clear()
+        state.update({'step': 'awaiting_current_location', 'destination_coords': place})
+        label = f"'{place[2]}'" if place[2] else describe_point(place[0], place[1])
+        return f"📍 Destination {label} received! Now, please share your current location."
+
+    dest_lat, dest_lng, _ = state['destination_coords']
+    finder = get_finder()
+    if not _search_lock.acquire(timeout=lock_wait):
+        raise FinderBusy()
+    try:
+        routes = finder.find_routes_with_realtime(place[0], place[1], dest_lat, dest_lng,
+                                                  deadline=time.monotonic() + route_budget)
+    finally:
+        _search_lock.release()
+    state.clear()  # trip answered; the next message starts over
+    return format_routes(routes)
+
+
+if __name__ == '__main__':
+    pool = WorkerPool(jobs, process_message, BOT_WORKERS)
+    pool.start()
+    app.run(port=8000, debug=True, use_reloader=False)